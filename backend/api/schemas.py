@@ -159,3 +159,25 @@ class UserResponse(UserBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     last_login: Optional[datetime] = None
+
+class UserWithStatsResponse(UserResponse):
+    """Схема ответа с информацией о пользователе и количеством созданных паспортов"""
+    passports_count: int = 0
+
+# Схемы для фоновых задач экспорта
+class ExportJobCreate(BaseModel):
+    """Схема для постановки задачи экспорта в очередь"""
+    format: str  # passports_pdf, stickers_pdf, stickers_docx
+    passport_ids: List[int]
+
+class ExportJobResponse(BaseModel):
+    """Схема ответа с состоянием задачи экспорта"""
+    id: str
+    format: str
+    status: str  # queued, running, done, failed
+    passports_count: int
+    pages_done: int = 0
+    pages_total: int
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
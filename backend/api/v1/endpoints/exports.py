@@ -0,0 +1,108 @@
+"""
+Эндпоинты фоновых задач экспорта паспортов и наклеек
+"""
+
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+import os
+
+from backend.models import User, VedPassport
+from backend.api.schemas import ExportJobCreate, ExportJobResponse
+from backend.api.auth import get_current_user, get_admin_user
+from backend.database import get_async_db
+from backend.utils.export_jobs import EXPORT_FORMATS, get_export_queue
+from backend.utils.export_cache import get_export_cache
+from backend.utils.render_executor import passport_views
+
+router = APIRouter()
+
+
+def _get_accessible_job(job_id: str, current_user: User) -> dict:
+    """Задача экспорта, доступная текущему пользователю"""
+    job = get_export_queue().store.get(job_id)
+    if not job or (job["user_id"] != current_user.id and current_user.role != "admin"):
+        raise HTTPException(status_code=404, detail="Задача экспорта не найдена")
+    return job
+
+
+@router.post("/jobs", response_model=ExportJobResponse, status_code=202)
+async def create_export_job(
+    job_data: ExportJobCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Постановка экспорта в очередь; результат забирается через GET /jobs/{job_id}/result"""
+    if job_data.format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестный формат экспорта: {job_data.format}. Доступны: {', '.join(EXPORT_FORMATS)}"
+        )
+    if not job_data.passport_ids:
+        raise HTTPException(status_code=400, detail="Список паспортов пуст")
+
+    try:
+        query = select(VedPassport).options(selectinload(VedPassport.nomenclature)).where(
+            VedPassport.id.in_(job_data.passport_ids)
+        ).order_by(VedPassport.id)
+        if current_user.role != "admin":
+            query = query.where(VedPassport.created_by == current_user.id)
+        result = await db.execute(query)
+        passports = result.scalars().all()
+
+        if not passports:
+            raise HTTPException(status_code=404, detail="Выбранные паспорта не найдены или нет доступа")
+
+        job = get_export_queue().submit(job_data.format, passport_views(passports), current_user.id)
+        return ExportJobResponse(**job, pages_done=0)
+    except HTTPException:
+        raise
+    except asyncio.QueueFull:
+        raise HTTPException(status_code=503, detail="Очередь экспорта заполнена, повторите позже")
+    except Exception as e:
+        print(f"Ошибка постановки экспорта в очередь: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка постановки экспорта в очередь: {str(e)}")
+
+
+@router.get("/jobs/{job_id}", response_model=ExportJobResponse)
+async def get_export_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Состояние задачи экспорта: статус и количество готовых страниц"""
+    return ExportJobResponse(**_get_accessible_job(job_id, current_user))
+
+
+@router.get("/jobs/{job_id}/result")
+async def get_export_job_result(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Скачивание готового файла экспорта"""
+    job = _get_accessible_job(job_id, current_user)
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Экспорт завершился с ошибкой: {job['error']}")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail="Экспорт еще не готов")
+
+    path = get_export_queue().store.result_path(job)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Файл экспорта удален по истечении срока хранения")
+
+    created_at = job["created_at"][:19].replace("-", "").replace(":", "").replace("T", "_")
+    return FileResponse(
+        path,
+        media_type=job["media_type"],
+        filename=f"{job['format']}_{created_at}.{job['extension']}"
+    )
+
+
+@router.get("/cache")
+async def get_export_cache_stats(
+    current_user: User = Depends(get_admin_user)
+):
+    """Статистика кэша выгрузок: попадания и промахи (текущего процесса), размер"""
+    return get_export_cache().stats()
@@ -4,10 +4,13 @@ API эндпоинты для создания паспортов коронок
 
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
+from sqlalchemy import insert, func, tuple_
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Dict, Optional
 import io
+import json
+import base64
 import pandas as pd
 from datetime import datetime
 
@@ -24,6 +27,8 @@ from backend.api.schemas import (
 )
 from backend.api.auth import get_current_user, get_current_active_user, get_admin_user
 from backend.utils.pdf_generator import generate_bulk_passports_pdf, generate_stickers_pdf_reportlab
+from backend.utils.render_executor import passport_views
+from backend.utils.export_cache import render_cached
 from backend.database import get_db, get_async_db
 
 router = APIRouter()
@@ -75,80 +80,234 @@ def get_archive_filters(
         print(f"Ошибка при получении фильтров: {e}")
         raise HTTPException(status_code=500, detail=f"Внутренняя ошибка сервера: {str(e)}")
 
+def _passport_read_query(db: Session):
+    """Read-модель паспорта: паспорт + номенклатура + создатель одним запросом
+
+    Выбираются только колонки, нужные ответам API и экспорту, строки
+    возвращаются как кортежи без загрузки ORM-объектов и их связей.
+    """
+    return db.query(
+        VedPassport.id,
+        VedPassport.passport_number,
+        VedPassport.title,
+        VedPassport.description,
+        VedPassport.status,
+        VedPassport.order_number,
+        VedPassport.quantity,
+        VedPassport.created_by,
+        VedPassport.nomenclature_id,
+        VedPassport.created_at,
+        VedPassport.updated_at,
+        User.id.label("creator_id"),
+        User.username.label("creator_username"),
+        User.email.label("creator_email"),
+        User.full_name.label("creator_full_name"),
+        User.role.label("creator_role"),
+        VEDNomenclature.id.label("nomenclature_pk"),
+        VEDNomenclature.code_1c.label("nomenclature_code_1c"),
+        VEDNomenclature.name.label("nomenclature_name"),
+        VEDNomenclature.article.label("nomenclature_article"),
+        VEDNomenclature.matrix.label("nomenclature_matrix"),
+        VEDNomenclature.drilling_depth.label("nomenclature_drilling_depth"),
+        VEDNomenclature.height.label("nomenclature_height"),
+        VEDNomenclature.thread.label("nomenclature_thread"),
+        VEDNomenclature.product_type.label("nomenclature_product_type"),
+        VEDNomenclature.is_active.label("nomenclature_is_active"),
+        VEDNomenclature.created_at.label("nomenclature_created_at"),
+        VEDNomenclature.updated_at.label("nomenclature_updated_at"),
+    ).outerjoin(
+        VEDNomenclature, VEDNomenclature.id == VedPassport.nomenclature_id
+    ).outerjoin(
+        User, User.id == VedPassport.created_by
+    )
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+def _passport_read_dict(row, nomenclature_dates: bool = False) -> dict:
+    """Преобразование строки read-модели в словарь ответа API"""
+    creator = {
+        "id": row.creator_id,
+        "username": row.creator_username,
+        "email": row.creator_email,
+        "full_name": row.creator_full_name,
+        "role": row.creator_role
+    } if row.creator_id is not None else None
+
+    nomenclature = None
+    if row.nomenclature_pk is not None:
+        nomenclature = {
+            "id": row.nomenclature_pk,
+            "code_1c": row.nomenclature_code_1c,
+            "name": row.nomenclature_name,
+            "article": row.nomenclature_article,
+            "matrix": row.nomenclature_matrix,
+            "drilling_depth": row.nomenclature_drilling_depth,
+            "height": row.nomenclature_height,
+            "thread": row.nomenclature_thread,
+            "product_type": row.nomenclature_product_type,
+            "is_active": row.nomenclature_is_active,
+        }
+        if nomenclature_dates:
+            nomenclature["created_at"] = _isoformat(row.nomenclature_created_at)
+            nomenclature["updated_at"] = _isoformat(row.nomenclature_updated_at)
+
+    return {
+        "id": row.id,
+        "passport_number": row.passport_number,
+        "title": row.title,
+        "description": row.description,
+        "status": row.status,
+        "order_number": row.order_number,
+        "quantity": row.quantity,
+        "created_by": row.created_by,
+        "nomenclature_id": row.nomenclature_id,
+        "created_at": _isoformat(row.created_at),
+        "updated_at": _isoformat(row.updated_at),
+        "creator": creator,
+        "nomenclature": nomenclature
+    }
+
+def _passport_excel_row(row) -> dict:
+    """Строка Excel-выгрузки из строки read-модели"""
+    has_creator = row.creator_id is not None
+    has_nomenclature = row.nomenclature_pk is not None
+    return {
+        'ID паспорта': row.id,
+        'Номер паспорта': row.passport_number,
+        'Название': row.title or '',
+        'Описание': row.description or '',
+        'Статус': row.status or '',
+        'Номер заказа': row.order_number or '',
+        'Количество': row.quantity or 1,
+        'Создатель': (row.creator_full_name or row.creator_username) if has_creator else '',
+        'Email создателя': row.creator_email if has_creator else '',
+        'Код 1С': row.nomenclature_code_1c if has_nomenclature else '',
+        'Артикул': row.nomenclature_article if has_nomenclature else '',
+        'Наименование': row.nomenclature_name if has_nomenclature else '',
+        'Матрица': row.nomenclature_matrix if has_nomenclature else '',
+        'Глубина бурения': row.nomenclature_drilling_depth if has_nomenclature else '',
+        'Высота': row.nomenclature_height if has_nomenclature else '',
+        'Резьба': row.nomenclature_thread if has_nomenclature else '',
+        'Тип продукта': row.nomenclature_product_type if has_nomenclature else '',
+        'Дата создания': row.created_at.strftime('%d.%m.%Y %H:%M') if row.created_at else '',
+        'Дата обновления': row.updated_at.strftime('%d.%m.%Y %H:%M') if row.updated_at else ''
+    }
+
+def _encode_cursor(created_at, passport_id: int) -> str:
+    """Непрозрачный курсор страницы по ключу (created_at, id)"""
+    payload = json.dumps([created_at.isoformat() if created_at else None, passport_id])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decode_cursor(cursor: str):
+    """Разбор курсора; при некорректном значении - 400"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, passport_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return (datetime.fromisoformat(created_at) if created_at else None), int(passport_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Некорректный курсор пагинации")
+
+def _keyset_query(query, cursor: str, page_size: int):
+    """Запрос страницы по курсору (created_at DESC, id DESC) с одной лишней строкой"""
+    if cursor:
+        created_at, passport_id = _decode_cursor(cursor)
+        if created_at is None:
+            # При сортировке DESC строки без даты идут первыми
+            query = query.filter(
+                VedPassport.created_at.isnot(None)
+                | (VedPassport.created_at.is_(None) & (VedPassport.id < passport_id))
+            )
+        else:
+            query = query.filter(
+                tuple_(VedPassport.created_at, VedPassport.id) < tuple_(created_at, passport_id)
+            )
+
+    return query.order_by(
+        VedPassport.created_at.desc(), VedPassport.id.desc()
+    ).limit(page_size + 1)
+
+def _keyset_page(query, cursor: str, page_size: int):
+    """Страница read-модели по курсору (created_at DESC, id DESC)
+
+    Возвращает строки страницы и курсор следующей страницы (None, если она последняя).
+    """
+    rows = _keyset_query(query, cursor, page_size).all()
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+# Максимальный размер страницы списков в режиме курсора
+CURSOR_MAX_PAGE_SIZE = 1000
+
+def _cursor_response(db: Session, filters: list, cursor: str, page_size: int, include_total: Optional[bool], nomenclature_dates: bool = False) -> dict:
+    """Ответ списка паспортов в режиме пагинации по курсору"""
+    page_size = max(1, min(page_size, CURSOR_MAX_PAGE_SIZE))
+    rows, next_cursor = _keyset_page(_passport_read_query(db).filter(*filters), cursor, page_size)
+    total_count = None
+    if include_total:
+        total_count = db.query(func.count(VedPassport.id)).filter(*filters).scalar()
+
+    return {
+        "passports": [_passport_read_dict(row, nomenclature_dates) for row in rows],
+        "pagination": {
+            "page_size": page_size,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
+            "total_count": total_count
+        }
+    }
+
+async def _load_render_passports(db: AsyncSession, passport_ids: List[int]) -> list:
+    """Паспорта для генерации документов одним запросом
+
+    Номенклатура загружается сразу (selectinload), чтобы генераторы получили
+    полные view-модели и не обращались к базе.
+    """
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+    query = select(VedPassport).options(selectinload(VedPassport.nomenclature)).where(
+        VedPassport.id.in_(passport_ids)
+    ).order_by(VedPassport.id)
+    result = await db.execute(query)
+    return result.scalars().all()
+
 @router.get("/")
 def get_ved_passports(
     page: int = 1,
     page_size: int = 20,
+    cursor: Optional[str] = None,
+    include_total: Optional[bool] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Получение списка паспортов ВЭД с пагинацией"""
+    """Получение списка паспортов ВЭД с пагинацией
+
+    Если передан cursor (пустая строка - первая страница), используется
+    пагинация по курсору: ответ содержит next_cursor, а total_count
+    считается только при include_total=true.
+    """
     try:
         # Админы видят все активные паспорта, пользователи - только свои (любого статуса)
-        if current_user.role == "admin":
-            query = db.query(VedPassport).filter(
-                (VedPassport.status == "active") | (VedPassport.status.is_(None))
-            ).order_by(VedPassport.created_at.desc())
-            total_count = query.count()
-        else:
-            query = db.query(VedPassport).filter(
-                VedPassport.created_by == current_user.id
-            ).filter(
-                (VedPassport.status == "active") | (VedPassport.status.is_(None))
-            ).order_by(VedPassport.created_at.desc())
-            total_count = query.count()
+        filters = [(VedPassport.status == "active") | (VedPassport.status.is_(None))]
+        if current_user.role != "admin":
+            filters.append(VedPassport.created_by == current_user.id)
+
+        if cursor is not None:
+            return _cursor_response(db, filters, cursor, page_size, include_total)
+
+        total_count = db.query(func.count(VedPassport.id)).filter(*filters).scalar()
 
         # Применяем пагинацию
         skip = (page - 1) * page_size
-        passports = query.offset(skip).limit(page_size).all()
-
-        # Создаем объекты для ответа с загруженными связанными данными
-        result_passports = []
-        for passport in passports:
-            try:
-                # Загружаем создателя паспорта
-                creator = db.query(User).filter(User.id == passport.created_by).first()
-                # Загружаем номенклатуру
-                nomenclature = db.query(VEDNomenclature).filter(VEDNomenclature.id == passport.nomenclature_id).first()
+        rows = _passport_read_query(db).filter(*filters).order_by(
+            VedPassport.created_at.desc(), VedPassport.id.desc()
+        ).offset(skip).limit(page_size).all()
 
-                passport_data = {
-                    "id": passport.id,
-                    "passport_number": passport.passport_number,
-                    "title": passport.title,
-                    "description": passport.description,
-                    "status": passport.status,
-                    "order_number": passport.order_number,
-                    "quantity": passport.quantity,
-                    "created_by": passport.created_by,
-                    "nomenclature_id": passport.nomenclature_id,
-                    "created_at": passport.created_at.isoformat() if passport.created_at else None,
-                    "updated_at": passport.updated_at.isoformat() if passport.updated_at else None,
-                    "creator": {
-                        "id": creator.id if creator else None,
-                        "username": creator.username if creator else None,
-                        "email": creator.email if creator else None,
-                        "full_name": creator.full_name if creator else None,
-                        "role": creator.role if creator else None
-                    } if creator else None,
-                    "nomenclature": {
-                        "id": nomenclature.id if nomenclature else None,
-                        "code_1c": nomenclature.code_1c if nomenclature else None,
-                        "name": nomenclature.name if nomenclature else None,
-                        "article": nomenclature.article if nomenclature else None,
-                        "matrix": nomenclature.matrix if nomenclature else None,
-                        "drilling_depth": nomenclature.drilling_depth if nomenclature else None,
-                        "height": nomenclature.height if nomenclature else None,
-                        "thread": nomenclature.thread if nomenclature else None,
-                        "product_type": nomenclature.product_type if nomenclature else None,
-                        "is_active": nomenclature.is_active if nomenclature else None,
-                    } if nomenclature else None
-                }
-                result_passports.append(passport_data)
-            except Exception as e:
-                print(f"Ошибка обработки паспорта {passport.id}: {e}")
-                import traceback
-                traceback.print_exc()
-                continue
+        result_passports = [_passport_read_dict(row) for row in rows]
 
         return {
             "passports": result_passports,
@@ -160,6 +319,8 @@ def get_ved_passports(
             }
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Ошибка при получении паспортов: {e}")
         import traceback
@@ -238,76 +399,40 @@ def public_passports(
     page: int = 1,
     page_size: int = 20,
     order_number: Optional[str] = None,
+    cursor: Optional[str] = None,
+    include_total: Optional[bool] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Получение всех паспортов для архива с пагинацией (опционально по номеру заказа)"""
+    """Получение всех паспортов для архива с пагинацией (опционально по номеру заказа)
+
+    Поддерживает пагинацию по курсору так же, как GET /.
+    """
     try:
         # Админы видят все паспорта, пользователи - только свои (включая все статусы)
-        if current_user.role == "admin":
-            query = db.query(VedPassport).order_by(VedPassport.created_at.desc())
-        else:
-            query = db.query(VedPassport).filter(
-                VedPassport.created_by == current_user.id
-            ).order_by(VedPassport.created_at.desc())
+        filters = []
+        if current_user.role != "admin":
+            filters.append(VedPassport.created_by == current_user.id)
 
         if order_number is not None and order_number.strip() != "":
             if order_number.strip() == "Без заказа":
-                query = query.filter((VedPassport.order_number == None) | (VedPassport.order_number == ""))
+                filters.append((VedPassport.order_number == None) | (VedPassport.order_number == ""))
             else:
-                query = query.filter(VedPassport.order_number == order_number.strip())
+                filters.append(VedPassport.order_number == order_number.strip())
+
+        if cursor is not None:
+            return _cursor_response(db, filters, cursor, page_size, include_total, nomenclature_dates=True)
 
-        total_count = query.count()
+        total_count = db.query(func.count(VedPassport.id)).filter(*filters).scalar()
         # Применяем пагинацию
         skip = (page - 1) * page_size
-        passports = query.offset(skip).limit(page_size).all()
+        rows = _passport_read_query(db).filter(*filters).order_by(
+            VedPassport.created_at.desc(), VedPassport.id.desc()
+        ).offset(skip).limit(page_size).all()
 
-        print(f"[public-passports] Получено {len(passports)} паспортов для пользователя {current_user.id} (роль: {current_user.role}), страница {page}, всего: {total_count}")
+        print(f"[public-passports] Получено {len(rows)} паспортов для пользователя {current_user.id} (роль: {current_user.role}), страница {page}, всего: {total_count}")
 
-        # Создаем объекты для ответа с загруженными связанными данными
-        result_passports = []
-        for passport in passports:
-            # Загружаем создателя паспорта
-            creator = db.query(User).filter(User.id == passport.created_by).first()
-            # Загружаем номенклатуру
-            nomenclature = db.query(VEDNomenclature).filter(VEDNomenclature.id == passport.nomenclature_id).first()
-
-            # Создаем объект для ответа
-            passport_data = {
-                "id": passport.id,
-                "passport_number": passport.passport_number,
-                "title": passport.title,
-                "description": passport.description,
-                "status": passport.status,
-                "order_number": passport.order_number,
-                "quantity": passport.quantity,
-                "created_by": passport.created_by,
-                "nomenclature_id": passport.nomenclature_id,
-                "created_at": passport.created_at.isoformat() if passport.created_at else None,
-                "updated_at": passport.updated_at.isoformat() if passport.updated_at else None,
-                "creator": {
-                    "id": creator.id if creator else None,
-                    "username": creator.username if creator else None,
-                    "email": creator.email if creator else None,
-                    "full_name": creator.full_name if creator else None,
-                    "role": creator.role if creator else None
-                } if creator else None,
-                "nomenclature": {
-                    "id": nomenclature.id if nomenclature else None,
-                    "code_1c": nomenclature.code_1c if nomenclature else None,
-                    "name": nomenclature.name if nomenclature else None,
-                    "article": nomenclature.article if nomenclature else None,
-                    "matrix": nomenclature.matrix if nomenclature else None,
-                    "drilling_depth": nomenclature.drilling_depth if nomenclature else None,
-                    "height": nomenclature.height if nomenclature else None,
-                    "thread": nomenclature.thread if nomenclature else None,
-                    "product_type": nomenclature.product_type if nomenclature else None,
-                    "is_active": nomenclature.is_active if nomenclature else None,
-                    "created_at": nomenclature.created_at.isoformat() if nomenclature and nomenclature.created_at else None,
-                    "updated_at": nomenclature.updated_at.isoformat() if nomenclature and nomenclature.updated_at else None
-                } if nomenclature else None
-            }
-            result_passports.append(passport_data)
+        result_passports = [_passport_read_dict(row, nomenclature_dates=True) for row in rows]
 
         return {
             "passports": result_passports,
@@ -318,12 +443,15 @@ def public_passports(
                 "total_pages": (total_count + page_size - 1) // page_size
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Ошибка при получении паспортов: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Внутренняя ошибка сервера: {str(e)}")
 
+
 @router.get("/get-all-passports")
 def get_passports_list(
     current_user: User = Depends(get_current_user),
@@ -391,69 +519,109 @@ def test_passports(
         print(f"Ошибка при получении паспортов: {e}")
         return {"error": str(e)}
 
-@router.get("/archive/", response_model=List[VedPassportSchema])
+# Максимальный размер страницы архива
+ARCHIVE_MAX_PAGE_SIZE = 1000
+
+def _stream_passports_ndjson(query, cursor: str, page_size: int):
+    """Потоковая выдача read-модели в NDJSON пачками по курсору"""
+    while True:
+        rows, cursor = _keyset_page(query, cursor, page_size)
+        for row in rows:
+            yield json.dumps(_passport_read_dict(row, nomenclature_dates=True), ensure_ascii=False) + "\n"
+        if cursor is None:
+            break
+
+@router.get("/archive/")
 def get_user_archive(
+    cursor: Optional[str] = None,
+    page_size: int = 100,
+    format: str = "json",
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Архив паспортов"""
+    """Архив паспортов с пагинацией по курсору
+
+    format=json - одна страница и next_cursor для следующей;
+    format=ndjson - поток всех паспортов начиная с cursor, по одному JSON на строку.
+    """
     try:
-        from sqlalchemy.orm import joinedload
-        
+        page_size = max(1, min(page_size, ARCHIVE_MAX_PAGE_SIZE))
+
         # Админы видят все архивированные паспорта, пользователи - только свои
-        query = db.query(VedPassport).options(
-            joinedload(VedPassport.nomenclature)
-        )
-        
-        if current_user.role == "admin":
-            passports = query.filter(
-                VedPassport.status == "archived"
-            ).order_by(VedPassport.created_at.desc()).all()
-        else:
-            passports = query.filter(
-                VedPassport.created_by == current_user.id,
-                VedPassport.status == "archived"
-            ).order_by(VedPassport.created_at.desc()).all()
+        query = _passport_read_query(db).filter(VedPassport.status == "archived")
+        if current_user.role != "admin":
+            query = query.filter(VedPassport.created_by == current_user.id)
+
+        if format == "ndjson":
+            if cursor:
+                _decode_cursor(cursor)
+            return StreamingResponse(
+                _stream_passports_ndjson(query, cursor, page_size),
+                media_type="application/x-ndjson"
+            )
 
-        print(f"[archive] Получено {len(passports)} архивированных паспортов для пользователя {current_user.id} (роль: {current_user.role})")
+        rows, next_cursor = _keyset_page(query, cursor, page_size)
 
-        # Создаем объекты для ответа с загруженными связанными данными
-        result_passports = []
-        for passport in passports:
-            # Загружаем создателя паспорта
-            creator = db.query(User).filter(User.id == passport.created_by).first()
+        print(f"[archive] Получено {len(rows)} архивированных паспортов для пользователя {current_user.id} (роль: {current_user.role})")
 
-            # Создаем объект для ответа
-            passport_data = {
-                "id": passport.id,
-                "passport_number": passport.passport_number,
-                "title": passport.title,
-                "description": passport.description,
-                "status": passport.status,
-                "order_number": passport.order_number,
-                "quantity": passport.quantity,
-                "created_by": passport.created_by,
-                "nomenclature_id": passport.nomenclature_id,
-                "created_at": passport.created_at,
-                "updated_at": passport.updated_at,
-                "creator": {
-                    "id": creator.id if creator else None,
-                    "username": creator.username if creator else None,
-                    "email": creator.email if creator else None,
-                    "full_name": creator.full_name if creator else None,
-                    "role": creator.role if creator else None
-                } if creator else None,
-                "nomenclature": passport.nomenclature  # Используем загруженную через joinedload
+        return {
+            "passports": [_passport_read_dict(row, nomenclature_dates=True) for row in rows],
+            "pagination": {
+                "page_size": page_size,
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None
             }
-            result_passports.append(passport_data)
-
-        return result_passports
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Ошибка при получении архива: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Внутренняя ошибка сервера: {str(e)}")
 
+# Максимальное число строк в одном многострочном INSERT
+BULK_INSERT_CHUNK_SIZE = 5000
+
+def _insert_passport_rows(db: Session, rows: List[dict]) -> Dict[str, tuple]:
+    """Вставка паспортов многострочным INSERT ... RETURNING
+
+    Возвращает словарь {номер паспорта: (id, created_at)}.
+    """
+    table = VedPassport.__table__
+    inserted = {}
+    for start in range(0, len(rows), BULK_INSERT_CHUNK_SIZE):
+        chunk = rows[start:start + BULK_INSERT_CHUNK_SIZE]
+        result = db.execute(
+            insert(table).values(chunk).returning(table.c.id, table.c.passport_number, table.c.created_at)
+        )
+        for row in result:
+            inserted[row.passport_number] = (row.id, row.created_at)
+    return inserted
+
+def _reserve_passport_numbers(db: Session, plan: List[tuple]) -> List[List[str]]:
+    """Резервирование одного блока серийных номеров на все позиции плана
+
+    plan - список пар (номенклатура, количество); для каждой позиции
+    возвращается список ее номеров паспортов в порядке следования.
+    """
+    total = sum(quantity for _, quantity in plan)
+    if total < 1:
+        return [[] for _ in plan]
+
+    block = PassportCounter.reserve_block_sync(db, total)
+    numbers = []
+    start = 0
+    for nomenclature, quantity in plan:
+        numbers.append(VedPassport.format_passport_numbers(
+            block.slice(start, quantity),
+            matrix=nomenclature.matrix or "NQ",
+            drilling_depth=nomenclature.drilling_depth,
+            product_type=nomenclature.product_type
+        ))
+        start += quantity
+    return numbers
+
 @router.post("/", response_model=APIResponse)
 def create_single_passport(
     passport_data: PassportCreateRequest,
@@ -466,40 +634,39 @@ def create_single_passport(
         if not nomenclature:
             raise HTTPException(status_code=404, detail="Номенклатура не найдена")
 
-        created_passports = []
-
-        for i in range(passport_data.quantity):
-            if passport_data.passport_number:
-                passport_number = passport_data.passport_number
-                if passport_data.quantity > 1:
-                    passport_number = f"{passport_data.passport_number}-{i+1:03d}"
+        if passport_data.passport_number:
+            if passport_data.quantity > 1:
+                passport_numbers = [
+                    f"{passport_data.passport_number}-{i+1:03d}" for i in range(passport_data.quantity)
+                ]
             else:
-                passport_number = VedPassport.generate_passport_number_sync(
-                    db=db,
-                    matrix=nomenclature.matrix or "NQ",
-                    drilling_depth=nomenclature.drilling_depth,
-                    article=nomenclature.article,
-                    product_type=nomenclature.product_type
-                )
-
-            passport = VedPassport(
-                passport_number=passport_number,
-                order_number=passport_data.order_number,
-                title=passport_data.title or f"Паспорт ВЭД {nomenclature.name}",
-                description=passport_data.description or f"Паспорт для номенклатуры {nomenclature.name}",
-                quantity=1,
-                status=passport_data.status,
-                created_by=current_user.id,
-                nomenclature_id=passport_data.nomenclature_id
-            )
+                passport_numbers = [passport_data.passport_number]
+        else:
+            # Резервируем блок серийных номеров одним запросом
+            passport_numbers = _reserve_passport_numbers(db, [(nomenclature, max(passport_data.quantity, 0))])[0]
 
-            db.add(passport)
-            db.flush()
+        rows = [
+            {
+                "passport_number": passport_number,
+                "order_number": passport_data.order_number,
+                "title": passport_data.title or f"Паспорт ВЭД {nomenclature.name}",
+                "description": passport_data.description or f"Паспорт для номенклатуры {nomenclature.name}",
+                "quantity": 1,
+                "status": passport_data.status,
+                "created_by": current_user.id,
+                "nomenclature_id": passport_data.nomenclature_id
+            }
+            for passport_number in passport_numbers
+        ]
+        inserted = _insert_passport_rows(db, rows)
 
-            created_passports.append({
-                "passport_id": passport.id,
-                "passport_number": passport.passport_number
-            })
+        created_passports = [
+            {
+                "passport_id": inserted[passport_number][0],
+                "passport_number": passport_number
+            }
+            for passport_number in passport_numbers
+        ]
 
         db.commit()
 
@@ -521,42 +688,46 @@ def create_multiple_passports(
 ):
     """Создание множественных паспортов ВЭД (синхронная сессия БД)"""
     try:
-        created_passports = []
+        # Загружаем всю номенклатуру заказа одним запросом
+        nomenclature_ids = {item.nomenclature_id for item in multiple_data.items}
+        nomenclature_by_id = {
+            n.id: n for n in db.query(VEDNomenclature).filter(VEDNomenclature.id.in_(nomenclature_ids)).all()
+        } if nomenclature_ids else {}
 
+        plan = []
         for item in multiple_data.items:
-            nomenclature = db.query(VEDNomenclature).filter(VEDNomenclature.id == item.nomenclature_id).first()
+            nomenclature = nomenclature_by_id.get(item.nomenclature_id)
             if not nomenclature:
                 raise HTTPException(status_code=404, detail=f"Номенклатура с ID {item.nomenclature_id} не найдена")
+            plan.append((nomenclature, max(item.quantity, 0)))
+
+        numbers_by_item = _reserve_passport_numbers(db, plan)
 
-            for i in range(item.quantity):
-                passport_number = VedPassport.generate_passport_number_sync(
-                    db=db,
-                    matrix=nomenclature.matrix or "NQ",
-                    drilling_depth=nomenclature.drilling_depth,
-                    article=nomenclature.article,
-                    product_type=nomenclature.product_type
-                )
-
-                passport = VedPassport(
-                    passport_number=passport_number,
-                    order_number=item.order_number,
-                    title=f"Паспорт ВЭД {nomenclature.name}",
-                    description=f"Паспорт для номенклатуры {nomenclature.name}",
-                    quantity=1,
-                    status="active",
-                    created_by=current_user.id,
-                    nomenclature_id=item.nomenclature_id
-                )
-
-                db.add(passport)
-                db.flush()
+        rows = []
+        for item, (nomenclature, _), passport_numbers in zip(multiple_data.items, plan, numbers_by_item):
+            for passport_number in passport_numbers:
+                rows.append({
+                    "passport_number": passport_number,
+                    "order_number": item.order_number,
+                    "title": f"Паспорт ВЭД {nomenclature.name}",
+                    "description": f"Паспорт для номенклатуры {nomenclature.name}",
+                    "quantity": 1,
+                    "status": "active",
+                    "created_by": current_user.id,
+                    "nomenclature_id": item.nomenclature_id
+                })
+        inserted = _insert_passport_rows(db, rows)
 
+        created_passports = []
+        for item, (nomenclature, _), passport_numbers in zip(multiple_data.items, plan, numbers_by_item):
+            for passport_number in passport_numbers:
+                passport_id, created_at = inserted[passport_number]
                 created_passports.append({
-                    "id": passport.id,
-                    "passport_number": passport.passport_number,
+                    "id": passport_id,
+                    "passport_number": passport_number,
                     "nomenclature_name": nomenclature.name,
                     "order_number": item.order_number,
-                    "created_at": passport.created_at.isoformat()
+                    "created_at": created_at.isoformat()
                 })
 
         db.commit()
@@ -575,60 +746,64 @@ def create_bulk_passports(
 ):
     """Массовое создание паспортов ВЭД (синхронная сессия БД)"""
     try:
-        created_passports = []
         errors = []
 
+        # Загружаем всю номенклатуру заказа одним запросом
+        codes = {item.code_1c for item in bulk_data.items}
+        nomenclature_by_code = {
+            n.code_1c: n for n in db.query(VEDNomenclature).filter(
+                VEDNomenclature.code_1c.in_(codes),
+                VEDNomenclature.is_active == True
+            ).all()
+        } if codes else {}
+
+        plan = []
         for item in bulk_data.items:
-            try:
-                nomenclature = db.query(VEDNomenclature).filter(
-                    VEDNomenclature.code_1c == item.code_1c,
-                    VEDNomenclature.is_active == True
-                ).first()
-
-                if not nomenclature:
-                    errors.append(f"Номенклатура с кодом {item.code_1c} не найдена")
-                    continue
-
-                for i in range(item.quantity):
-                    passport_number = VedPassport.generate_passport_number_sync(
-                        db=db,
-                        matrix=nomenclature.matrix or "NQ",
-                        drilling_depth=nomenclature.drilling_depth,
-                        article=nomenclature.article,
-                        product_type=nomenclature.product_type
-                    )
-
-                    passport = VedPassport(
-                        passport_number=passport_number,
-                        order_number=bulk_data.order_number,
-                        title=bulk_data.title or f"Паспорт ВЭД {nomenclature.name}",
-                        description=f"Массовое создание паспортов ВЭД",
-                        quantity=1,
-                        status="active",
-                        created_by=current_user.id,
-                        nomenclature_id=nomenclature.id
-                    )
-
-                    db.add(passport)
-                    db.flush()
-
-                    created_passports.append({
-                        "id": passport.id,
-                        "passport_number": passport.passport_number,
-                        "order_number": passport.order_number,
-                        "nomenclature": {
-                            "id": nomenclature.id,
-                            "code_1c": nomenclature.code_1c,
-                            "name": nomenclature.name,
-                            "matrix": nomenclature.matrix,
-                        } if nomenclature else None,
-                        "quantity": 1,
-                        "status": passport.status,
-                        "created_at": passport.created_at.isoformat()
-                    })
+            nomenclature = nomenclature_by_code.get(item.code_1c)
+            if not nomenclature:
+                errors.append(f"Номенклатура с кодом {item.code_1c} не найдена")
+                continue
+            plan.append((nomenclature, max(item.quantity, 0)))
+
+        numbers_by_item = _reserve_passport_numbers(db, plan)
+
+        # Формируем все строки в памяти
+        rows = []
+        for (nomenclature, _), passport_numbers in zip(plan, numbers_by_item):
+            rows.extend(
+                {
+                    "passport_number": passport_number,
+                    "order_number": bulk_data.order_number,
+                    "title": bulk_data.title or f"Паспорт ВЭД {nomenclature.name}",
+                    "description": f"Массовое создание паспортов ВЭД",
+                    "quantity": 1,
+                    "status": "active",
+                    "created_by": current_user.id,
+                    "nomenclature_id": nomenclature.id
+                }
+                for passport_number in passport_numbers
+            )
+        inserted = _insert_passport_rows(db, rows)
 
-            except Exception as e:
-                errors.append(f"Ошибка при создании паспорта для {item.code_1c}: {str(e)}")
+        created_passports = []
+        for (nomenclature, _), passport_numbers in zip(plan, numbers_by_item):
+            nomenclature_data = {
+                "id": nomenclature.id,
+                "code_1c": nomenclature.code_1c,
+                "name": nomenclature.name,
+                "matrix": nomenclature.matrix,
+            }
+            for passport_number in passport_numbers:
+                passport_id, created_at = inserted[passport_number]
+                created_passports.append({
+                    "id": passport_id,
+                    "passport_number": passport_number,
+                    "order_number": bulk_data.order_number,
+                    "nomenclature": nomenclature_data,
+                    "quantity": 1,
+                    "status": "active",
+                    "created_at": created_at.isoformat()
+                })
 
         db.commit()
 
@@ -655,10 +830,7 @@ async def export_bulk_pdf(
     if not passport_ids:
         raise HTTPException(status_code=400, detail="Список паспортов пуст")
     try:
-        from sqlalchemy import select
-        passports_query = select(VedPassport).where(VedPassport.id.in_(passport_ids))
-        result = await db.execute(passports_query)
-        passports = result.scalars().all()
+        passports = await _load_render_passports(db, passport_ids)
         
         if not passports:
             raise HTTPException(status_code=404, detail="Паспорта не найдены")
@@ -672,7 +844,7 @@ async def export_bulk_pdf(
         if not accessible_passports:
             raise HTTPException(status_code=403, detail="Нет доступа к указанным паспортам")
         
-        pdf_bytes = generate_bulk_passports_pdf(accessible_passports)
+        pdf_bytes = await render_cached("passports_pdf", generate_bulk_passports_pdf, passport_views(accessible_passports))
         return StreamingResponse(io.BytesIO(pdf_bytes), media_type="application/pdf", headers={
             "Content-Disposition": "attachment; filename=ved_passports.pdf"
         })
@@ -695,21 +867,17 @@ async def export_passports_pdf(
 ):
     """Экспорт паспортов в PDF"""
     try:
-        # Получаем паспорта по ID
-        passports = []
-        for passport_id in passport_ids:
-            passport = await db.get(VedPassport, passport_id)
-            if passport:
-                # Проверяем права доступа
-                if passport.created_by != current_user.id and current_user.role != "admin":
-                    continue
-                passports.append(passport)
+        # Получаем паспорта одним запросом и проверяем права доступа
+        passports = [
+            passport for passport in await _load_render_passports(db, passport_ids)
+            if passport.created_by == current_user.id or current_user.role == "admin"
+        ]
         
         if not passports:
             raise HTTPException(status_code=404, detail="Паспорта не найдены или нет доступа")
         
         # Генерируем PDF
-        pdf_content = generate_bulk_passports_pdf(passports)
+        pdf_content = await render_cached("passports_pdf", generate_bulk_passports_pdf, passport_views(passports))
         
         # Создаем поток для ответа
         pdf_stream = io.BytesIO(pdf_content)
@@ -797,7 +965,7 @@ async def export_passport_pdf(
             raise HTTPException(status_code=403, detail="Нет доступа к этому паспорту")
         
         # Генерируем PDF для одного паспорта
-        pdf_bytes = generate_bulk_passports_pdf([passport])
+        pdf_bytes = await render_cached("passports_pdf", generate_bulk_passports_pdf, passport_views([passport]))
         
         # Генерируем имя файла
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -850,44 +1018,16 @@ def export_passports_excel(
     """Экспорт всех паспортов в Excel"""
     try:
         # Получаем все паспорта в зависимости от роли пользователя
-        if current_user.role == "admin":
-            passports = db.query(VedPassport).order_by(VedPassport.created_at.desc()).all()
-        else:
-            passports = db.query(VedPassport).filter(
-                VedPassport.created_by == current_user.id
-            ).order_by(VedPassport.created_at.desc()).all()
+        query = _passport_read_query(db)
+        if current_user.role != "admin":
+            query = query.filter(VedPassport.created_by == current_user.id)
+        rows = query.order_by(VedPassport.created_at.desc()).all()
         
-        if not passports:
+        if not rows:
             raise HTTPException(status_code=404, detail="Паспорта не найдены")
         
         # Подготавливаем данные для Excel
-        data = []
-        for passport in passports:
-            # Загружаем связанные данные
-            creator = db.query(User).filter(User.id == passport.created_by).first()
-            nomenclature = db.query(VEDNomenclature).filter(VEDNomenclature.id == passport.nomenclature_id).first()
-            
-            data.append({
-                'ID паспорта': passport.id,
-                'Номер паспорта': passport.passport_number,
-                'Название': passport.title or '',
-                'Описание': passport.description or '',
-                'Статус': passport.status or '',
-                'Номер заказа': passport.order_number or '',
-                'Количество': passport.quantity or 1,
-                'Создатель': creator.full_name if creator and creator.full_name else creator.username if creator else '',
-                'Email создателя': creator.email if creator else '',
-                'Код 1С': nomenclature.code_1c if nomenclature else '',
-                'Артикул': nomenclature.article if nomenclature else '',
-                'Наименование': nomenclature.name if nomenclature else '',
-                'Матрица': nomenclature.matrix if nomenclature else '',
-                'Глубина бурения': nomenclature.drilling_depth if nomenclature else '',
-                'Высота': nomenclature.height if nomenclature else '',
-                'Резьба': nomenclature.thread if nomenclature else '',
-                'Тип продукта': nomenclature.product_type if nomenclature else '',
-                'Дата создания': passport.created_at.strftime('%d.%m.%Y %H:%M') if passport.created_at else '',
-                'Дата обновления': passport.updated_at.strftime('%d.%m.%Y %H:%M') if passport.updated_at else ''
-            })
+        data = [_passport_excel_row(row) for row in rows]
         
         # Создаем DataFrame
         df = pd.DataFrame(data)
@@ -942,47 +1082,16 @@ def export_selected_passports_excel(
             raise HTTPException(status_code=400, detail="Не выбраны паспорта для экспорта")
         
         # Получаем выбранные паспорта в зависимости от роли пользователя
-        if current_user.role == "admin":
-            passports = db.query(VedPassport).filter(
-                VedPassport.id.in_(passport_ids)
-            ).order_by(VedPassport.created_at.desc()).all()
-        else:
-            passports = db.query(VedPassport).filter(
-                VedPassport.id.in_(passport_ids),
-                VedPassport.created_by == current_user.id
-            ).order_by(VedPassport.created_at.desc()).all()
+        query = _passport_read_query(db).filter(VedPassport.id.in_(passport_ids))
+        if current_user.role != "admin":
+            query = query.filter(VedPassport.created_by == current_user.id)
+        rows = query.order_by(VedPassport.created_at.desc()).all()
         
-        if not passports:
+        if not rows:
             raise HTTPException(status_code=404, detail="Выбранные паспорта не найдены")
         
         # Подготавливаем данные для Excel
-        data = []
-        for passport in passports:
-            # Загружаем связанные данные
-            creator = db.query(User).filter(User.id == passport.created_by).first()
-            nomenclature = db.query(VEDNomenclature).filter(VEDNomenclature.id == passport.nomenclature_id).first()
-            
-            data.append({
-                'ID паспорта': passport.id,
-                'Номер паспорта': passport.passport_number,
-                'Название': passport.title or '',
-                'Описание': passport.description or '',
-                'Статус': passport.status or '',
-                'Номер заказа': passport.order_number or '',
-                'Количество': passport.quantity or 1,
-                'Создатель': creator.full_name if creator and creator.full_name else creator.username if creator else '',
-                'Email создателя': creator.email if creator else '',
-                'Код 1С': nomenclature.code_1c if nomenclature else '',
-                'Артикул': nomenclature.article if nomenclature else '',
-                'Наименование': nomenclature.name if nomenclature else '',
-                'Матрица': nomenclature.matrix if nomenclature else '',
-                'Глубина бурения': nomenclature.drilling_depth if nomenclature else '',
-                'Высота': nomenclature.height if nomenclature else '',
-                'Резьба': nomenclature.thread if nomenclature else '',
-                'Тип продукта': nomenclature.product_type if nomenclature else '',
-                'Дата создания': passport.created_at.strftime('%d.%m.%Y %H:%M') if passport.created_at else '',
-                'Дата обновления': passport.updated_at.strftime('%d.%m.%Y %H:%M') if passport.updated_at else ''
-            })
+        data = [_passport_excel_row(row) for row in rows]
         
         # Создаем DataFrame
         df = pd.DataFrame(data)
@@ -1038,11 +1147,7 @@ async def export_stickers_pdf(
             raise HTTPException(status_code=400, detail="Не выбраны паспорта для экспорта наклеек")
         
         # Получаем выбранные паспорта с загрузкой номенклатуры
-        from sqlalchemy import select
-        from sqlalchemy.orm import selectinload
-        passports_query = select(VedPassport).options(selectinload(VedPassport.nomenclature)).where(VedPassport.id.in_(passport_ids))
-        result = await db.execute(passports_query)
-        passports = result.scalars().all()
+        passports = await _load_render_passports(db, passport_ids)
         
         # Проверяем права доступа
         accessible_passports = []
@@ -1059,7 +1164,7 @@ async def export_stickers_pdf(
         sys.stdout.flush()
         
         # Генерируем PDF с наклейками через reportLab
-        pdf_bytes = generate_stickers_pdf_reportlab(accessible_passports)
+        pdf_bytes = await render_cached("stickers_pdf", generate_stickers_pdf_reportlab, passport_views(accessible_passports))
         
         # Генерируем имя файла с датой
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -1114,11 +1219,7 @@ async def export_stickers_excel(
             raise HTTPException(status_code=400, detail="Не выбраны паспорта для экспорта наклеек")
         
         # Получаем выбранные паспорта с загрузкой номенклатуры
-        from sqlalchemy import select
-        from sqlalchemy.orm import selectinload
-        passports_query = select(VedPassport).options(selectinload(VedPassport.nomenclature)).where(VedPassport.id.in_(passport_ids))
-        result = await db.execute(passports_query)
-        passports = result.scalars().all()
+        passports = await _load_render_passports(db, passport_ids)
         
         # Проверяем права доступа
         accessible_passports = []
@@ -1137,7 +1238,7 @@ async def export_stickers_excel(
         # Используем генерацию Excel из шаблона с логотипом и штрихкодами
         from backend.utils.sticker_excel_generator import generate_stickers_excel
         
-        excel_bytes = generate_stickers_excel(accessible_passports)
+        excel_bytes = await render_cached("stickers_xlsx", generate_stickers_excel, passport_views(accessible_passports))
         
         # Генерируем имя файла с датой
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -1192,11 +1293,7 @@ async def export_stickers_docx(
             raise HTTPException(status_code=400, detail="Не выбраны паспорта для экспорта наклеек")
         
         # Получаем выбранные паспорта с загрузкой номенклатуры
-        from sqlalchemy import select
-        from sqlalchemy.orm import selectinload
-        passports_query = select(VedPassport).options(selectinload(VedPassport.nomenclature)).where(VedPassport.id.in_(passport_ids))
-        result = await db.execute(passports_query)
-        passports = result.scalars().all()
+        passports = await _load_render_passports(db, passport_ids)
         
         # Проверяем права доступа
         accessible_passports = []
@@ -1216,7 +1313,7 @@ async def export_stickers_docx(
         from backend.utils.sticker_template_generator import generate_stickers_from_template
         import zipfile
         
-        docx_bytes = generate_stickers_from_template(accessible_passports)
+        docx_bytes = await render_cached("stickers_docx", generate_stickers_from_template, passport_views(accessible_passports))
         
         # КРИТИЧЕСКИ ВАЖНО: Проверяем, что это действительно DOCX (ZIP архив), а не PDF
         try:
@@ -407,6 +407,8 @@ async def upload_logo(
         
         # Сохраняем новый логотип
         logo_path.write_bytes(content)
+        from backend.utils.export_cache import get_export_cache
+        get_export_cache().invalidate()
         
         return JSONResponse({
             "message": "Логотип успешно загружен",
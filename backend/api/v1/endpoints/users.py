@@ -8,8 +8,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from datetime import datetime
 
-from backend.models import User
-from backend.api.schemas import UserCreate, UserResponse, UserUpdate
+from backend.models import User, VedPassport
+from backend.api.schemas import UserCreate, UserResponse, UserUpdate, UserWithStatsResponse
 from backend.api.auth import get_current_user, get_admin_user
 from backend.database import get_db, get_async_db
 
@@ -59,19 +59,32 @@ async def create_user(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Ошибка создания пользователя: {str(e)}")
 
-@router.get("/", response_model=List[UserResponse])
+@router.get("/", response_model=List[UserWithStatsResponse])
 async def get_users(
     current_user: User = Depends(get_admin_user),
     db: AsyncSession = Depends(get_async_db)
 ):
     """Получение списка всех пользователей (только для админов)"""
     try:
-        from sqlalchemy import select
-        users_query = select(User)
+        from sqlalchemy import select, func
+        # Количество паспортов считаем агрегирующим подзапросом, а не загрузкой связи
+        passports_count = (
+            select(VedPassport.created_by, func.count(VedPassport.id).label("passports_count"))
+            .group_by(VedPassport.created_by)
+            .subquery()
+        )
+        users_query = select(
+            User, func.coalesce(passports_count.c.passports_count, 0)
+        ).outerjoin(passports_count, passports_count.c.created_by == User.id)
         result = await db.execute(users_query)
-        users = result.scalars().all()
-        
-        return list(users)
+
+        users = []
+        for user, count in result.all():
+            user_data = UserWithStatsResponse.from_orm(user)
+            user_data.passports_count = count
+            users.append(user_data)
+
+        return users
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка получения пользователей: {str(e)}")
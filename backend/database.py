@@ -2,7 +2,7 @@
 Настройка базы данных для приложения паспортов коронок
 """
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
@@ -52,8 +52,28 @@ def get_async_session():
 
 Base = declarative_base()
 
+def _forbid_render_queries():
+    """Ошибка, если к БД обращается генератор документов
+
+    Генераторы получают только заранее загруженные view-модели
+    (backend.utils.render_executor), запрос из них - ошибка загрузки данных.
+    """
+    from backend.utils.render_executor import in_render
+    if in_render():
+        raise RuntimeError(
+            "Обращение к базе данных во время генерации документа: "
+            "данные должны быть загружены заранее в эндпоинте"
+        )
+
+def _guard_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _forbid_render_queries()
+
+for _engine in (engine, async_engine.sync_engine):
+    event.listen(_engine, "before_cursor_execute", _guard_cursor_execute)
+
 def get_db():
     """Получение сессии базы данных"""
+    _forbid_render_queries()
     db = SessionLocal()
     try:
         yield db
@@ -68,13 +88,35 @@ async def get_async_db():
         finally:
             await session.close()
 
-def create_tables():
-    """Создание таблиц в базе данных"""
-    from .models import Base
-    Base.metadata.create_all(bind=engine)
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+def _alembic_config():
+    """Конфигурация Alembic из backend/alembic.ini"""
+    from alembic.config import Config
+    return Config(ALEMBIC_INI)
+
+def run_migrations(revision: str = "head"):
+    """Применение миграций Alembic (единственное место, где меняется схема БД)"""
+    from alembic import command
+    command.upgrade(_alembic_config(), revision)
+
+def check_schema_revision():
+    """Проверка, что схема БД на последней ревизии миграций
+
+    Только читает alembic_version, DDL не выполняется. Если база отстает
+    от миграций, выбрасывает RuntimeError - приложение не должно стартовать
+    на устаревшей схеме.
+    """
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    heads = set(ScriptDirectory.from_config(_alembic_config()).get_heads())
+    with engine.connect() as conn:
+        current = set(MigrationContext.configure(conn).get_current_heads())
 
-async def create_async_tables():
-    """Создание таблиц в асинхронной базе данных"""
-    from .models import Base
-    async with async_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    if current != heads:
+        raise RuntimeError(
+            f"Схема базы данных не актуальна (ревизия {', '.join(sorted(current)) or 'отсутствует'}, "
+            f"ожидается {', '.join(sorted(heads))}). Примените миграции: python -m backend.migrate"
+        )
+    return current
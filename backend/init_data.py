@@ -4,13 +4,13 @@
 
 import asyncio
 from sqlalchemy.orm import Session
-from .database import SessionLocal, create_tables
+from .database import SessionLocal, run_migrations
 from .models import VEDNomenclature, User, PassportCounter
 
 def init_test_data():
     """Инициализация тестовых данных"""
-    # Создаем таблицы
-    create_tables()
+    # Применяем миграции
+    run_migrations()
     
     db = SessionLocal()
     try:
@@ -23,11 +23,14 @@ else:
     # Используем переменные окружения из Docker/системы
     print("ℹ️ config.env не найден, используем переменные окружения из системы")
 
-from backend.database import create_tables, create_async_tables
+from backend.database import check_schema_revision
+from backend.utils.render_executor import shutdown_render_executor
+from backend.utils.export_jobs import shutdown_export_queue
 from backend.api.v1.endpoints.passports import router as passports_router
 from backend.api.v1.endpoints.nomenclature import router as nomenclature_router
 from backend.api.v1.endpoints.users import router as users_router
 from backend.api.v1.endpoints.templates import router as templates_router
+from backend.api.v1.endpoints.exports import router as exports_router
 from backend.api.auth import router as auth_router
 
 # Создаем приложение FastAPI
@@ -57,14 +60,21 @@ app.include_router(passports_router, prefix="/api/v1/passports", tags=["Пасп
 app.include_router(nomenclature_router, prefix="/api/v1/nomenclature", tags=["Номенклатура"])
 app.include_router(users_router, prefix="/api/v1/users", tags=["Пользователи"])
 app.include_router(templates_router, prefix="/api/v1/templates", tags=["Шаблоны"])
+app.include_router(exports_router, prefix="/api/v1/exports", tags=["Экспорт"])
 
 @app.on_event("startup")
 async def startup_event():
     """Инициализация при запуске"""
-    # Создаем таблицы в базе данных
-    create_tables()
-    await create_async_tables()
-    print("✅ База данных инициализирована")
+    # Схема меняется только миграциями (python -m backend.migrate),
+    # при старте лишь проверяем ревизию и не запускаемся на устаревшей схеме
+    revision = check_schema_revision()
+    print(f"✅ Схема базы данных актуальна (ревизия {', '.join(sorted(revision))})")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Остановка при завершении"""
+    await shutdown_export_queue()
+    shutdown_render_executor()
 
 @app.get("/")
 async def root():
@@ -0,0 +1,27 @@
+"""
+Применение миграций базы данных
+
+Запуск:
+
+    python -m backend.migrate            # до последней ревизии
+    python -m backend.migrate <revision> # до указанной ревизии
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.database import run_migrations, check_schema_revision
+
+
+def main():
+    revision = sys.argv[1] if len(sys.argv) > 1 else "head"
+    print(f"⏳ Применение миграций до ревизии {revision}...")
+    run_migrations(revision)
+    if revision == "head":
+        check_schema_revision()
+    print("✅ Миграции применены")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Исходная схема базы данных
+
+Таблицы, которые раньше создавались через create_all при запуске.
+Уже существующие таблицы пропускаются, поэтому миграция применима
+и к базам, созданным предыдущими версиями приложения.
+
+Revision ID: 0001_initial_schema
+Revises:
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001_initial_schema"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing_tables = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing_tables:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String(), nullable=False, unique=True),
+            sa.Column("email", sa.String(), nullable=True, unique=True),
+            sa.Column("full_name", sa.String(), nullable=True),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("role", sa.String(), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("last_login", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+
+    if "ved_nomenclature" not in existing_tables:
+        op.create_table(
+            "ved_nomenclature",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("code_1c", sa.String(), nullable=False, unique=True),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("article", sa.String(), nullable=True),
+            sa.Column("matrix", sa.String(), nullable=True),
+            sa.Column("drilling_depth", sa.String(), nullable=True),
+            sa.Column("height", sa.String(), nullable=True),
+            sa.Column("thread", sa.String(), nullable=True),
+            sa.Column("product_type", sa.String(), nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_ved_nomenclature_id", "ved_nomenclature", ["id"])
+
+    if "passport_counters" not in existing_tables:
+        op.create_table(
+            "passport_counters",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("counter_name", sa.String(), nullable=False, unique=True),
+            sa.Column("current_value", sa.Integer(), nullable=True),
+            sa.Column("prefix", sa.String(), nullable=True),
+            sa.Column("suffix", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_passport_counters_id", "passport_counters", ["id"])
+
+    if "ved_passports" not in existing_tables:
+        op.create_table(
+            "ved_passports",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("passport_number", sa.String(), nullable=False, unique=True),
+            sa.Column("title", sa.String(), nullable=True),
+            sa.Column("description", sa.String(), nullable=True),
+            sa.Column("status", sa.String(), nullable=True),
+            sa.Column("order_number", sa.String(), nullable=False),
+            sa.Column("quantity", sa.Integer(), nullable=True),
+            sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.id", ondelete="SET NULL"), nullable=True),
+            sa.Column("nomenclature_id", sa.Integer(), sa.ForeignKey("ved_nomenclature.id"), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_ved_passports_id", "ved_passports", ["id"])
+
+
+def downgrade():
+    op.drop_table("ved_passports")
+    op.drop_table("passport_counters")
+    op.drop_table("ved_nomenclature")
+    op.drop_table("users")
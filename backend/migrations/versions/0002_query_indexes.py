@@ -0,0 +1,44 @@
+"""Индексы под основные запросы списков, архива и экспорта
+
+- ved_passports(created_by, status, created_at DESC, id DESC) - списки и архив пользователя;
+- ved_passports(created_at DESC, id DESC) - списки администратора и пагинация по курсору;
+- ved_passports(order_number) - orders-summary и фильтр по заказу;
+- ved_passports(nomenclature_id) - проверка связанных паспортов при удалении номенклатуры;
+- ved_nomenclature(code_1c) WHERE is_active - выборки активной номенклатуры.
+
+Индексы создаются CONCURRENTLY, чтобы не блокировать запись в рабочей базе.
+
+Revision ID: 0002_query_indexes
+Revises: 0001_initial_schema
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+
+
+revision = "0002_query_indexes"
+down_revision = "0001_initial_schema"
+branch_labels = None
+depends_on = None
+
+
+INDEXES = (
+    ("ix_ved_passports_created_by_status_created_at", "ved_passports", "(created_by, status, created_at DESC, id DESC)", ""),
+    ("ix_ved_passports_created_at_id", "ved_passports", "(created_at DESC, id DESC)", ""),
+    ("ix_ved_passports_order_number", "ved_passports", "(order_number)", ""),
+    ("ix_ved_passports_nomenclature_id", "ved_passports", "(nomenclature_id)", ""),
+    ("ix_ved_nomenclature_active_code_1c", "ved_nomenclature", "(code_1c)", " WHERE is_active"),
+)
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {columns}{where}")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _, _, _ in reversed(INDEXES):
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
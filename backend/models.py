@@ -2,14 +2,23 @@
 Модели данных для приложения создания паспортов коронок
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, update, text, bindparam, event
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError, ProgrammingError
+from typing import List, NamedTuple, Sequence
 import datetime
+import os
+
+# Способ выдачи серийных номеров паспортов:
+# "sequence" - последовательности PostgreSQL по годам (без блокировки общей строки),
+# "row" - атомарный UPDATE строки passport_counters
+PASSPORT_COUNTER_BACKEND = os.getenv("PASSPORT_COUNTER_BACKEND", "sequence")
 
 Base = declarative_base()
 
@@ -30,6 +39,10 @@ class VEDNomenclature(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        Index("ix_ved_nomenclature_active_code_1c", "code_1c", postgresql_where=is_active),
+    )
+
 class VedPassport(Base):
     """ВЭД паспорта"""
     __tablename__ = "ved_passports"
@@ -46,13 +59,21 @@ class VedPassport(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Индексы под основные запросы (см. миграцию 0002_query_indexes)
+    __table_args__ = (
+        Index("ix_ved_passports_created_by_status_created_at", created_by, status, created_at.desc(), id.desc()),
+        Index("ix_ved_passports_created_at_id", created_at.desc(), id.desc()),
+        Index("ix_ved_passports_order_number", order_number),
+        Index("ix_ved_passports_nomenclature_id", nomenclature_id),
+    )
+
     # Связи
     creator = relationship("User", foreign_keys=[created_by], lazy="selectin")
     nomenclature = relationship("VEDNomenclature", lazy="selectin")
 
     @staticmethod
-    async def generate_passport_number(db: AsyncSession, matrix: str, drilling_depth: str = None, article: str = None, product_type: str = None) -> str:
-        """Генерация номера паспорта используя счетчик из БД
+    def format_passport_number(serial: int, year_suffix: str, matrix: str, drilling_depth: str = None, product_type: str = None) -> str:
+        """Форматирование номера паспорта по серийному номеру (без обращения к БД)
 
         Правила генерации номеров паспортов:
         Коронки: AGB [Глубина бурения] [Матрица] [Серийный номер] [Год]
@@ -61,87 +82,52 @@ class VedPassport(Base):
         Расширители и башмаки: AGB [Матрица] [Серийный номер] [Год]
         Пример: AGB NQ 000001 25
         """
-        current_year = datetime.datetime.now().year
-        current_year_suffix = str(current_year)[-2:]  # Последние 2 цифры года
-        counter_name = f"ved_passport_{current_year}"
-
-        # Получаем или создаем счетчик для текущего года
-        result = await db.execute(
-            select(PassportCounter).where(PassportCounter.counter_name == counter_name)
-        )
-        counter = result.scalar_one_or_none()
-
-        if not counter:
-            # Создаем новый счетчик для текущего года
-            counter = PassportCounter(
-                counter_name=counter_name,
-                current_value=0,
-                prefix="",
-                suffix=current_year_suffix
-            )
-            db.add(counter)
-            await db.flush()
-            print(f"DEBUG: Created new counter for year {current_year}")
-
-        # Увеличиваем счетчик
-        counter.current_value += 1
-        await db.flush()
-
         # Форматируем серийный номер с ведущими нулями
-        serial_number = str(counter.current_value).zfill(6)
+        serial_number = str(serial).zfill(6)
 
-        # Формируем номер паспорта согласно правилам
-        if product_type and product_type.lower() in ["коронка", "корона"]:
+        if product_type and product_type.lower() in ["коронка", "корона"] and drilling_depth:
             # Коронки: AGB [Глубина бурения] [Матрица] [Серийный номер] [Год]
-            if drilling_depth:
-                passport_number = f"AGB {drilling_depth} {matrix} {serial_number} {current_year_suffix}"
-            else:
-                passport_number = f"AGB {matrix} {serial_number} {current_year_suffix}"
-        elif product_type in ["расширитель", "башмак"]:
-            # Расширители и башмаки: AGB [Матрица] [Серийный номер] [Год]
-            passport_number = f"AGB {matrix} {serial_number} {current_year_suffix}"
-        else:
-            # Если тип продукта не определен, используем общий формат
-            passport_number = f"AGB {matrix} {serial_number} {current_year_suffix}"
-
-        print(f"DEBUG: Generated passport number: {passport_number} (serial: {counter.current_value}, year: {current_year}, type: {product_type})")
-        return passport_number
+            return f"AGB {drilling_depth} {matrix} {serial_number} {year_suffix}"
+
+        # Коронки без глубины, расширители, башмаки и неопределенный тип продукта
+        return f"AGB {matrix} {serial_number} {year_suffix}"
+
+    @staticmethod
+    def format_passport_numbers(block: "SerialBlock", matrix: str, drilling_depth: str = None, product_type: str = None) -> List[str]:
+        """Форматирование номеров паспортов для зарезервированного блока серийных номеров"""
+        return [
+            VedPassport.format_passport_number(serial, block.year_suffix, matrix, drilling_depth, product_type)
+            for serial in block.serials
+        ]
+
+    @staticmethod
+    async def generate_passport_number(db: AsyncSession, matrix: str, drilling_depth: str = None, article: str = None, product_type: str = None) -> str:
+        """Генерация номера паспорта используя счетчик из БД"""
+        block = await PassportCounter.reserve_block(db, 1)
+        return VedPassport.format_passport_number(block.first, block.year_suffix, matrix, drilling_depth, product_type)
 
     @staticmethod
     def generate_passport_number_sync(db: Session, matrix: str, drilling_depth: str = None, article: str = None, product_type: str = None) -> str:
         """Синхронная генерация номера паспорта (для использования с Session/get_db)."""
-        current_year = datetime.datetime.now().year
-        current_year_suffix = str(current_year)[-2:]
-        counter_name = f"ved_passport_{current_year}"
-
-        counter = db.query(PassportCounter).filter(PassportCounter.counter_name == counter_name).first()
-
-        if not counter:
-            counter = PassportCounter(
-                counter_name=counter_name,
-                current_value=0,
-                prefix="",
-                suffix=current_year_suffix
-            )
-            db.add(counter)
-            db.flush()
-
-        counter.current_value += 1
-        db.flush()
-
-        serial_number = str(counter.current_value).zfill(6)
-
-        if product_type and product_type.lower() in ["коронка", "корона"]:
-            if drilling_depth:
-                passport_number = f"AGB {drilling_depth} {matrix} {serial_number} {current_year_suffix}"
-            else:
-                passport_number = f"AGB {matrix} {serial_number} {current_year_suffix}"
-        elif product_type in ["расширитель", "башмак"]:
-            passport_number = f"AGB {matrix} {serial_number} {current_year_suffix}"
-        else:
-            passport_number = f"AGB {matrix} {serial_number} {current_year_suffix}"
-
-        return passport_number
+        block = PassportCounter.reserve_block_sync(db, 1)
+        return VedPassport.format_passport_number(block.first, block.year_suffix, matrix, drilling_depth, product_type)
+
+class SerialBlock(NamedTuple):
+    """Блок серийных номеров, зарезервированный в счетчике"""
+    serials: Sequence[int]
+    year_suffix: str
+
+    @property
+    def first(self) -> int:
+        return self.serials[0]
+
+    @property
+    def count(self) -> int:
+        return len(self.serials)
+
+    def slice(self, start: int, count: int) -> "SerialBlock":
+        """Часть блока для одной позиции заказа"""
+        return SerialBlock(serials=self.serials[start:start + count], year_suffix=self.year_suffix)
 
 class PassportCounter(Base):
     """Счетчики для ВЭД паспортов"""
@@ -155,6 +141,183 @@ class PassportCounter(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Имена последовательностей, существование которых уже проверено в этом процессе.
+    # Пополняется только после коммита транзакции, в которой последовательность
+    # найдена или создана (см. _remember_sequence): to_regclass видит и
+    # последовательность из собственной незакоммиченной транзакции, а после
+    # ее отката запись в кэше ломала бы nextval до перезапуска процесса
+    _known_sequences = set()
+
+    @staticmethod
+    def _current_counter():
+        """Имя счетчика и суффикс для текущего года"""
+        current_year = datetime.datetime.now().year
+        return f"ved_passport_{current_year}", str(current_year)[-2:]
+
+    @staticmethod
+    def _reserve_statements(counter_name: str, year_suffix: str, count: int):
+        """SQL для атомарного резервирования блока и создания счетчика года"""
+        table = PassportCounter.__table__
+        reserve = (
+            update(table)
+            .where(table.c.counter_name == counter_name)
+            .values(current_value=func.coalesce(table.c.current_value, 0) + count, updated_at=func.now())
+            .returning(table.c.current_value)
+        )
+        create = (
+            pg_insert(table)
+            .values(counter_name=counter_name, current_value=0, prefix="", suffix=year_suffix)
+            .on_conflict_do_nothing(index_elements=[table.c.counter_name])
+        )
+        return reserve, create
+
+    @staticmethod
+    def _sequence_statements(counter_name: str, count: int):
+        """SQL для выдачи номеров из последовательности года и обновления зеркала в passport_counters
+
+        Зеркало обновляется только если его строка не заблокирована другой
+        транзакцией (SKIP LOCKED), поэтому выдача номеров не сериализуется
+        на одной строке. Значение в passport_counters служит для отображения
+        и может отставать до следующего создания паспортов.
+        """
+        table = PassportCounter.__table__
+        # Имя последовательности совпадает с именем счетчика: ved_passport_<год>
+        draw = text("SELECT nextval(:sequence) AS serial FROM generate_series(1, :count)").bindparams(
+            sequence=counter_name, count=count
+        )
+        locked_row = (
+            select(table.c.id)
+            .where(table.c.counter_name == counter_name)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        mirror = (
+            update(table)
+            .where(table.c.id == locked_row)
+            .values(current_value=func.greatest(func.coalesce(table.c.current_value, 0), bindparam("last_value")), updated_at=func.now())
+        )
+        return draw, mirror
+
+    @staticmethod
+    def _create_sequence_statements(counter_name: str):
+        """SQL для ленивого создания последовательности года с продолжением значения счетчика"""
+        table = PassportCounter.__table__
+        exists = text("SELECT to_regclass(:sequence) IS NOT NULL").bindparams(sequence=counter_name)
+        current = select(table.c.current_value).where(table.c.counter_name == counter_name)
+        # Имя строится только из номера года, поэтому подстановка в DDL безопасна
+        create = f"CREATE SEQUENCE IF NOT EXISTS {counter_name} START WITH %d"
+        return exists, current, create
+
+    @staticmethod
+    def _remember_sequence(db: Session, counter_name: str):
+        """Добавление последовательности в _known_sequences после коммита транзакции"""
+        db.info.setdefault("passport_sequences", set()).add(counter_name)
+
+    @staticmethod
+    def _ensure_sequence_sync(db: Session, counter_name: str, year_suffix: str):
+        """Создание последовательности года, если ее еще нет"""
+        if counter_name in PassportCounter._known_sequences:
+            return
+
+        exists, current, create = PassportCounter._create_sequence_statements(counter_name)
+        if not db.execute(exists).scalar():
+            start = (db.execute(current).scalar() or 0) + 1
+            try:
+                # Параллельный воркер может создать последовательность одновременно с нами
+                with db.begin_nested():
+                    db.execute(text(create % start))
+            except (IntegrityError, ProgrammingError):
+                pass
+            # Строка-зеркало для отображения текущего значения
+            db.execute(PassportCounter._reserve_statements(counter_name, year_suffix, 0)[1])
+        PassportCounter._remember_sequence(db, counter_name)
+
+    @staticmethod
+    async def _ensure_sequence(db: AsyncSession, counter_name: str, year_suffix: str):
+        """Асинхронное создание последовательности года (см. _ensure_sequence_sync)"""
+        if counter_name in PassportCounter._known_sequences:
+            return
+
+        exists, current, create = PassportCounter._create_sequence_statements(counter_name)
+        if not (await db.execute(exists)).scalar():
+            start = ((await db.execute(current)).scalar() or 0) + 1
+            try:
+                async with db.begin_nested():
+                    await db.execute(text(create % start))
+            except (IntegrityError, ProgrammingError):
+                pass
+            await db.execute(PassportCounter._reserve_statements(counter_name, year_suffix, 0)[1])
+        PassportCounter._remember_sequence(db.sync_session, counter_name)
+
+    @staticmethod
+    def reserve_block_sync(db: Session, count: int) -> SerialBlock:
+        """Резервирование блока из count серийных номеров
+
+        В режиме "sequence" номера выдаются из последовательности PostgreSQL
+        ved_passport_<год> (nextval/generate_series) без блокировки общей строки;
+        при параллельных запросах блок может быть не непрерывным.
+        В режиме "row" блок выдается одним UPDATE passport_counters ... RETURNING,
+        строка счетчика остается заблокированной до конца транзакции.
+        """
+        if count < 1:
+            raise ValueError("Количество резервируемых номеров должно быть больше нуля")
+
+        counter_name, year_suffix = PassportCounter._current_counter()
+
+        if PASSPORT_COUNTER_BACKEND == "sequence":
+            PassportCounter._ensure_sequence_sync(db, counter_name, year_suffix)
+            draw, mirror = PassportCounter._sequence_statements(counter_name, count)
+            serials = sorted(db.execute(draw).scalars().all())
+            db.execute(mirror, {"last_value": serials[-1]})
+            return SerialBlock(serials=serials, year_suffix=year_suffix)
+
+        reserve, create = PassportCounter._reserve_statements(counter_name, year_suffix, count)
+
+        last_value = db.execute(reserve).scalar()
+        if last_value is None:
+            # Счетчика для текущего года еще нет - создаем и повторяем резервирование
+            db.execute(create)
+            last_value = db.execute(reserve).scalar()
+
+        return SerialBlock(serials=range(last_value - count + 1, last_value + 1), year_suffix=year_suffix)
+
+    @staticmethod
+    async def reserve_block(db: AsyncSession, count: int) -> SerialBlock:
+        """Асинхронное резервирование блока серийных номеров (см. reserve_block_sync)"""
+        if count < 1:
+            raise ValueError("Количество резервируемых номеров должно быть больше нуля")
+
+        counter_name, year_suffix = PassportCounter._current_counter()
+
+        if PASSPORT_COUNTER_BACKEND == "sequence":
+            await PassportCounter._ensure_sequence(db, counter_name, year_suffix)
+            draw, mirror = PassportCounter._sequence_statements(counter_name, count)
+            serials = sorted((await db.execute(draw)).scalars().all())
+            await db.execute(mirror, {"last_value": serials[-1]})
+            return SerialBlock(serials=serials, year_suffix=year_suffix)
+
+        reserve, create = PassportCounter._reserve_statements(counter_name, year_suffix, count)
+
+        last_value = (await db.execute(reserve)).scalar()
+        if last_value is None:
+            await db.execute(create)
+            last_value = (await db.execute(reserve)).scalar()
+
+        return SerialBlock(serials=range(last_value - count + 1, last_value + 1), year_suffix=year_suffix)
+
+@event.listens_for(Session, "after_commit")
+def _cache_committed_sequences(session):
+    """Последовательности закоммиченной транзакции - в кэш PassportCounter"""
+    # after_commit вызывается и при RELEASE SAVEPOINT - ждем коммита всей транзакции
+    if not session.in_nested_transaction():
+        PassportCounter._known_sequences.update(session.info.pop("passport_sequences", ()))
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_sequences(session):
+    """Последовательности откаченной транзакции не кэшируются"""
+    if not session.in_nested_transaction():
+        session.info.pop("passport_sequences", None)
+
 class User(Base):
     """Пользователи системы"""
     __tablename__ = "users"
@@ -171,4 +334,5 @@ class User(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Связи
-    created_passports = relationship("VedPassport", foreign_keys="VedPassport.created_by", lazy="selectin")
+    # Загружается по требованию запросом, чтобы get_current_user не тянул всю историю паспортов
+    created_passports = relationship("VedPassport", foreign_keys="VedPassport.created_by", lazy="dynamic", overlaps="creator")
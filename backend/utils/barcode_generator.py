@@ -1,80 +1,84 @@
 """
 Генератор штрихкодов для наклеек
+
+Для PDF штрихкоды рисуются векторно (draw_code128, Code128Flowable): без
+временных файлов и с четкими штрихами при любом разрешении печати. Для
+DOCX/XLSX, где нужна картинка, - generate_barcode_image: 1-битный PNG с
+модулями в целых пикселях при BARCODE_DPI рисуется в памяти и кэшируется
+(LRU на BARCODE_CACHE_SIZE записей в процессе).
 """
+import io
 import os
-import tempfile
+import threading
+from collections import OrderedDict
 from typing import Optional
 
+from reportlab.graphics.barcode.code128 import Code128
+from reportlab.lib.units import mm
+from reportlab.platypus import Flowable
+
+# Размер шрифта подписи под векторным штрихкодом, pt
+BARCODE_TEXT_SIZE = 7
+
+# Разрешение растровых штрихкодов (DOCX/XLSX) - разрешение принтера наклеек
+BARCODE_DPI = int(os.getenv("BARCODE_DPI", "600"))
+# Зона тишины по краям растрового штрихкода, модулей (минимум по Code128)
+QUIET_ZONE_MODULES = 10
+
+# Количество PNG штрихкодов в кэше процесса (0 - без кэша)
+BARCODE_CACHE_SIZE = int(os.getenv("BARCODE_CACHE_SIZE", "1024"))
 
-def generate_barcode_image(code: str, width_mm: float = 40, height_mm: float = 8) -> Optional[str]:
+# Кэш PNG штрихкодов: (код, ширина, высота, dpi) -> bytes (LRU в пределах процесса)
+_barcode_cache = OrderedDict()
+_barcode_cache_lock = threading.Lock()
+_barcode_cache_stats = {"hits": 0, "misses": 0}
+
+
+def render_barcode_png(code: str, width_mm: float = 40, height_mm: float = 10, dpi: Optional[int] = None) -> Optional[bytes]:
     """
-    Генерирует изображение штрихкода для заданного кода
+    Рисует штрихкод Code128 в 1-битный PNG (без кэша и временных файлов)
+    
+    Каждый модуль штрихкода занимает целое число пикселей при заданном dpi,
+    поэтому изображение не масштабируется и не размывается. Ширина модуля -
+    наибольшая, при которой штрихи и зоны тишины по QUIET_ZONE_MODULES
+    модулей с каждой стороны помещаются в width_mm; остаток ширины делится
+    между зонами тишины.
     
     Args:
         code: Текст для кодирования в штрихкод
-        width_mm: Ширина штрихкода в миллиметрах (по умолчанию 40мм для узкого штрихкода)
-        height_mm: Высота штрихкода в миллиметрах (по умолчанию 8мм)
+        width_mm: Ширина штрихкода в миллиметрах
+        height_mm: Высота штрихкода в миллиметрах
+        dpi: Разрешение печати (по умолчанию BARCODE_DPI)
     
     Returns:
-        Путь к временному файлу с изображением штрихкода или None при ошибке
+        Содержимое PNG или None при ошибке
     """
     try:
         import barcode
-        from barcode.writer import ImageWriter
         from PIL import Image
         
-        # Используем Code128 для компактного штрихкода
-        code128 = barcode.get_barcode_class('code128')
-        barcode_instance = code128(code, writer=ImageWriter())
-        
-        # Создаем временный файл для изображения (без расширения, так как barcode.save добавляет его сам)
-        temp_file = tempfile.NamedTemporaryFile(delete=False)
-        temp_path_base = temp_file.name
-        temp_file.close()
-        
-        # Генерируем штрихкод с настройками для высокого качества
-        # Используем высокое разрешение для четкости
-        dpi = 600  # Высокое разрешение для печати
-        pixels_per_mm = dpi / 25.4  # Пикселей на миллиметр
-        
-        options = {
-            'module_width': 0.3,  # Немного шире для читаемости
-            'module_height': height_mm * pixels_per_mm,  # Высота в пикселях при 600dpi
-            'quiet_zone': 2.0,  # Зона тишины для надежности
-            'font_size': 10,  # Читаемый шрифт
-            'text_distance': 2.0,  # Расстояние от текста до штрихкода
-            'write_text': True,  # Показывать текст под штрихкодом
-        }
-        
-        # Сохраняем штрихкод (библиотека добавит расширение .png)
-        barcode_instance.save(temp_path_base, options=options)
-        
-        # Библиотека добавляет расширение .png к пути
-        temp_path = temp_path_base + '.png'
+        dpi = dpi or BARCODE_DPI
+        # Модули Code128: '1' - штрих, '0' - пробел
+        modules = barcode.get_barcode_class('code128')(code).build()[0]
         
-        # Проверяем, что файл создан
-        if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
-            print(f"   ⚠️ Файл штрихкода не создан или пуст: {temp_path}")
-            # Пробуем найти файл без расширения
-            if os.path.exists(temp_path_base) and os.path.getsize(temp_path_base) > 0:
-                temp_path = temp_path_base
-            else:
-                return None
+        width_px = round(width_mm * dpi / 25.4)
+        height_px = max(1, round(height_mm * dpi / 25.4))
+        module_px = max(1, width_px // (len(modules) + 2 * QUIET_ZONE_MODULES))
+        bars_px = len(modules) * module_px
+        width_px = max(width_px, bars_px + 2 * QUIET_ZONE_MODULES * module_px)
+        left_px = (width_px - bars_px) // 2
         
-        # Изменяем размер изображения до нужной ширины с высоким качеством
-        img = Image.open(temp_path)
-        # Вычисляем новую ширину в пикселях при 600dpi
-        target_width_px = int(width_mm * pixels_per_mm)
-        target_height_px = int(height_mm * pixels_per_mm)
+        # Одна строка пикселей (0 - черный), растянутая по высоте без интерполяции
+        row = bytearray(b'\xff' * width_px)
+        for i, module in enumerate(modules):
+            if module == '1':
+                start_px = left_px + i * module_px
+                row[start_px:start_px + module_px] = b'\x00' * module_px
+        img = Image.frombytes('L', (width_px, 1), bytes(row)).resize((width_px, height_px), Image.NEAREST).convert('1')
         
-        # Используем resize вместо thumbnail для точного размера и лучшего качества
-        img_resized = img.resize((target_width_px, target_height_px), Image.Resampling.LANCZOS)
-        
-        # Сохраняем измененное изображение с высоким DPI
-        img_resized.save(temp_path, 'PNG', dpi=(dpi, dpi))
-        
-        print(f"   ✅ Штрихкод создан: {code} (размер: {width_mm}x{height_mm}мм)")
-        return temp_path
+        buffer = io.BytesIO()
+        img.save(buffer, 'PNG', dpi=(dpi, dpi), optimize=True)
+        return buffer.getvalue()
         
     except ImportError:
         print(f"   ⚠️ Библиотека python-barcode не установлена, штрихкод не будет создан")
@@ -84,3 +88,134 @@ def generate_barcode_image(code: str, width_mm: float = 40, height_mm: float = 8
         import traceback
         traceback.print_exc()
         return None
+
+
+def barcode_png(code: str, width_mm: float = 40, height_mm: float = 10, dpi: Optional[int] = None) -> Optional[bytes]:
+    """PNG штрихкода из кэша или новый (с сохранением в кэш)
+
+    Кэш живет в процессе генерации (render_executor): штрихкод артикула
+    одинаков для всех наклеек одной номенклатуры и рисуется один раз.
+    """
+    dpi = dpi or BARCODE_DPI
+    key = (code, width_mm, height_mm, dpi)
+    with _barcode_cache_lock:
+        content = _barcode_cache.get(key)
+        if content is not None:
+            _barcode_cache.move_to_end(key)
+            _barcode_cache_stats["hits"] += 1
+            return content
+        _barcode_cache_stats["misses"] += 1
+
+    content = render_barcode_png(code, width_mm, height_mm, dpi)
+    if content is None:
+        return None
+    print(f"   ✅ Штрихкод создан: {code} (размер: {width_mm}x{height_mm}мм)")
+    if BARCODE_CACHE_SIZE > 0:
+        with _barcode_cache_lock:
+            _barcode_cache[key] = content
+            while len(_barcode_cache) > BARCODE_CACHE_SIZE:
+                _barcode_cache.popitem(last=False)
+    return content
+
+
+def generate_barcode_image(code: str, width_mm: float = 40, height_mm: float = 10, dpi: Optional[int] = None) -> Optional[io.BytesIO]:
+    """
+    Изображение штрихкода для вставки в DOCX/XLSX
+    
+    Args:
+        code: Текст для кодирования в штрихкод
+        width_mm: Ширина штрихкода в миллиметрах (по умолчанию 40мм для узкого штрихкода)
+        height_mm: Высота штрихкода в миллиметрах
+        dpi: Разрешение печати (по умолчанию BARCODE_DPI)
+    
+    Returns:
+        PNG в новом BytesIO (каждый вызов - свой поток: openpyxl закрывает его
+        при сохранении книги) или None при ошибке
+    """
+    content = barcode_png(code, width_mm, height_mm, dpi)
+    return io.BytesIO(content) if content is not None else None
+
+
+def barcode_cache_stats() -> dict:
+    """Статистика кэша штрихкодов текущего процесса"""
+    with _barcode_cache_lock:
+        hits = _barcode_cache_stats["hits"]
+        misses = _barcode_cache_stats["misses"]
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "entries": len(_barcode_cache),
+            "size_bytes": sum(len(content) for content in _barcode_cache.values()),
+            "max_entries": BARCODE_CACHE_SIZE,
+        }
+
+
+def report_barcode_cache(prefix: str = ""):
+    """Вывод статистики кэша штрихкодов в лог (после выгрузки)"""
+    stats = barcode_cache_stats()
+    print(
+        f"📊 {prefix}Кэш штрихкодов: попаданий {stats['hits']}, промахов {stats['misses']} "
+        f"({stats['hit_rate']:.0%}), записей {stats['entries']}/{stats['max_entries']}"
+    )
+
+
+def code128(code: str, width: float, bar_height: float) -> Optional[Code128]:
+    """Штрихкод Code128 с шириной штрихов, подобранной под ширину width (pt)
+
+    Возвращает None, если код нельзя закодировать (не ASCII символы).
+    """
+    barcode = Code128(code, barWidth=1, barHeight=bar_height, quiet=False, humanReadable=False)
+    modules = barcode.width
+    if not barcode.valid or not modules:
+        print(f"   ⚠️ Код '{code}' нельзя закодировать в Code128")
+        return None
+    barcode.barWidth = width / modules
+    return barcode
+
+
+def draw_code128(canvas, code: str, x: float, y: float, width_mm: float = 40, height_mm: float = 10,
+                 font_name: str = 'Helvetica') -> bool:
+    """
+    Рисует векторный штрихкод Code128 с подписью на canvas reportlab
+
+    Args:
+        canvas: reportlab canvas
+        code: Текст для кодирования в штрихкод
+        x, y: Левый нижний угол области штрихкода (pt)
+        width_mm: Ширина штрихкода в миллиметрах
+        height_mm: Высота штрихкода вместе с подписью в миллиметрах
+        font_name: Шрифт подписи
+
+    Returns:
+        True, если штрихкод нарисован
+    """
+    text_height = BARCODE_TEXT_SIZE * 1.2
+    width = width_mm * mm
+    barcode = code128(code, width, height_mm * mm - text_height)
+    if barcode is None:
+        return False
+    canvas.setFillColorRGB(0, 0, 0)
+    barcode.drawOn(canvas, x, y + text_height)
+    canvas.setFont(font_name, BARCODE_TEXT_SIZE)
+    canvas.drawCentredString(x + width / 2, y + BARCODE_TEXT_SIZE * 0.3, code)
+    return True
+
+
+class Code128Flowable(Flowable):
+    """Векторный штрихкод Code128 с подписью для platypus (см. draw_code128)"""
+
+    def __init__(self, code: str, width_mm: float = 40, height_mm: float = 10, font_name: str = 'Helvetica'):
+        Flowable.__init__(self)
+        self.code = code
+        self.width_mm = width_mm
+        self.height_mm = height_mm
+        self.font_name = font_name
+        self.width = width_mm * mm
+        self.height = height_mm * mm
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        draw_code128(self.canv, self.code, 0, 0, self.width_mm, self.height_mm, self.font_name)
@@ -0,0 +1,202 @@
+"""
+Кэш готовых выгрузок паспортов и наклеек на диске
+
+Повторная печать наклеек или паспортов того же заказа отдается из кэша без
+повторной генерации. Ключ - SHA-256 от:
+
+    - формата выгрузки;
+    - паспортов, отсортированных по id (id, updated_at и остальные поля
+      view-модели, включая номенклатуру);
+    - хэша шаблона из TemplateManager, используемого форматом;
+    - хэша логотипа;
+    - версии макета формата (EXPORT_LAYOUT_SETTINGS), чтобы после
+      изменения макета при обновлении не отдавались файлы по старому.
+
+При превышении EXPORT_CACHE_MAX_MB удаляются давно не использованные файлы
+(LRU по времени последнего обращения). Загрузка или восстановление шаблона
+и загрузка логотипа очищают кэш целиком.
+"""
+
+import functools
+import hashlib
+import importlib
+import os
+import tempfile
+from typing import Callable, List, Optional
+
+from backend.utils.render_executor import run_render, PassportView
+from backend.utils.template_manager import get_template_manager
+
+EXPORT_CACHE_DIR = os.getenv("EXPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "agb_export_cache"))
+EXPORT_CACHE_MAX_MB = int(os.getenv("EXPORT_CACHE_MAX_MB", "512"))
+
+# Формат выгрузки -> тип шаблона TemplateManager (None - шаблон не используется)
+EXPORT_TEMPLATES = {
+    "passports_pdf": "passport",
+    "stickers_pdf": None,
+    "stickers_docx": "sticker",
+    "stickers_xlsx": "sticker",
+}
+
+
+# Формат выгрузки -> настройки генераторов (модуль backend.utils, имя), от
+# которых зависит содержимое файла; значения читаются при расчете ключа
+EXPORT_LAYOUT_SETTINGS = {
+    "passports_pdf": (("pdf_generator", "PASSPORT_LAYOUT_VERSION"), ("pdf_generator", "PASSPORT_PDF_RENDERER")),
+    "stickers_pdf": (("pdf_generator", "STICKER_LAYOUT_VERSION"), ("pdf_generator", "STICKER_PDF_RENDERER")),
+    # Растровые штрихкоды DOCX и XLSX зависят от разрешения и зоны тишины
+    "stickers_docx": (
+        ("pdf_generator", "STICKER_LAYOUT_VERSION"),
+        ("sticker_template_generator", "STICKER_DOCX_RENDERER"),
+        ("barcode_generator", "BARCODE_DPI"),
+        ("barcode_generator", "QUIET_ZONE_MODULES"),
+    ),
+    "stickers_xlsx": (
+        ("pdf_generator", "STICKER_LAYOUT_VERSION"),
+        ("barcode_generator", "BARCODE_DPI"),
+        ("barcode_generator", "QUIET_ZONE_MODULES"),
+    ),
+}
+
+
+def export_layout(export_format: str) -> tuple:
+    """Текущие значения настроек формата из EXPORT_LAYOUT_SETTINGS"""
+    return tuple(
+        (f"{module_name}.{name}", getattr(importlib.import_module(f"backend.utils.{module_name}"), name))
+        for module_name, name in EXPORT_LAYOUT_SETTINGS.get(export_format, ())
+    )
+
+
+class ExportCache:
+    """Дисковый LRU-кэш выгрузок с адресацией по содержимому"""
+
+    def __init__(self, directory: str = EXPORT_CACHE_DIR, max_bytes: int = EXPORT_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, export_format: str, passports: List[PassportView]) -> str:
+        """Ключ выгрузки для набора паспортов"""
+        manager = get_template_manager()
+        template_type = EXPORT_TEMPLATES.get(export_format)
+        digest = hashlib.sha256()
+        digest.update(export_format.encode("utf-8"))
+        digest.update(repr(manager.get_template_hash(template_type) if template_type else None).encode("utf-8"))
+        digest.update(repr(manager.get_logo_hash()).encode("utf-8"))
+        digest.update(repr(export_layout(export_format)).encode("utf-8"))
+        for passport in sorted(passports, key=lambda p: p.id):
+            digest.update(repr(tuple(passport)).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Содержимое выгрузки или None"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+            os.utime(path)  # Отмечаем использование для LRU
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return content
+
+    def put(self, key: str, content: bytes):
+        """Сохранение выгрузки с вытеснением старых записей"""
+        if len(content) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Не удалось сохранить выгрузку в кэш: {e}")
+            return
+        self._evict()
+
+    def _entries(self):
+        """Записи кэша: (время использования, размер, путь)"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        """Удаление давно не использованных записей сверх лимита"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total -= size
+
+    def invalidate(self):
+        """Очистка кэша (при смене шаблона или логотипа)"""
+        removed = 0
+        for _, _, path in self._entries():
+            try:
+                os.unlink(path)
+                removed += 1
+            except OSError:
+                pass
+        print(f"🧹 Кэш выгрузок очищен: {removed} файлов")
+
+    def stats(self) -> dict:
+        """Статистика кэша (счетчики - для текущего процесса)"""
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "size_bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+_export_cache: Optional[ExportCache] = None
+
+
+def get_export_cache() -> ExportCache:
+    """Глобальный кэш выгрузок"""
+    global _export_cache
+    if _export_cache is None:
+        _export_cache = ExportCache()
+    return _export_cache
+
+
+async def render_cached(export_format: str, generator: Callable, passports: List[PassportView], **kwargs) -> bytes:
+    """Выгрузка из кэша или генерация в пуле процессов с сохранением в кэш
+
+    Паспорта рендерятся в порядке id, чтобы одинаковый набор давал
+    одинаковый файл независимо от порядка в запросе. kwargs (например,
+    progress) передаются генератору и не влияют на ключ.
+    """
+    cache = get_export_cache()
+    passports = sorted(passports, key=lambda p: p.id)
+    key = cache.key(export_format, passports)
+    content = cache.get(key)
+    if content is not None:
+        print(f"⚡ Выгрузка {export_format} из кэша: {len(passports)} паспортов")
+        return content
+
+    content = await run_render(functools.partial(generator, **kwargs) if kwargs else generator, passports)
+    cache.put(key, content)
+    return content
@@ -0,0 +1,237 @@
+"""
+Фоновые задачи экспорта паспортов и наклеек
+
+Большие выгрузки не держат HTTP-соединение: POST ставит задачу в очередь и
+сразу возвращает ее идентификатор, ограниченное число воркеров выполняет
+генерацию в пуле процессов (render_executor) или берет файл из кэша выгрузок
+(export_cache), а готовый файл сохраняется в хранилище на диске и отдается
+отдельным запросом.
+
+Состояние задачи хранится рядом с файлом результата:
+
+    <id>.json      - метаданные задачи (статус, формат, владелец, время)
+    <id>.progress  - "страниц_готово страниц_всего", пишется процессом генерации
+    <id>.<ext>     - готовый файл
+
+Поэтому статус и результат доступны из любого воркера uvicorn. Файлы старше
+EXPORT_ARTIFACT_TTL секунд удаляются.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional
+
+from backend.utils.pdf_generator import generate_bulk_passports_pdf, generate_stickers_pdf_reportlab
+from backend.utils.sticker_template_generator import generate_stickers_from_template
+from backend.utils.render_executor import PassportView
+from backend.utils.export_cache import render_cached
+
+EXPORT_JOB_WORKERS = int(os.getenv("EXPORT_JOB_WORKERS", "2"))
+EXPORT_QUEUE_SIZE = int(os.getenv("EXPORT_QUEUE_SIZE", "100"))
+EXPORT_ARTIFACTS_DIR = os.getenv("EXPORT_ARTIFACTS_DIR", os.path.join(tempfile.gettempdir(), "agb_exports"))
+EXPORT_ARTIFACT_TTL = int(os.getenv("EXPORT_ARTIFACT_TTL", str(24 * 3600)))
+
+# Формат -> (генератор, расширение, MIME-тип, документов на странице)
+EXPORT_FORMATS = {
+    "passports_pdf": (generate_bulk_passports_pdf, "pdf", "application/pdf", 6),
+    "stickers_pdf": (generate_stickers_pdf_reportlab, "pdf", "application/pdf", 8),
+    "stickers_docx": (
+        generate_stickers_from_template, "docx",
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document", 4
+    ),
+}
+
+
+class JobProgress:
+    """Колбэк прогресса, который передается в процесс генерации
+
+    Пишет "страниц_готово страниц_всего" в файл задачи не чаще раза в
+    interval секунд (и всегда - для последней страницы).
+    """
+
+    def __init__(self, path: str, interval: float = 0.5):
+        self.path = path
+        self.interval = interval
+        self._last = 0.0
+
+    def __call__(self, done: int, total: int):
+        now = time.monotonic()
+        if done < total and now - self._last < self.interval:
+            return
+        self._last = now
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(f"{done} {total}")
+        os.replace(tmp_path, self.path)
+
+
+class ExportJobStore:
+    """Хранилище задач экспорта и их результатов на диске"""
+
+    def __init__(self, directory: str = EXPORT_ARTIFACTS_DIR, ttl: int = EXPORT_ARTIFACT_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, job_id: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.{suffix}")
+
+    def progress_path(self, job_id: str) -> str:
+        return self._path(job_id, "progress")
+
+    def result_path(self, job: dict) -> str:
+        return self._path(job["id"], job["extension"])
+
+    def save(self, job: dict):
+        """Атомарная запись метаданных задачи"""
+        path = self._path(job["id"], "json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Метаданные задачи с текущим прогрессом или None"""
+        try:
+            uuid.UUID(job_id)
+        except ValueError:
+            return None
+        try:
+            with open(self._path(job_id, "json"), encoding="utf-8") as f:
+                job = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        if job["status"] == "done":
+            job["pages_done"] = job["pages_total"]
+        else:
+            try:
+                with open(self.progress_path(job_id)) as f:
+                    job["pages_done"] = int(f.read().split()[0])
+            except (FileNotFoundError, ValueError, IndexError):
+                job["pages_done"] = 0
+        return job
+
+    def update(self, job: dict, **fields) -> dict:
+        job.update(fields)
+        self.save(job)
+        return job
+
+    def write_result(self, job: dict, content: bytes):
+        """Сохранение готового файла"""
+        path = self.result_path(job)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def evict_expired(self):
+        """Удаление задач и файлов старше TTL"""
+        deadline = time.time() - self.ttl
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < deadline:
+                    os.unlink(path)
+            except OSError:
+                pass
+
+
+class ExportJobQueue:
+    """Очередь задач экспорта с ограниченным числом воркеров"""
+
+    def __init__(self, store: ExportJobStore, workers: int = EXPORT_JOB_WORKERS, maxsize: int = EXPORT_QUEUE_SIZE):
+        self.store = store
+        self.workers = max(1, workers)
+        self.maxsize = maxsize
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _start(self):
+        """Запуск воркеров в текущем цикле событий (при первой задаче)"""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+            print(f"✅ Очередь экспорта запущена: {self.workers} воркеров")
+
+    def submit(self, export_format: str, passports: List[PassportView], user_id: int) -> dict:
+        """Постановка задачи в очередь; asyncio.QueueFull, если очередь заполнена"""
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Неизвестный формат экспорта: {export_format}")
+        self._start()
+        self.store.evict_expired()
+
+        _, extension, media_type, per_page = EXPORT_FORMATS[export_format]
+        job = {
+            "id": str(uuid.uuid4()),
+            "format": export_format,
+            "status": "queued",
+            "user_id": user_id,
+            "passports_count": len(passports),
+            "pages_total": (len(passports) + per_page - 1) // per_page,
+            "extension": extension,
+            "media_type": media_type,
+            "error": None,
+            "created_at": datetime.now().isoformat(),
+            "finished_at": None,
+        }
+        self._queue.put_nowait((job, passports))
+        self.store.save(job)
+        return job
+
+    async def _worker(self):
+        while True:
+            job, passports = await self._queue.get()
+            try:
+                await self._run(job, passports)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: dict, passports: List[PassportView]):
+        generator = EXPORT_FORMATS[job["format"]][0]
+        self.store.update(job, status="running")
+        print(f"📦 Экспорт {job['id']}: {job['format']}, {job['passports_count']} паспортов")
+        try:
+            progress = JobProgress(self.store.progress_path(job["id"]))
+            content = await render_cached(job["format"], generator, passports, progress=progress)
+            self.store.write_result(job, content)
+            self.store.update(job, status="done", finished_at=datetime.now().isoformat())
+            print(f"✅ Экспорт {job['id']} готов: {len(content)} байт")
+        except Exception as e:
+            print(f"❌ Ошибка экспорта {job['id']}: {e}")
+            self.store.update(job, status="failed", error=str(e), finished_at=datetime.now().isoformat())
+        finally:
+            try:
+                os.unlink(self.store.progress_path(job["id"]))
+            except OSError:
+                pass
+
+    async def stop(self):
+        """Остановка воркеров"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+
+_queue: Optional[ExportJobQueue] = None
+
+
+def get_export_queue() -> ExportJobQueue:
+    """Глобальная очередь экспорта"""
+    global _queue
+    if _queue is None:
+        _queue = ExportJobQueue(ExportJobStore())
+    return _queue
+
+
+async def shutdown_export_queue():
+    """Остановка очереди экспорта"""
+    if _queue is not None:
+        await _queue.stop()
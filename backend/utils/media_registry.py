@@ -0,0 +1,158 @@
+"""
+Реестр изображений пакетов DOCX и XLSX
+
+Логотип одинаков на всех наклейках, штрихкод артикула - на всех наклейках
+одной номенклатуры, поэтому изображение хранится в архиве один раз (ключ -
+SHA-1 содержимого), а каждый рисунок ссылается на общую часть пакета.
+
+    - DOCX (sticker_docx_writer.DocxPackage) - связи документа на общие
+      word/media/imageN.*;
+    - XLSX (openpyxl) - RegisteredImage с общим путем xl/media/imageN.* и
+      save_workbook, который записывает каждый путь в архив один раз.
+
+Здесь же - повернутый логотип для вертикальной колонки наклейки: поворот
+выполняется один раз на файл логотипа, без временных файлов.
+"""
+
+import copy
+import datetime
+import hashlib
+import io
+import mimetypes
+from typing import NamedTuple, Optional
+from zipfile import ZipFile, ZIP_DEFLATED
+
+from openpyxl.drawing.image import Image as OpenpyxlImage
+from openpyxl.writer.excel import ExcelWriter
+
+# Логотип, повернутый для вертикальной колонки (SHA-256 исходного файла -> PNG)
+_rotated_logos = {}
+
+
+class MediaEntry(NamedTuple):
+    """Изображение в пакете"""
+    index: int
+    path: str
+    ext: str
+    content_type: str
+    blob: bytes
+
+
+def image_ext(blob: bytes) -> str:
+    """Расширение файла изображения по содержимому"""
+    if blob.startswith(b"\x89PNG"):
+        return "png"
+    if blob.startswith(b"\xff\xd8"):
+        return "jpeg"
+    if blob.startswith(b"GIF8"):
+        return "gif"
+    if blob.startswith(b"BM"):
+        return "bmp"
+    return "png"
+
+
+class MediaRegistry:
+    """Изображения пакета без повторов
+
+    path_template - путь части пакета, например "media/image{index}.{ext}".
+    """
+
+    def __init__(self, path_template: str):
+        self.path_template = path_template
+        self._entries = {}
+        self.references = 0
+
+    def add(self, blob: bytes, ext: Optional[str] = None) -> MediaEntry:
+        """Запись реестра для изображения (одинаковые байты - одна запись)"""
+        self.references += 1
+        key = hashlib.sha1(blob).hexdigest()
+        entry = self._entries.get(key)
+        if entry is None:
+            ext = (ext or image_ext(blob)).lower()
+            index = len(self._entries) + 1
+            entry = MediaEntry(
+                index=index,
+                path=self.path_template.format(index=index, ext=ext),
+                ext=ext,
+                content_type=mimetypes.guess_type(f"image.{ext}")[0] or "application/octet-stream",
+                blob=blob,
+            )
+            self._entries[key] = entry
+        return entry
+
+    def __iter__(self):
+        return iter(self._entries.values())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def report(self, prefix: str = ""):
+        """Сколько рисунков и сколько изображений в пакете"""
+        if self.references:
+            print(f"{prefix}🖼️ Изображения: {self.references} рисунков, в пакете {len(self)} файлов")
+
+
+class RegisteredImage(OpenpyxlImage):
+    """Изображение openpyxl с общим путем в xl/media из реестра"""
+
+    def __init__(self, entry: MediaEntry):
+        super().__init__(io.BytesIO(entry.blob))
+        self.entry = entry
+
+    def _data(self):
+        return self.entry.blob
+
+    @property
+    def path(self):
+        return f"/{self.entry.path}"
+
+
+class XlsxMedia:
+    """Изображения книги openpyxl через реестр"""
+
+    def __init__(self):
+        self.registry = MediaRegistry("xl/media/image{index}.{ext}")
+        self._prototypes = {}
+
+    def image(self, blob: bytes) -> RegisteredImage:
+        """Новый рисунок (своя привязка и размер) с общим файлом изображения"""
+        entry = self.registry.add(blob)
+        prototype = self._prototypes.get(entry.index)
+        if prototype is None:
+            # Размеры изображения читаются Pillow один раз, дальше - копии
+            prototype = self._prototypes[entry.index] = RegisteredImage(entry)
+        return copy.copy(prototype)
+
+
+class _SharedMediaExcelWriter(ExcelWriter):
+    """ExcelWriter, который записывает общий файл изображения один раз"""
+
+    def _write_images(self):
+        written = set()
+        for img in self._images:
+            if img.path not in written:
+                written.add(img.path)
+                self._archive.writestr(img.path[1:], img._data())
+
+
+def save_workbook(workbook, stream):
+    """Сохранение книги (как Workbook.save) без повторов изображений в архиве"""
+    archive = ZipFile(stream, "w", ZIP_DEFLATED, allowZip64=True)
+    workbook.properties.modified = datetime.datetime.utcnow()
+    _SharedMediaExcelWriter(workbook, archive).save()
+
+
+def rotated_logo(logo_path: str) -> bytes:
+    """Логотип, повернутый на 90° по часовой стрелке (PNG, один раз на файл)"""
+    with open(logo_path, "rb") as f:
+        content = f.read()
+    key = hashlib.sha256(content).hexdigest()
+    rotated = _rotated_logos.get(key)
+    if rotated is None:
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.open(io.BytesIO(content)).rotate(-90, expand=True).save(buffer, format="PNG")
+        rotated = buffer.getvalue()
+        _rotated_logos.clear()
+        _rotated_logos[key] = rotated
+    return rotated
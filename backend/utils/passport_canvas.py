@@ -0,0 +1,326 @@
+"""
+Быстрая генерация PDF паспортов прямой отрисовкой на canvas
+
+Макет паспорта фиксирован (6 паспортов на A4, постоянные ширины колонок),
+поэтому вместо вложенных platypus Table для каждого паспорта координаты всех
+элементов вычисляются арифметикой, а текст, линии и логотип рисуются прямо на
+reportlab canvas. Результат повторяет разметку generate_bulk_passports_pdf
+(те же отступы, высоты строк и выравнивание, что дает platypus).
+
+Неизменная часть паспорта (логотип, контакты, рамки, сетка, подписи) рисуется
+один раз как Form XObject (canvas.beginForm/doForm) для каждого набора высот
+строк таблицы, а для каждого паспорта на странице выводятся только ссылка на
+форму и значения полей.
+
+Включается настройкой PASSPORT_PDF_RENDERER=canvas (см. pdf_generator).
+Сравнение с platypus: scripts/compare_passport_renderers.py,
+скорость: scripts/bench_passport_pdf.py.
+"""
+
+import io
+import os
+from functools import lru_cache
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfgen import canvas as pdf_canvas
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+PASSPORTS_PER_PAGE = 6
+
+# Рабочая область как у SimpleDocTemplate в generate_bulk_passports_pdf:
+# поля страницы 5/3 мм и внутренние отступы Frame по 6 pt
+FRAME_PADDING = 6
+FRAME_TOP = PAGE_HEIGHT - 3 * mm - FRAME_PADDING
+FRAME_BOTTOM = 3 * mm + FRAME_PADDING
+
+# Внешняя рамка паспорта
+OUTER_X = 5 * mm
+OUTER_WIDTH = 200 * mm
+OUTER_PADDING = 2
+SPACER_HEIGHT = 2 * mm
+PASSPORT_GAP = 1 * mm
+
+# Заголовок: логотип и контакты
+HEADER_COL_WIDTHS = (30 * mm, 160 * mm)
+HEADER_WIDTH = sum(HEADER_COL_WIDTHS)
+HEADER_PADDING = 1
+HEADER_FONT_SIZE = 5
+HEADER_LEADING = 12  # Ведение ячейки Table по умолчанию
+LOGO_WIDTH = 18 * mm
+LOGO_HEIGHT = 5.4 * mm
+
+# Таблица данных паспорта
+TABLE_COL_WIDTHS = (38 * mm, 38 * mm, 48 * mm, 38 * mm)
+TABLE_WIDTH = sum(TABLE_COL_WIDTHS)
+CELL_PADDING = 1
+CELL_FONT_SIZE = 6
+CELL_LEADING = 7
+PLAIN_CELL_LEADING = 12  # Ведение строковой (не Paragraph) ячейки Table
+GRID_WIDTH = 0.5
+
+# Ячейки таблицы со значениями паспорта (строка, колонка); остальное - в форме
+VALUE_CELLS = ((1, 0), (1, 1), (1, 2), (1, 3), (3, 0), (3, 1))
+
+HEADER_X = OUTER_X + (OUTER_WIDTH - HEADER_WIDTH) / 2
+TABLE_X = OUTER_X + (OUTER_WIDTH - TABLE_WIDTH) / 2
+COL_LEFTS = tuple(TABLE_X + sum(TABLE_COL_WIDTHS[:col]) for col in range(len(TABLE_COL_WIDTHS)))
+
+LABELS_TOP = (
+    "Артикул / Stock Code",
+    "Типоразмер / Tool size",
+    "Серийный номер / Serial Number",
+    "Буровой инструмент / Tool type",
+)
+LABELS_BOTTOM = (
+    "Матрица / Matrix",
+    "Высота матрицы / Imp Depth",
+    "Промывочные отверстия / Waterways",
+    "Дата производства / Production date",
+)
+WEBSITE = "www.almazgeobur.ru"
+PRODUCTION_YEAR = "2025"
+WATERWAYS = "8 mm"
+
+
+@lru_cache(maxsize=4096)
+def _split_lines(text, font_name, width):
+    """Разбивка текста ячейки на строки (как Paragraph с переносом по словам)"""
+    return tuple(simpleSplit(text, font_name, CELL_FONT_SIZE, width)) or ("",)
+
+
+def _cell_lines(texts, font_name):
+    """Строки текста для ячеек одной строки таблицы"""
+    return [
+        _split_lines(text, font_name, width - 2 * CELL_PADDING)
+        for text, width in zip(texts, TABLE_COL_WIDTHS)
+    ]
+
+
+def _header_height(contact_lines):
+    return max(LOGO_HEIGHT, len(contact_lines) * HEADER_LEADING) + 2 * HEADER_PADDING
+
+
+class PassportLayout:
+    """Вычисленная разметка одного паспорта: строки текста и высоты строк таблицы"""
+
+    def __init__(self, passport, font_name, contact_lines):
+        self.header_height = _header_height(contact_lines)
+        nomenclature = passport.nomenclature
+        if nomenclature:
+            self._layout_table(passport, nomenclature, font_name)
+        else:
+            # Как в platypus: только заголовок и рамка без таблицы данных
+            self.rows, self.row_heights, self.row_bottoms, self.table_height = [], [], [], 0
+
+        self.outer_rows = (
+            self.header_height + 2 * OUTER_PADDING,
+            SPACER_HEIGHT + 2 * OUTER_PADDING,
+            self.table_height + 2 * OUTER_PADDING,
+        )
+        self.height = sum(self.outer_rows)
+        # Паспорта с одинаковыми высотами строк используют одну форму с рамкой
+        self.frame_key = tuple(self.row_heights)
+
+    def _layout_table(self, passport, nomenclature, font_name):
+        values_top = (
+            nomenclature.article or "3501040",
+            nomenclature.matrix or "NQ",
+            passport.passport_number or "AGB 3-5 NQ 0000125",
+            nomenclature.name or "Буровой инструмент / Drilling tool",
+        )
+        values_bottom = (
+            nomenclature.matrix or "3-5",
+            nomenclature.height or "12 мм",
+            WATERWAYS,
+        )
+        self.rows = [
+            _cell_lines(LABELS_TOP, font_name),
+            _cell_lines(values_top, font_name),
+            _cell_lines(LABELS_BOTTOM, font_name),
+            _cell_lines(values_bottom, font_name),
+            [_split_lines(WEBSITE, font_name, TABLE_WIDTH - 2 * CELL_PADDING)],
+        ]
+
+        heights = [max(len(lines) for lines in row) * CELL_LEADING + 2 * CELL_PADDING for row in self.rows]
+        # Строковые ячейки Table (год производства и пустые ячейки под объединением
+        # в строке сайта) задают высоту по своему ведению
+        for row in (3, 4):
+            heights[row] = max(heights[row], PLAIN_CELL_LEADING + 2 * CELL_PADDING)
+        self.row_heights = heights
+        self.table_height = sum(heights)
+
+        # Нижние края строк таблицы (сверху вниз); таблица по центру своей
+        # строки внешней таблицы, нижний край паспорта - y=0
+        y = OUTER_PADDING + self.table_height
+        self.row_bottoms = []
+        for height in heights:
+            y -= height
+            self.row_bottoms.append(y)
+
+
+class PassportCanvasRenderer:
+    """Отрисовка паспортов на canvas по вычисленным координатам
+
+    Координаты внутри паспорта отсчитываются от левого нижнего угла страницы
+    при нижнем крае рамки паспорта на y=0; на странице паспорт сдвигается
+    через translate.
+    """
+
+    def __init__(self, canvas, font_name, contact_info, logo_path=None):
+        self.canvas = canvas
+        self.font_name = font_name
+        self.contact_lines = contact_info.split("\n")
+        self.logo_path = logo_path
+        self._frames = {}
+
+    def layout(self, passport):
+        return PassportLayout(passport, self.font_name, self.contact_lines)
+
+    def draw(self, layout, top):
+        """Отрисовка паспорта, верхний край внешней рамки - top"""
+        c = self.canvas
+        frame = self._frame(layout)
+        c.saveState()
+        c.translate(0, top - layout.height)
+        c.doForm(frame)
+        if layout.rows:
+            self._draw_values(layout)
+        c.restoreState()
+
+    def _frame(self, layout):
+        """Имя формы с неизменной частью паспорта (создается при первом использовании)"""
+        name = self._frames.get(layout.frame_key)
+        if name is None:
+            name = f"PassportFrame{len(self._frames)}"
+            c = self.canvas
+            # Границы формы с запасом на толщину линий
+            c.beginForm(name, -GRID_WIDTH, -GRID_WIDTH, PAGE_WIDTH, layout.height + GRID_WIDTH)
+            self._draw_frame(layout)
+            c.endForm()
+            self._frames[layout.frame_key] = name
+        return name
+
+    def _draw_frame(self, layout):
+        c = self.canvas
+        header_row = layout.outer_rows[0]
+
+        # Заголовок по центру первой строки внешней таблицы
+        header_bottom = layout.height - header_row + (header_row - layout.header_height) / 2
+        self._draw_header(header_bottom, layout.header_height)
+
+        # Таблица данных (по центру третьей строки, см. PassportLayout.row_bottoms)
+        if layout.rows:
+            self._draw_table(layout)
+
+        # Внешняя рамка
+        c.setStrokeColor(colors.black)
+        c.setLineWidth(GRID_WIDTH)
+        c.rect(OUTER_X, 0, OUTER_WIDTH, layout.height, stroke=1, fill=0)
+
+    def _draw_header(self, bottom, height):
+        c = self.canvas
+        top = bottom + height
+        if self.logo_path:
+            c.drawImage(
+                self.logo_path, HEADER_X + HEADER_PADDING, top - HEADER_PADDING - LOGO_HEIGHT,
+                LOGO_WIDTH, LOGO_HEIGHT, mask="auto"
+            )
+
+        c.setFillColor(colors.black)
+        c.setFont(self.font_name, HEADER_FONT_SIZE, HEADER_LEADING)
+        x = HEADER_X + HEADER_COL_WIDTHS[0] + HEADER_PADDING
+        y = top - HEADER_PADDING - HEADER_FONT_SIZE
+        for line in self.contact_lines:
+            c.drawString(x, y, line)
+            y -= HEADER_LEADING
+
+    def _draw_table(self, layout):
+        c = self.canvas
+        heights = layout.row_heights
+        row_bottoms = layout.row_bottoms
+        bottom = row_bottoms[-1]
+
+        # Фон строк с подписями
+        c.setFillColor(colors.lightgrey)
+        for row in (0, 2):
+            c.rect(TABLE_X, row_bottoms[row], TABLE_WIDTH, heights[row], stroke=0, fill=1)
+
+        # Текст ячеек, кроме значений паспорта
+        c.setFillColor(colors.black)
+        c.setFont(self.font_name, CELL_FONT_SIZE, CELL_LEADING)
+        for row, cells in enumerate(layout.rows):
+            widths = TABLE_COL_WIDTHS if len(cells) > 1 else (TABLE_WIDTH,)
+            for col, lines in enumerate(cells):
+                if (row, col) not in VALUE_CELLS:
+                    self._draw_paragraph(lines, COL_LEFTS[col], row_bottoms[row], widths[col], heights[row])
+
+        # Год производства - строковая ячейка Table (выравнивание по центру, ведение 12)
+        c.drawCentredString(
+            COL_LEFTS[3] + TABLE_COL_WIDTHS[3] / 2,
+            row_bottoms[3] + (heights[3] + PLAIN_CELL_LEADING) / 2 - CELL_FONT_SIZE,
+            PRODUCTION_YEAR
+        )
+
+        # Сетка: горизонтальные линии, внешние вертикали, внутренние вертикали без объединенной строки
+        c.setStrokeColor(colors.black)
+        c.setLineWidth(GRID_WIDTH)
+        top = bottom + layout.table_height
+        right = TABLE_X + TABLE_WIDTH
+        lines = [(TABLE_X, top, right, top)]
+        lines.extend((TABLE_X, y, right, y) for y in row_bottoms)
+        lines.append((TABLE_X, bottom, TABLE_X, top))
+        lines.append((right, bottom, right, top))
+        lines.extend((x, row_bottoms[3], x, top) for x in COL_LEFTS[1:])
+        c.lines(lines)
+
+    def _draw_values(self, layout):
+        """Значения полей паспорта поверх формы"""
+        self.canvas.setFont(self.font_name, CELL_FONT_SIZE, CELL_LEADING)
+        for row, col in VALUE_CELLS:
+            self._draw_paragraph(
+                layout.rows[row][col], COL_LEFTS[col], layout.row_bottoms[row],
+                TABLE_COL_WIDTHS[col], layout.row_heights[row]
+            )
+
+    def _draw_paragraph(self, lines, left, bottom, width, row_height):
+        """Текст по центру ячейки (как Paragraph с alignment=CENTER и VALIGN MIDDLE)"""
+        text_height = len(lines) * CELL_LEADING
+        y = bottom + (row_height + text_height) / 2 - CELL_FONT_SIZE
+        x = left + width / 2
+        for line in lines:
+            self.canvas.drawCentredString(x, y, line)
+            y -= CELL_LEADING
+
+
+def generate_bulk_passports_pdf_canvas(passports, font_name, contact_info, logo_path=None, progress=None):
+    """PDF с паспортами (по 6 на страницу) прямой отрисовкой на canvas"""
+    buffer = io.BytesIO()
+    c = pdf_canvas.Canvas(buffer, pagesize=A4)
+    if logo_path and not os.path.exists(logo_path):
+        logo_path = None
+    renderer = PassportCanvasRenderer(c, font_name, contact_info, logo_path)
+
+    total_pages = (len(passports) + PASSPORTS_PER_PAGE - 1) // PASSPORTS_PER_PAGE
+    page = 0
+    for i in range(0, len(passports), PASSPORTS_PER_PAGE):
+        page += 1
+        top = FRAME_TOP
+        for j, passport in enumerate(passports[i:i + PASSPORTS_PER_PAGE]):
+            if not passport.nomenclature:
+                print(f"❌ Номенклатура не найдена для паспорта {passport.passport_number}")
+            layout = renderer.layout(passport)
+            if j and top - layout.height < FRAME_BOTTOM:
+                # Не поместился (длинные названия) - переносим на новую страницу, как platypus
+                c.showPage()
+                top = FRAME_TOP
+            renderer.draw(layout, top)
+            top -= layout.height + PASSPORT_GAP
+        c.showPage()
+        if progress:
+            progress(min(page, total_pages), total_pages)
+
+    c.save()
+    return buffer.getvalue()
@@ -1,5 +1,6 @@
 import io
 import os
+from collections import OrderedDict
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Spacer, Image, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -11,6 +12,51 @@ from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.utils import ImageReader
 
 
+# Версия макета паспорта: увеличить при изменении create_passport_fragment,
+# чтобы не использовать фрагменты и выгрузки из export_cache, построенные по старому макету
+PASSPORT_LAYOUT_VERSION = 1
+# Версия макета наклеек (PDF, DOCX, XLSX): увеличить при изменении любого генератора
+# наклеек, чтобы export_cache не отдавал файлы по старому макету
+STICKER_LAYOUT_VERSION = 1
+PASSPORT_FRAGMENT_CACHE_SIZE = int(os.getenv("PASSPORT_FRAGMENT_CACHE_SIZE", "2000"))
+
+# Способ отрисовки паспортов в generate_bulk_passports_pdf:
+# platypus - таблицы reportlab, canvas - прямая отрисовка (backend/utils/passport_canvas.py)
+PASSPORT_PDF_RENDERER = os.getenv("PASSPORT_PDF_RENDERER", "platypus")
+
+# Способ отрисовки наклеек в generate_stickers_pdf_reportlab:
+# platypus - таблицы reportlab, canvas - прямая отрисовка листа 2 × 4 (backend/utils/sticker_canvas.py)
+STICKER_PDF_RENDERER = os.getenv("STICKER_PDF_RENDERER", "platypus")
+
+# Контактная информация в заголовке паспорта
+PASSPORT_CONTACT_INFO = """ООО "Алмазгеобур" 125362, г. Москва, улица Водников, дом 2, стр. 14, оф. 11, тел.:+7 495 229 82 94
+LLP "Almazgeobur" 125362, Moscow, Vodnikov Street, 2, building. 14, of. 11, tel.:+7 495 229 82 94,
+e-mail: contact@almazgeobur.ru"""
+
+# Кэш готовых паспортов для generate_bulk_passports_pdf (LRU в пределах процесса)
+_passport_fragments = OrderedDict()
+
+
+class _LayoutCachedParagraph(Paragraph):
+    """Paragraph, который не пересчитывает разбивку строк при той же ширине"""
+
+    def wrap(self, availWidth, availHeight):
+        if getattr(self, '_wrapped_width', None) != availWidth:
+            self._wrapped_size = Paragraph.wrap(self, availWidth, availHeight)
+            self._wrapped_width = availWidth
+        return self._wrapped_size
+
+
+class _LayoutCachedTable(Table):
+    """Table, который не пересчитывает размеры ячеек при той же ширине"""
+
+    def wrap(self, availWidth, availHeight):
+        if getattr(self, '_wrapped_width', None) != availWidth:
+            self._wrapped_size = Table.wrap(self, availWidth, availHeight)
+            self._wrapped_width = availWidth
+        return self._wrapped_size
+
+
 def create_logo_image():
     """Создает изображение логотипа из PNG файла
     
@@ -444,27 +490,27 @@ def create_passport_content_without_header(passport, normal_font, normal_style):
     
     # Данные паспорта с реальными данными из БД (согласно инструкциям) с переносом текста
     passport_data = [
-        [Paragraph("Артикул / Stock Code", cell_style), 
-         Paragraph("Типоразмер / Tool size", cell_style), 
-         Paragraph("Серийный номер / Serial Number", cell_style), 
-         Paragraph("Буровой инструмент / Tool type", cell_style)],
-        [Paragraph(nomenclature.article or "3501040", cell_style), 
-         Paragraph(nomenclature.matrix or "NQ", cell_style), 
-         Paragraph(passport.passport_number or "AGB 3-5 NQ 0000125", cell_style), 
-         Paragraph(tool_type_name, cell_style)],
-        [Paragraph("Матрица / Matrix", cell_style), 
-         Paragraph("Высота матрицы / Imp Depth", cell_style), 
-         Paragraph("Промывочные отверстия / Waterways", cell_style), 
-         Paragraph("Дата производства / Production date", cell_style)],
-        [Paragraph(nomenclature.matrix or "3-5", cell_style), 
-         Paragraph(nomenclature.height or "12 мм", cell_style), 
-         Paragraph("8 mm", cell_style),
+        [_LayoutCachedParagraph("Артикул / Stock Code", cell_style), 
+         _LayoutCachedParagraph("Типоразмер / Tool size", cell_style), 
+         _LayoutCachedParagraph("Серийный номер / Serial Number", cell_style), 
+         _LayoutCachedParagraph("Буровой инструмент / Tool type", cell_style)],
+        [_LayoutCachedParagraph(nomenclature.article or "3501040", cell_style), 
+         _LayoutCachedParagraph(nomenclature.matrix or "NQ", cell_style), 
+         _LayoutCachedParagraph(passport.passport_number or "AGB 3-5 NQ 0000125", cell_style), 
+         _LayoutCachedParagraph(tool_type_name, cell_style)],
+        [_LayoutCachedParagraph("Матрица / Matrix", cell_style), 
+         _LayoutCachedParagraph("Высота матрицы / Imp Depth", cell_style), 
+         _LayoutCachedParagraph("Промывочные отверстия / Waterways", cell_style), 
+         _LayoutCachedParagraph("Дата производства / Production date", cell_style)],
+        [_LayoutCachedParagraph(nomenclature.matrix or "3-5", cell_style), 
+         _LayoutCachedParagraph(nomenclature.height or "12 мм", cell_style), 
+         _LayoutCachedParagraph("8 mm", cell_style),
          "2025"],
-        [Paragraph("www.almazgeobur.ru", cell_style), "", "", ""]
+        [_LayoutCachedParagraph("www.almazgeobur.ru", cell_style), "", "", ""]
     ]
     
     # Создаем основную таблицу (без дублирующей рамки) с правильными размерами
-    table = Table(passport_data, colWidths=[38*mm, 38*mm, 48*mm, 38*mm])
+    table = _LayoutCachedTable(passport_data, colWidths=[38*mm, 38*mm, 48*mm, 38*mm])
     table.setStyle(TableStyle([
         ('FONTNAME', (0, 0), (-1, -1), normal_font),
         ('FONTSIZE', (0, 0), (-1, -1), 6),  # Уменьшенный размер шрифта
@@ -488,8 +534,138 @@ def create_passport_content_without_header(passport, normal_font, normal_style):
     return story
 
 
-def generate_bulk_passports_pdf(passports):
-    """Генерирует PDF с несколькими паспортами (по 4 на страницу)"""
+def create_passport_fragment(passport, logo_img, contact_info, normal_font, normal_style):
+    """Создает паспорт для массовой выгрузки: заголовок с логотипом, данные и общая рамка"""
+    # Создаем заголовочную таблицу с логотипом для каждого паспорта
+    header_data = [[None, contact_info]]
+    logo_added = False
+    if logo_img and os.path.exists(logo_img):
+        try:
+            print(f"✅ Логотип найден для массового паспорта {passport.passport_number}: {logo_img}")
+            print(f"   Размеры логотипа: 18мм × 5.4мм (как в наклейках)")
+            # Проверяем, что файл действительно является изображением
+            file_size = os.path.getsize(logo_img)
+            print(f"   Размер файла: {file_size} байт")
+            # Используем точно те же размеры, что и в наклейках
+            logo_cell = Image(logo_img, width=18*mm, height=5.4*mm)
+            print(f"   Логотип добавлен в массовый паспорт с размерами: {18*mm} × {5.4*mm} точек")
+            header_data[0][0] = logo_cell
+            logo_added = True
+            print(f"   ✅ Логотип успешно добавлен в header_data")
+        except Exception as e:
+            print(f"⚠️ Ошибка при добавлении логотипа в массовый паспорт: {e}")
+            import traceback
+            traceback.print_exc()
+            # Пытаемся использовать ImageReader для более надежной загрузки
+            try:
+                from reportlab.lib.utils import ImageReader
+                logo_cell = Image(ImageReader(logo_img), width=18*mm, height=5.4*mm)
+                header_data[0][0] = logo_cell
+                logo_added = True
+                print(f"   ✅ Логотип добавлен через ImageReader")
+            except Exception as e2:
+                print(f"⚠️ Ошибка при добавлении логотипа через ImageReader: {e2}")
+    
+    if not logo_added:
+        print(f"⚠️ Логотип не найден для массового паспорта {passport.passport_number}: {logo_img}")
+        # Если логотип не найден, оставляем пустую ячейку (не добавляем текстовый fallback)
+        header_data[0][0] = ""  # Пустая строка вместо None
+
+    # Создаем таблицу ПОСЛЕ добавления логотипа (стандартные размеры для 6 паспортов)
+    header_table = _LayoutCachedTable(header_data, colWidths=[30*mm, 160*mm])
+    header_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), normal_font),
+        ('FONTSIZE', (0, 0), (-1, -1), 5),  # Стандартный размер шрифта
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (0, 0), 'LEFT'),
+        ('ALIGN', (1, 0), (1, 0), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('ENCODING', (0, 0), (-1, -1), 'utf-8'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 1),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 1),
+        ('TOPPADDING', (0, 0), (-1, -1), 1),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
+    ]))
+    
+    # Создаем содержимое паспорта без заголовка
+    passport_content = create_passport_content_without_header(passport, normal_font, normal_style)
+    
+    # Создаем полный паспорт с заголовком и общей рамкой (стандартные размеры для 6 паспортов)
+    full_passport = _LayoutCachedTable([[header_table], [Spacer(1, 2*mm)], [passport_content]], colWidths=[200*mm])
+    full_passport.setStyle(TableStyle([
+        ('BOX', (0, 0), (-1, -1), 0.5, colors.black),  # Более тонкая рамка
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 2),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 2),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ]))
+    
+    return full_passport
+
+
+def _passport_fragment_key(passport, logo_stamp):
+    """Ключ кэша фрагмента: паспорт, его номенклатура, версия макета и логотип"""
+    nomenclature = passport.nomenclature
+    return (
+        PASSPORT_LAYOUT_VERSION,
+        logo_stamp,
+        passport.id,
+        passport.updated_at,
+        passport.passport_number,
+        passport.created_at,
+        tuple(getattr(nomenclature, field, None) for field in ("id", "name", "article", "matrix", "height"))
+        if nomenclature else None,
+    )
+
+
+def get_passport_fragment(passport, logo_img, contact_info, normal_font, normal_style):
+    """Паспорт из кэша фрагментов или новый (с сохранением в кэш)
+
+    Кэш живет в процессе генерации (render_executor), поэтому при повторной
+    выгрузке заказа, дополненного новыми паспортами, разметку считают только
+    новые паспорта.
+    """
+    try:
+        stat = os.stat(logo_img) if logo_img else None
+        logo_stamp = (logo_img, stat.st_mtime_ns, stat.st_size) if stat else None
+    except OSError:
+        logo_stamp = None
+    key = _passport_fragment_key(passport, logo_stamp)
+
+    fragment = _passport_fragments.get(key)
+    if fragment is not None:
+        _passport_fragments.move_to_end(key)
+        return fragment
+
+    fragment = create_passport_fragment(passport, logo_img, contact_info, normal_font, normal_style)
+    if PASSPORT_FRAGMENT_CACHE_SIZE > 0:
+        _passport_fragments[key] = fragment
+        while len(_passport_fragments) > PASSPORT_FRAGMENT_CACHE_SIZE:
+            _passport_fragments.popitem(last=False)
+    return fragment
+
+
+def _page_progress(progress, total_pages):
+    """Колбэк reportlab, сообщающий о построенных страницах"""
+    def on_page(canvas, doc):
+        progress(min(doc.page, total_pages), total_pages)
+    return on_page
+
+def _build_with_progress(doc, story, progress, total_pages):
+    """Построение документа с отчетом о прогрессе (если задан колбэк)"""
+    if progress:
+        on_page = _page_progress(progress, total_pages)
+        doc.build(story, onFirstPage=on_page, onLaterPages=on_page)
+    else:
+        doc.build(story)
+
+def generate_bulk_passports_pdf(passports, progress=None):
+    """Генерирует PDF с несколькими паспортами (по 6 на страницу)
+
+    progress - необязательный колбэк progress(страниц_готово, страниц_всего)
+    """
     print(f"📄 Начинаем генерацию PDF для {len(passports)} паспортов")
     
     # Проверяем, есть ли шаблон Word для паспортов
@@ -516,6 +692,15 @@ def generate_bulk_passports_pdf(passports):
             import traceback
             traceback.print_exc()
     
+    # Быстрая отрисовка на canvas по вычисленным координатам (тот же макет)
+    if PASSPORT_PDF_RENDERER == "canvas":
+        from backend.utils.passport_canvas import generate_bulk_passports_pdf_canvas
+        pdf_content = generate_bulk_passports_pdf_canvas(
+            passports, setup_cyrillic_fonts(), PASSPORT_CONTACT_INFO, create_logo_image(), progress=progress
+        )
+        print(f"✅ PDF успешно сгенерирован (canvas), размер: {len(pdf_content)} байт")
+        return pdf_content
+    
     # Стандартный метод генерации (4 паспорта на страницу)
     # Создаем PDF в памяти
     buffer = io.BytesIO()
@@ -539,9 +724,10 @@ def generate_bulk_passports_pdf(passports):
     story = []
     
     # Контактная информация
-    contact_info = """ООО "Алмазгеобур" 125362, г. Москва, улица Водников, дом 2, стр. 14, оф. 11, тел.:+7 495 229 82 94
-LLP "Almazgeobur" 125362, Moscow, Vodnikov Street, 2, building. 14, of. 11, tel.:+7 495 229 82 94,
-e-mail: contact@almazgeobur.ru"""
+    contact_info = PASSPORT_CONTACT_INFO
+    
+    # Логотип один для всего документа
+    logo_img = create_logo_image()
     
     # Группируем паспорта по 6 на страницу
     for i in range(0, len(passports), 6):
@@ -550,72 +736,7 @@ e-mail: contact@almazgeobur.ru"""
         for j, passport in enumerate(passport_group):
             print(f"📄 Обрабатываем паспорт {j+1} в группе: {passport.passport_number}")
             
-            # Создаем заголовочную таблицу с логотипом для каждого паспорта
-            header_data = [[None, contact_info]]
-            logo_img = create_logo_image()
-            logo_added = False
-            if logo_img and os.path.exists(logo_img):
-                try:
-                    print(f"✅ Логотип найден для массового паспорта {passport.passport_number}: {logo_img}")
-                    print(f"   Размеры логотипа: 18мм × 5.4мм (как в наклейках)")
-                    # Проверяем, что файл действительно является изображением
-                    file_size = os.path.getsize(logo_img)
-                    print(f"   Размер файла: {file_size} байт")
-                    # Используем точно те же размеры, что и в наклейках
-                    logo_cell = Image(logo_img, width=18*mm, height=5.4*mm)
-                    print(f"   Логотип добавлен в массовый паспорт с размерами: {18*mm} × {5.4*mm} точек")
-                    header_data[0][0] = logo_cell
-                    logo_added = True
-                    print(f"   ✅ Логотип успешно добавлен в header_data")
-                except Exception as e:
-                    print(f"⚠️ Ошибка при добавлении логотипа в массовый паспорт: {e}")
-                    import traceback
-                    traceback.print_exc()
-                    # Пытаемся использовать ImageReader для более надежной загрузки
-                    try:
-                        from reportlab.lib.utils import ImageReader
-                        logo_cell = Image(ImageReader(logo_img), width=18*mm, height=5.4*mm)
-                        header_data[0][0] = logo_cell
-                        logo_added = True
-                        print(f"   ✅ Логотип добавлен через ImageReader")
-                    except Exception as e2:
-                        print(f"⚠️ Ошибка при добавлении логотипа через ImageReader: {e2}")
-            
-            if not logo_added:
-                print(f"⚠️ Логотип не найден для массового паспорта {passport.passport_number}: {logo_img}")
-                # Если логотип не найден, оставляем пустую ячейку (не добавляем текстовый fallback)
-                header_data[0][0] = ""  # Пустая строка вместо None
-
-            # Создаем таблицу ПОСЛЕ добавления логотипа (стандартные размеры для 6 паспортов)
-            header_table = Table(header_data, colWidths=[30*mm, 160*mm])
-            header_table.setStyle(TableStyle([
-                ('FONTNAME', (0, 0), (-1, -1), normal_font),
-                ('FONTSIZE', (0, 0), (-1, -1), 5),  # Стандартный размер шрифта
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (0, 0), 'LEFT'),
-                ('ALIGN', (1, 0), (1, 0), 'LEFT'),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('ENCODING', (0, 0), (-1, -1), 'utf-8'),
-                ('LEFTPADDING', (0, 0), (-1, -1), 1),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 1),
-                ('TOPPADDING', (0, 0), (-1, -1), 1),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
-            ]))
-            
-            # Создаем содержимое паспорта без заголовка
-            passport_content = create_passport_content_without_header(passport, normal_font, normal_style)
-            
-            # Создаем полный паспорт с заголовком и общей рамкой (стандартные размеры для 6 паспортов)
-            full_passport = Table([[header_table], [Spacer(1, 2*mm)], [passport_content]], colWidths=[200*mm])
-            full_passport.setStyle(TableStyle([
-                ('BOX', (0, 0), (-1, -1), 0.5, colors.black),  # Более тонкая рамка
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('LEFTPADDING', (0, 0), (-1, -1), 2),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-                ('TOPPADDING', (0, 0), (-1, -1), 2),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-            ]))
+            full_passport = get_passport_fragment(passport, logo_img, contact_info, normal_font, normal_style)
             
             story.append(full_passport)
 
@@ -629,7 +750,7 @@ e-mail: contact@almazgeobur.ru"""
 
     # Генерируем PDF
     print(f"🔨 Строим PDF документ...")
-    doc.build(story)
+    _build_with_progress(doc, story, progress, (len(passports) + 5) // 6)
     buffer.seek(0)
     
     pdf_content = buffer.getvalue()
@@ -878,17 +999,19 @@ def generate_passports_from_template(passports, template_path):
         raise
 
 
-def generate_stickers_pdf_reportlab(passports):
+def generate_stickers_pdf_reportlab(passports, progress=None):
     """Генерирует PDF с наклейками через reportLab (8 наклеек на страницу: 2 столбца × 4 строки)
     
     Args:
         passports: Список паспортов для генерации наклеек
+        progress: Необязательный колбэк progress(страниц_готово, страниц_всего)
     """
     from reportlab.lib.pagesizes import A4
     from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Image, Spacer, KeepTogether
     from reportlab.lib.styles import ParagraphStyle
     from reportlab.lib import colors
     from reportlab.lib.units import mm
+    from backend.utils.barcode_generator import Code128Flowable
     import io
     
     print(f"🏷️ Начинаем генерацию PDF наклеек через reportLab для {len(passports)} паспортов")
@@ -901,6 +1024,17 @@ def generate_stickers_pdf_reportlab(passports):
     
     # Настраиваем шрифты
     normal_font = setup_cyrillic_fonts()
+
+    # Быстрая отрисовка на canvas в фиксированных ячейках листа
+    if STICKER_PDF_RENDERER == "canvas":
+        from backend.utils.sticker_canvas import generate_stickers_pdf_canvas
+        logo_path = create_logo_image()
+        if not (logo_path and os.path.exists(logo_path)):
+            logo_path = None
+        pdf_content = generate_stickers_pdf_canvas(passports, normal_font, logo_path, progress=progress)
+        print(f"✅ PDF наклейки сгенерированы (canvas): {len(pdf_content)} байт")
+        return pdf_content
+
     styles = getSampleStyleSheet()
     normal_style = styles['Normal']
     
@@ -964,22 +1098,8 @@ def generate_stickers_pdf_reportlab(passports):
                 idx = row_idx * 2 + col_idx
                 if idx < len(passport_group):
                     passport = passport_group[idx]
-                    # Загружаем номенклатуру
-                    nomenclature = None
-                    if hasattr(passport, 'nomenclature') and passport.nomenclature:
-                        nomenclature = passport.nomenclature
-                    elif hasattr(passport, 'nomenclature_id') and passport.nomenclature_id:
-                        # Если номенклатура не загружена, пытаемся загрузить
-                        try:
-                            from backend.models import VEDNomenclature
-                            from backend.database import get_db
-                            db = next(get_db())
-                            nomenclature = db.query(VEDNomenclature).filter(VEDNomenclature.id == passport.nomenclature_id).first()
-                            print(f"   📦 Загружена номенклатура для {passport.passport_number}: {nomenclature.name if nomenclature else 'None'}")
-                            sys.stdout.flush()
-                        except Exception as e:
-                            print(f"   ⚠️ Ошибка загрузки номенклатуры: {e}")
-                            sys.stdout.flush()
+                    # Номенклатура загружена заранее (view-модель), к БД не обращаемся
+                    nomenclature = passport.nomenclature
                     
                     print(f"   🏷️ Обрабатываем наклейку {idx+1}: {passport.passport_number}, номенклатура: {nomenclature.name if nomenclature else 'None'}")
                     sys.stdout.flush()
@@ -1037,6 +1157,25 @@ def generate_stickers_pdf_reportlab(passports):
                         for para in paragraphs:
                             nested_rows.append([para])
                         
+                        # Векторные штрихкоды артикула и серийного номера
+                        stock_code = (nomenclature.article or nomenclature.code_1c if nomenclature else None) or '3501040'
+                        serial_number = passport.passport_number or 'AGB0000125'
+                        barcodes_width = sticker_width - 8*mm
+                        barcodes_table = Table(
+                            [[Code128Flowable(stock_code, font_name=normal_font),
+                              Code128Flowable(serial_number, font_name=normal_font)]],
+                            colWidths=[barcodes_width / 2] * 2
+                        )
+                        barcodes_table.setStyle(TableStyle([
+                            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+                            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                            ('LEFTPADDING', (0, 0), (-1, -1), 0),
+                            ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+                            ('TOPPADDING', (0, 0), (-1, -1), 0),
+                            ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
+                        ]))
+                        nested_rows.append([barcodes_table])
+                        
                         # Создаем вложенную таблицу с минимальными стилями
                         if nested_rows:
                             sticker_cell_table = Table(nested_rows, colWidths=[sticker_width-4*mm])
@@ -1107,7 +1246,7 @@ def generate_stickers_pdf_reportlab(passports):
         buffer.seek(0)
         buffer.truncate(0)
         
-        doc.build(story)
+        _build_with_progress(doc, story, progress, (len(passports) + 7) // 8)
         
         buffer.seek(0)
         pdf_content = buffer.getvalue()  # Используем getvalue() вместо read() для BytesIO
@@ -0,0 +1,154 @@
+"""
+Пул процессов для генерации PDF/DOCX/XLSX
+
+Генерация документов занимает процессор на секунды, поэтому выполняется не в
+цикле событий, а в отдельных процессах. В процессы передаются не ORM-объекты,
+а простые view-модели (PassportView, NomenclatureView), которые сериализуются
+через pickle и не требуют сессии базы данных.
+
+Во время генерации обращение к базе запрещено: run_render выполняет генератор
+с флагом in_render(), и запрос из генератора падает с RuntimeError (см.
+backend.database). Все нужные данные загружаются заранее одним запросом в
+эндпоинте.
+
+Количество процессов задается переменной окружения RENDER_WORKERS
+(0 - генерация в пуле потоков текущего процесса, без отдельных процессов).
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_render_state = threading.local()
+
+
+class NomenclatureView(NamedTuple):
+    """Данные номенклатуры, нужные генераторам документов"""
+    id: int
+    code_1c: Optional[str]
+    name: Optional[str]
+    article: Optional[str]
+    matrix: Optional[str]
+    drilling_depth: Optional[str]
+    height: Optional[str]
+    thread: Optional[str]
+    product_type: Optional[str]
+
+
+class PassportView(NamedTuple):
+    """Данные паспорта, нужные генераторам документов"""
+    id: int
+    passport_number: str
+    title: Optional[str]
+    description: Optional[str]
+    status: Optional[str]
+    order_number: Optional[str]
+    quantity: Optional[int]
+    created_by: Optional[int]
+    nomenclature_id: Optional[int]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    nomenclature: Optional[NomenclatureView]
+
+
+def nomenclature_view(nomenclature) -> Optional[NomenclatureView]:
+    """View-модель номенклатуры из ORM-объекта"""
+    if nomenclature is None:
+        return None
+    return NomenclatureView(
+        id=nomenclature.id,
+        code_1c=nomenclature.code_1c,
+        name=nomenclature.name,
+        article=nomenclature.article,
+        matrix=nomenclature.matrix,
+        drilling_depth=nomenclature.drilling_depth,
+        height=nomenclature.height,
+        thread=nomenclature.thread,
+        product_type=nomenclature.product_type,
+    )
+
+
+def passport_view(passport) -> PassportView:
+    """View-модель паспорта из ORM-объекта (номенклатура должна быть загружена)"""
+    return PassportView(
+        id=passport.id,
+        passport_number=passport.passport_number,
+        title=passport.title,
+        description=passport.description,
+        status=passport.status,
+        order_number=passport.order_number,
+        quantity=passport.quantity,
+        created_by=passport.created_by,
+        nomenclature_id=passport.nomenclature_id,
+        created_at=passport.created_at,
+        updated_at=passport.updated_at,
+        nomenclature=nomenclature_view(passport.nomenclature),
+    )
+
+
+def passport_views(passports) -> List[PassportView]:
+    """View-модели для списка паспортов"""
+    return [passport_view(passport) for passport in passports]
+
+
+def in_render() -> bool:
+    """Выполняется ли в текущем потоке генерация документа"""
+    return getattr(_render_state, "active", False)
+
+
+def _render_guarded(func: Callable, *args):
+    """Вызов генератора с флагом in_render (запросы к БД запрещены)"""
+    _render_state.active = True
+    try:
+        return func(*args)
+    finally:
+        _render_state.active = False
+
+
+def get_render_executor() -> Optional[ProcessPoolExecutor]:
+    """Пул процессов генерации (создается при первом использовании)"""
+    global _executor
+    if RENDER_WORKERS <= 0:
+        return None
+    if _executor is None:
+        # spawn: дочерние процессы не наследуют соединения с БД и цикл событий
+        _executor = ProcessPoolExecutor(
+            max_workers=RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        print(f"✅ Пул генерации документов запущен: {RENDER_WORKERS} процессов")
+    return _executor
+
+
+async def run_render(func: Callable, *args):
+    """Выполнение генератора документа вне цикла событий
+
+    func должна быть функцией уровня модуля, а аргументы - сериализуемыми
+    (view-модели вместо ORM-объектов).
+    """
+    global _executor
+    loop = asyncio.get_running_loop()
+    executor = get_render_executor()
+    try:
+        return await loop.run_in_executor(executor, _render_guarded, func, *args)
+    except BrokenProcessPool:
+        # Процесс генерации упал (например, по памяти) - следующий запрос создаст новый пул
+        if _executor is executor:
+            _executor = None
+        raise
+
+
+def shutdown_render_executor():
+    """Остановка пула процессов генерации"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
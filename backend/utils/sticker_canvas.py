@@ -0,0 +1,189 @@
+"""
+Быстрая генерация PDF наклеек прямой отрисовкой на canvas
+
+Лист A4 делится на 8 наклеек 105 × 74.25 мм (2 столбца × 4 строки).
+Прямоугольники наклеек вычисляются один раз, строки текста разбиваются по
+метрикам шрифта (с кэшем), а логотип, строки текста и векторные штрихкоды
+выводятся со смещениями, которые дает разметка generate_stickers_pdf_reportlab
+(вложенная таблица с отступами 2 мм по бокам и 1 мм сверху и снизу).
+
+Неизменная шапка наклейки (логотип и название компании) рисуется один раз
+как Form XObject, сетка листа - один раз на страницу.
+
+Включается настройкой STICKER_PDF_RENDERER=canvas (см. pdf_generator).
+"""
+
+import io
+from functools import lru_cache
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfgen import canvas as pdf_canvas
+
+from backend.utils.barcode_generator import draw_code128
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+STICKERS_PER_PAGE = 8
+STICKER_COLUMNS = 2
+STICKER_ROWS = 4
+STICKER_WIDTH = 105 * mm
+STICKER_HEIGHT = 74.25 * mm
+GRID_WIDTH = 0.5
+
+# Содержимое наклейки: колонка шириной 101 мм у левого края наклейки,
+# отступы строк 2 мм по бокам и 1 мм сверху и снизу
+CONTENT_WIDTH = STICKER_WIDTH - 4 * mm
+LINE_PADDING_X = 2 * mm
+LINE_PADDING_Y = 1 * mm
+TEXT_WIDTH = CONTENT_WIDTH - 2 * LINE_PADDING_X
+CENTER_X = CONTENT_WIDTH / 2
+
+LOGO_WIDTH = 18 * mm
+LOGO_HEIGHT = 5.4 * mm
+LOGO_ROW_HEIGHT = LOGO_HEIGHT + 2 * LINE_PADDING_Y
+
+# Штрихкоды артикула и серийного номера: по центру левой и правой половины колонки
+BARCODE_WIDTH_MM = 40
+BARCODE_HEIGHT_MM = 10
+BARCODE_X = tuple(
+    LINE_PADDING_X + half * TEXT_WIDTH / 2 + (TEXT_WIDTH / 2 - BARCODE_WIDTH_MM * mm) / 2
+    for half in range(2)
+)
+
+# (размер шрифта, ведение) заголовков и обычного текста
+TITLE_FONT = (10, 12)
+TEXT_FONT = (8, 10)
+
+COMPANY_RU = 'ООО "Алмазгеобур"'
+COMPANY_EN = 'LLP "Almazgeobur"'
+WEBSITE = "www.almazgeobur.ru"
+PRODUCTION_DATE = "2025"
+
+# Левые верхние углы наклеек на странице (по строкам слева направо)
+STICKER_SLOTS = tuple(
+    (col * STICKER_WIDTH, PAGE_HEIGHT - row * STICKER_HEIGHT)
+    for row in range(STICKER_ROWS)
+    for col in range(STICKER_COLUMNS)
+)
+
+
+@lru_cache(maxsize=4096)
+def _split_lines(text, font_name, font_size):
+    """Разбивка строки наклейки по ширине (как Paragraph с переносом по словам)"""
+    return tuple(simpleSplit(text, font_name, font_size, TEXT_WIDTH)) or ("",)
+
+
+def sticker_lines(passport):
+    """Переменные строки наклейки: (текст, (размер шрифта, ведение))"""
+    nomenclature = passport.nomenclature
+    lines = []
+    if nomenclature and nomenclature.name:
+        lines.append((nomenclature.name, TITLE_FONT))
+    if nomenclature and nomenclature.article:
+        lines.append((f"Артикул: {nomenclature.article}", TEXT_FONT))
+    if nomenclature and nomenclature.matrix:
+        lines.append((f"Типоразмер: {nomenclature.matrix}", TEXT_FONT))
+    if passport.passport_number:
+        lines.append((f"Серийный номер: {passport.passport_number}", TEXT_FONT))
+    lines.append((f"Дата производства: {PRODUCTION_DATE}", TEXT_FONT))
+    lines.append((WEBSITE, TEXT_FONT))
+    return lines
+
+
+class StickerCanvasRenderer:
+    """Отрисовка наклеек в фиксированных ячейках листа
+
+    Координаты внутри наклейки отсчитываются от ее левого верхнего угла
+    (y вниз отрицательный); на странице наклейка сдвигается через translate.
+    """
+
+    def __init__(self, canvas, font_name, logo_path=None):
+        self.canvas = canvas
+        self.font_name = font_name
+        self.logo_path = logo_path
+        self._header_height = None
+
+    def _header(self):
+        """Форма с шапкой наклейки; возвращает ее высоту"""
+        if self._header_height is None:
+            c = self.canvas
+            c.beginForm("StickerHeader", 0, -STICKER_HEIGHT, STICKER_WIDTH, 0)
+            y = 0
+            if self.logo_path:
+                y -= LOGO_ROW_HEIGHT
+                c.drawImage(
+                    self.logo_path, (CONTENT_WIDTH - LOGO_WIDTH) / 2, y + LINE_PADDING_Y,
+                    LOGO_WIDTH, LOGO_HEIGHT, mask="auto"
+                )
+            c.setFillColor(colors.black)
+            y = self._draw_text(COMPANY_RU, TITLE_FONT, y)
+            y = self._draw_text(COMPANY_EN, TEXT_FONT, y)
+            c.endForm()
+            self._header_height = -y
+        return self._header_height
+
+    def _draw_text(self, text, font, top):
+        """Строка-абзац по центру колонки; возвращает нижний край ее ячейки"""
+        font_size, leading = font
+        c = self.canvas
+        c.setFont(self.font_name, font_size, leading)
+        y = top - LINE_PADDING_Y - font_size
+        lines = _split_lines(text, self.font_name, font_size)
+        for line in lines:
+            c.drawCentredString(CENTER_X, y, line)
+            y -= leading
+        return top - len(lines) * leading - 2 * LINE_PADDING_Y
+
+    def draw(self, passport, slot):
+        """Отрисовка наклейки в ячейке slot (индекс 0-7 на странице)"""
+        c = self.canvas
+        header_height = self._header()
+        x, top = STICKER_SLOTS[slot]
+        c.saveState()
+        c.translate(x, top)
+        c.doForm("StickerHeader")
+        y = -header_height
+        for text, font in sticker_lines(passport):
+            y = self._draw_text(text, font, y)
+        self._draw_barcodes(passport, y)
+        c.restoreState()
+
+    def _draw_barcodes(self, passport, top):
+        """Векторные штрихкоды артикула и серийного номера под текстом"""
+        nomenclature = passport.nomenclature
+        stock_code = (nomenclature.article or nomenclature.code_1c if nomenclature else None) or "3501040"
+        serial_number = passport.passport_number or "AGB0000125"
+        y = top - LINE_PADDING_Y - BARCODE_HEIGHT_MM * mm
+        for x, code in zip(BARCODE_X, (stock_code, serial_number)):
+            draw_code128(self.canvas, code, x, y, BARCODE_WIDTH_MM, BARCODE_HEIGHT_MM, self.font_name)
+
+    def draw_grid(self):
+        """Сетка листа 2 × 4"""
+        c = self.canvas
+        c.setStrokeColor(colors.grey)
+        c.setLineWidth(GRID_WIDTH)
+        c.grid(
+            [col * STICKER_WIDTH for col in range(STICKER_COLUMNS + 1)],
+            [PAGE_HEIGHT - row * STICKER_HEIGHT for row in range(STICKER_ROWS + 1)]
+        )
+
+
+def generate_stickers_pdf_canvas(passports, font_name, logo_path=None, progress=None):
+    """PDF с наклейками (8 на страницу) прямой отрисовкой на canvas"""
+    buffer = io.BytesIO()
+    c = pdf_canvas.Canvas(buffer, pagesize=A4)
+    renderer = StickerCanvasRenderer(c, font_name, logo_path)
+
+    total_pages = (len(passports) + STICKERS_PER_PAGE - 1) // STICKERS_PER_PAGE
+    for page, start in enumerate(range(0, len(passports), STICKERS_PER_PAGE), start=1):
+        for slot, passport in enumerate(passports[start:start + STICKERS_PER_PAGE]):
+            renderer.draw(passport, slot)
+        renderer.draw_grid()
+        c.showPage()
+        if progress:
+            progress(page, total_pages)
+
+    c.save()
+    return buffer.getvalue()
@@ -0,0 +1,569 @@
+"""
+Сборка DOCX наклеек напрямую из OOXML
+
+Вместо построения документа объектами python-docx (OxmlElement на каждую
+границу и отступ ячейки, глубокое копирование XML отрендеренных шаблонов)
+XML ячейки наклейки сериализуется один раз с полями для данных, каждая
+наклейка - подстановка экранированных значений в готовую строку, а
+word/document.xml пишется в архив потоком по страницам.
+
+Базовые части пакета (стили, настройки, тема) берутся из пустого документа
+python-docx, поэтому оформление совпадает с генераторами python-docx.
+Одинаковые изображения (логотип, штрихкод артикула) хранятся в пакете
+один раз (реестр media_registry).
+
+Поддерживаются все три макета sticker_template_generator:
+    - generate_from_excel_template - наклейка 10 × 3 с вертикальным логотипом;
+    - generate_from_template_file - ячейка DOCX-шаблона с плейсхолдерами
+      {{ ... }} (шаблоны с тегами {% ... %} остаются на docxtpl);
+    - generate_stickers_standard - название и серийный номер.
+
+Включается настройкой STICKER_DOCX_RENDERER=ooxml (см. sticker_template_generator).
+"""
+
+import hashlib
+import io
+import re
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from docx import Document
+from docx.image.image import Image as DocxImage
+from lxml import etree
+
+from backend.utils.barcode_generator import barcode_png
+from backend.utils.media_registry import MediaRegistry, rotated_logo
+
+# Размеры в twips (1 мм = 56.7 twips, как в генераторах python-docx) и EMU
+TWIPS_PER_MM = 56.7
+EMU_PER_MM = 36000
+PAGE_WIDTH = 11906
+PAGE_HEIGHT = 16838
+STICKER_WIDTH = int(105 * TWIPS_PER_MM)
+# Наклейка 105 × 148.5 мм; строка чуть ниже половины листа, чтобы после
+# таблицы поместился обязательный завершающий абзац и не появлялся пустой лист
+STICKER_ROW_HEIGHT = 8400
+STICKERS_PER_PAGE = 4
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+IMAGE_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+
+_base_package = None
+
+# SHA-256 DOCX-шаблона -> скомпилированная ячейка наклейки (None - шаблон не подходит)
+_cell_templates = {}
+CELL_TEMPLATES_LIMIT = 4
+
+def _base():
+    """Части пустого документа python-docx (создаются один раз на процесс)"""
+    global _base_package
+    if _base_package is None:
+        buffer = io.BytesIO()
+        Document().save(buffer)
+        with zipfile.ZipFile(buffer) as package:
+            parts = {name: package.read(name) for name in package.namelist()}
+        document_xml = parts.pop("word/document.xml").decode("utf-8")
+        header = document_xml[:document_xml.index("<w:body>") + len("<w:body>")]
+        sect_pr = re.search(r"<w:sectPr\b.*?</w:sectPr>", document_xml, re.S).group(0)
+        _base_package = (parts, header, sect_pr)
+    return _base_package
+
+
+def _text(value):
+    """Экранирование текста для w:t"""
+    return escape(str(value)) if value is not None else ""
+
+
+def _run(text, bold=False, font=None, size=None):
+    """Run с текстом; переносы строк - w:br"""
+    rpr = ""
+    if font:
+        rpr += f'<w:rFonts w:ascii="{font}" w:hAnsi="{font}"/>'
+    if bold:
+        rpr += "<w:b/>"
+    if size:
+        rpr += f'<w:sz w:val="{int(size * 2)}"/>'
+    content = "<w:br/>".join(
+        f'<w:t xml:space="preserve">{_text(line)}</w:t>' if line else ""
+        for line in str(text).split("\n")
+    )
+    return f"<w:r>{f'<w:rPr>{rpr}</w:rPr>' if rpr else ''}{content}</w:r>"
+
+
+def _alfa_runs(name, font=None, size=None, suffix_runs=""):
+    """Название номенклатуры: "ALFA" жирным и перенос строки после него"""
+    parts = name.split("ALFA", 1)
+    if len(parts) != 2:
+        return _run(name, font=font, size=size) + suffix_runs
+    return (
+        _run(parts[0], font=font, size=size)
+        + _run("ALFA", bold=True, font=font, size=size)
+        + "<w:r><w:br/></w:r>"
+        + _run(parts[1], font=font, size=size)
+        + suffix_runs
+    )
+
+
+class DocxPackage:
+    """DOCX-пакет: document.xml потоком, изображения без повторов"""
+
+    def __init__(self):
+        self.media = MediaRegistry("media/image{index}.{ext}")
+        self._drawing_id = 0
+
+    def image_rel(self, blob, ext=None):
+        """Идентификатор связи изображения (одинаковые байты - одна часть пакета)"""
+        if ext is None:
+            try:
+                ext = DocxImage.from_blob(blob).ext
+            except Exception:
+                ext = None
+        return f"rIdImage{self.media.add(blob, ext).index}"
+
+    def next_drawing_id(self):
+        """Уникальный id для wp:docPr"""
+        self._drawing_id += 1
+        return self._drawing_id
+
+    def picture(self, blob, width_mm, height_mm):
+        """Run с изображением в строке текста"""
+        rel_id = self.image_rel(blob)
+        drawing_id = self.next_drawing_id()
+        cx = int(width_mm * EMU_PER_MM)
+        cy = int(height_mm * EMU_PER_MM)
+        return (
+            '<w:r><w:drawing><wp:inline distT="0" distB="0" distL="0" distR="0">'
+            f'<wp:extent cx="{cx}" cy="{cy}"/>'
+            f'<wp:docPr id="{drawing_id}" name="Picture {drawing_id}"/>'
+            '<wp:cNvGraphicFramePr><a:graphicFrameLocks xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" noChangeAspect="1"/></wp:cNvGraphicFramePr>'
+            '<a:graphic xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main">'
+            '<a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+            '<pic:pic xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture">'
+            f'<pic:nvPicPr><pic:cNvPr id="{drawing_id}" name="image{drawing_id}"/><pic:cNvPicPr/></pic:nvPicPr>'
+            f'<pic:blipFill><a:blip r:embed="{rel_id}"/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+            f'<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm>'
+            '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></pic:spPr>'
+            '</pic:pic></a:graphicData></a:graphic></wp:inline></w:drawing></w:r>'
+        )
+
+    def _document_rels(self, base_rels):
+        rels = base_rels.decode("utf-8").replace("</Relationships>", "")
+        for entry in self.media:
+            rels += f'<Relationship Id="rIdImage{entry.index}" Type="{IMAGE_REL}" Target="{entry.path}"/>'
+        return (rels + "</Relationships>").encode("utf-8")
+
+    def _content_types_xml(self, base_types):
+        types = base_types.decode("utf-8")
+        content_types = {entry.ext: entry.content_type for entry in self.media}
+        defaults = "".join(
+            f'<Default Extension="{ext}" ContentType="{content_type}"/>'
+            for ext, content_type in content_types.items()
+            if f'Extension="{ext}"' not in types
+        )
+        return types.replace("<Override ", defaults + "<Override ", 1).encode("utf-8")
+
+    def save(self, body_chunks, sect_pr):
+        """Архив DOCX: body_chunks - строки XML тела документа (генератор)"""
+        parts, header, _ = _base()
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as package:
+            with package.open("word/document.xml", "w") as document:
+                document.write(header.encode("utf-8"))
+                for chunk in body_chunks:
+                    document.write(chunk.encode("utf-8"))
+                document.write(f"{sect_pr}</w:body></w:document>".encode("utf-8"))
+            for name, content in parts.items():
+                if name == "word/_rels/document.xml.rels":
+                    content = self._document_rels(content)
+                elif name == "[Content_Types].xml":
+                    content = self._content_types_xml(content)
+                package.writestr(name, content)
+            for entry in self.media:
+                package.writestr(f"word/{entry.path}", entry.blob)
+        self.media.report()
+        return buffer.getvalue()
+
+
+def _sect_pr(margins):
+    """sectPr базового документа с листом A4 (margins=0 - без полей)"""
+    sect_pr = re.sub(r'<w:pgSz [^>]*/>', f'<w:pgSz w:w="{PAGE_WIDTH}" w:h="{PAGE_HEIGHT}"/>', _base()[2])
+    if margins == 0:
+        sect_pr = re.sub(
+            r'<w:pgMar [^>]*/>',
+            '<w:pgMar w:top="0" w:right="0" w:bottom="0" w:left="0" w:header="720" w:footer="720" w:gutter="0"/>',
+            sect_pr
+        )
+    return sect_pr
+
+
+# Общая сетка листа для макетов Excel и DOCX-шаблона: одна таблица 2 колонки
+# по 105 мм с тонкими границами, две строки на лист (строки не разрываются)
+_BORDERS = "".join(
+    f'<w:{side} w:val="single" w:sz="4" w:space="0" w:color="000000"/>'
+    for side in ("top", "left", "bottom", "right", "insideH", "insideV")
+)
+_ZERO_MARGINS = "".join(f'<w:{side} w:w="0" w:type="dxa"/>' for side in ("top", "left", "bottom", "right"))
+GRID_TABLE_START = (
+    f'<w:tbl><w:tblPr><w:tblW w:w="{2 * STICKER_WIDTH}" w:type="dxa"/>'
+    f'<w:tblBorders>{_BORDERS}</w:tblBorders><w:tblCellMar>{_ZERO_MARGINS}</w:tblCellMar>'
+    '<w:tblLook w:val="04A0" w:firstRow="1" w:lastRow="0" w:firstColumn="1" w:lastColumn="0" w:noHBand="0" w:noVBand="1"/>'
+    f'</w:tblPr><w:tblGrid><w:gridCol w:w="{STICKER_WIDTH}"/><w:gridCol w:w="{STICKER_WIDTH}"/></w:tblGrid>'
+)
+GRID_ROW_START = f'<w:tr><w:trPr><w:cantSplit/><w:trHeight w:val="{STICKER_ROW_HEIGHT}" w:hRule="exact"/></w:trPr>'
+GRID_CELL_START = (
+    f'<w:tc><w:tcPr><w:tcW w:w="{STICKER_WIDTH}" w:type="dxa"/>'
+    f'<w:tcMar>{_ZERO_MARGINS}</w:tcMar><w:vAlign w:val="top"/></w:tcPr>'
+)
+# Завершающий абзац после таблицы высотой 1 pt
+GRID_TABLE_END = (
+    '</w:tbl><w:p><w:pPr><w:spacing w:before="0" w:after="0" w:line="20" w:lineRule="exact"/>'
+    '<w:rPr><w:sz w:val="2"/></w:rPr></w:pPr></w:p>'
+)
+
+
+def _grid_body(passports, render_cell, progress=None):
+    """Тело документа: наклейки по 4 на лист в общей таблице 2 колонки"""
+    total_pages = (len(passports) + STICKERS_PER_PAGE - 1) // STICKERS_PER_PAGE
+    yield GRID_TABLE_START
+    for page, start in enumerate(range(0, len(passports), STICKERS_PER_PAGE), start=1):
+        group = passports[start:start + STICKERS_PER_PAGE]
+        for row in range(0, STICKERS_PER_PAGE, 2):
+            cells = []
+            for passport in group[row:row + 2] + [None] * (2 - len(group[row:row + 2])):
+                content = render_cell(passport) if passport is not None and passport.nomenclature else None
+                cells.append(f"{GRID_CELL_START}{content or '<w:p/>'}</w:tc>")
+            yield GRID_ROW_START + "".join(cells) + "</w:tr>"
+        if progress:
+            progress(page, total_pages)
+    yield GRID_TABLE_END
+
+
+def _manufacture_date(passport):
+    return passport.created_at or datetime.now()
+
+
+def _stock_code(nomenclature):
+    return nomenclature.article or getattr(nomenclature, "code_1c", None) or "3501040"
+
+
+# --- Макет Excel-шаблона: 10 × 3, логотип вертикально в левой колонке ---
+
+EXCEL_FONT = "Exo2"
+EXCEL_FONT_SIZE = 10
+EXCEL_COLUMNS = (int(105 * 0.15 * TWIPS_PER_MM), int(105 * 0.425 * TWIPS_PER_MM), int(105 * 0.425 * TWIPS_PER_MM))
+EXCEL_LOGO_SIZE_MM = (12, 141)
+BARCODE_SIZE_MM = (40, 10)
+
+_INNER_MARGINS = "".join(f'<w:{side} w:w="75" w:type="dxa"/>' for side in ("top", "left", "bottom", "right"))
+
+
+def _excel_cell(width, content="", span=1, merge=None, align="left"):
+    """Ячейка внутренней таблицы наклейки"""
+    props = f'<w:tcW w:w="{width}" w:type="dxa"/>'
+    if span > 1:
+        props += f'<w:gridSpan w:val="{span}"/>'
+    if merge:
+        props += f'<w:vMerge w:val="{merge}"/>' if merge == "restart" else "<w:vMerge/>"
+    props += f"<w:tcMar>{_INNER_MARGINS}</w:tcMar>"
+    return f'<w:tc><w:tcPr>{props}</w:tcPr><w:p><w:pPr><w:jc w:val="{align}"/></w:pPr>{content}</w:p></w:tc>'
+
+
+def _excel_text(text):
+    return _run(text, font=EXCEL_FONT, size=EXCEL_FONT_SIZE)
+
+
+def _excel_row(*cells):
+    return "<w:tr>" + "".join(cells) + "</w:tr>"
+
+
+def _compile_excel_layout():
+    """Ячейка наклейки макета Excel как строка формата с полями {…}"""
+    logo_width, data_width, _ = EXCEL_COLUMNS
+    span_width = 2 * data_width
+    logo_continue = _excel_cell(logo_width, merge="continue", align="center")
+    label = lambda text: _excel_cell(data_width, _excel_text(text))
+    rows = [
+        _excel_row(_excel_cell(logo_width, "{logo}", merge="restart", align="center"),
+                   _excel_cell(data_width), _excel_cell(data_width)),
+        _excel_row(logo_continue, _excel_cell(span_width, "{name}", span=2, align="center")),
+        _excel_row(logo_continue, label("Артикул:"), _excel_cell(data_width, "{stock_code}")),
+        _excel_row(logo_continue, label("Высота матрицы:"), _excel_cell(data_width, "{height}")),
+        _excel_row(logo_continue, label("Промывочные отверстия:"), _excel_cell(data_width, "{waterways}")),
+        _excel_row(logo_continue, label("Типоразмер:"), _excel_cell(data_width, "{matrix}")),
+        _excel_row(logo_continue, _excel_cell(span_width, "{serial_number}", span=2)),
+        _excel_row(logo_continue, _excel_cell(span_width, "{date}", span=2)),
+        _excel_row(logo_continue, _excel_cell(span_width, _excel_text("almazgeobur.ru"), span=2, align="center")),
+        _excel_row(logo_continue, _excel_cell(data_width), _excel_cell(data_width)),
+    ]
+    grid = "".join(f'<w:gridCol w:w="{width}"/>' for width in EXCEL_COLUMNS)
+    # Фигурные скобки в статичном XML отсутствуют, поэтому строка пригодна для format_map
+    return (
+        '<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:w="0" w:type="auto"/>'
+        '<w:tblLook w:val="04A0" w:firstRow="1" w:lastRow="0" w:firstColumn="1" w:lastColumn="0" w:noHBand="0" w:noVBand="1"/>'
+        f'</w:tblPr><w:tblGrid>{grid}</w:tblGrid>' + "".join(rows) + "</w:tbl><w:p/>"
+    )
+
+
+EXCEL_LAYOUT = _compile_excel_layout()
+
+
+def generate_stickers_docx_excel_layout(passports, logo_path=None, progress=None):
+    """DOCX наклеек в макете Excel-шаблона (4 на лист A4)"""
+    package = DocxPackage()
+    logo = rotated_logo(logo_path) if logo_path else None
+
+    def render_cell(passport):
+        nomenclature = passport.nomenclature
+        stock_code = _stock_code(nomenclature)
+        serial_number = passport.passport_number or "AGB0000125"
+        height = str(nomenclature.height or getattr(nomenclature, "drilling_depth", None) or "12")
+        waterways = str(getattr(nomenclature, "waterways", None) or "8")
+        date = _manufacture_date(passport)
+
+        stock_code_runs = _excel_text(stock_code)
+        stock_barcode = barcode_png(stock_code, *BARCODE_SIZE_MM)
+        if stock_barcode:
+            stock_code_runs += "<w:r><w:br/></w:r>" + package.picture(stock_barcode, *BARCODE_SIZE_MM)
+        serial_runs = _excel_text("Серийный номер: ") + _excel_text(serial_number)
+        serial_barcode = barcode_png(serial_number, *BARCODE_SIZE_MM)
+        if serial_barcode:
+            serial_runs += "<w:r><w:br/></w:r>" + package.picture(serial_barcode, *BARCODE_SIZE_MM)
+
+        return EXCEL_LAYOUT.format_map({
+            "logo": package.picture(logo, *EXCEL_LOGO_SIZE_MM) if logo else "",
+            "name": _alfa_runs(nomenclature.name or "Коронка импрегнированная", EXCEL_FONT, EXCEL_FONT_SIZE),
+            "stock_code": stock_code_runs,
+            "height": _excel_text(f"{height} мм."),
+            "waterways": _excel_text(f"{waterways} мм."),
+            "matrix": _excel_text(nomenclature.matrix or "HQ"),
+            "serial_number": serial_runs,
+            "date": _excel_text(f"Дата изготовления: «{date:%d}» {date:%m} {date:%Y}"),
+        })
+
+    return package.save(_grid_body(passports, render_cell, progress), _sect_pr(margins=0))
+
+
+# --- Макет DOCX-шаблона: первая ячейка первой таблицы с плейсхолдерами ---
+
+TEMPLATE_LOGO_SIZE_MM = (18, 5.4)
+TEMPLATE_FONT = "Exo2"
+_PLACEHOLDER = re.compile(r"\{\{\s*(?:r\s+)?([^{}]+?)\s*\}\}")
+_TEMPLATE_TOKEN = re.compile(
+    r"\{\{\s*(?:r\s+)?(?P<field>[^{}<]+?)\s*\}\}"
+    r'|(?P<embed>\b[\w]+:(?:embed|link))="(?P<rel>[^"]+)"'
+    r'|(?P<docpr><(?:wp:docPr|pic:cNvPr)\b[^>]*?\bid=")\d+(?=")'
+)
+# Разметка между фигурными скобками и внутри {{ ... }} (как DocxTemplate.patch_xml):
+# плейсхолдер, разбитый Word на несколько run, собирается из текста w:t
+_BRACE_TAGS = re.compile(r"(?<={)(<[^>]*>)+(?=[\{%\#])|(?<=[%\}\#])(<[^>]*>)+(?=\})", re.S)
+_PLACEHOLDER_SPAN = re.compile(r"{{(?:(?!}}).)*", re.S)
+_TEXT_BREAK = re.compile(r"</w:t>.*?(<w:t>|<w:t [^>]*>)", re.S)
+# Поля, которые заполняет generate_stickers_docx_from_template
+TEMPLATE_IMAGE_FIELDS = ("logo", "stock_code", "serial_number_code")
+_NS_DECLARATION = re.compile(r' xmlns:(\w+)="([^"]*)"')
+_RUN_START = re.compile(r"<w:r(?=[\s>])")
+_RUN_PROPS = re.compile(r"<w:r\b[^>]*>\s*(<w:rPr>.*?</w:rPr>)?", re.S)
+
+
+def _enclosing_run_props(xml_before):
+    """w:rPr run, внутри которого стоит плейсхолдер"""
+    starts = list(_RUN_START.finditer(xml_before))
+    if not starts:
+        return ""
+    match = _RUN_PROPS.match(xml_before, starts[-1].start())
+    return (match.group(1) or "") if match else ""
+
+
+def compile_template_cell(template_bytes):
+    """Ячейка наклейки из DOCX-шаблона: список литералов и полей
+
+    Плейсхолдеры {{ имя }} становятся полями ("field", имя, rPr run), ссылки
+    r:embed на изображения шаблона - полями ("embed", байты, расширение),
+    id рисунков - полями ("docpr",). Плейсхолдеры, разбитые на несколько run,
+    собираются из текста w:t, как в docxtpl. None, если в шаблоне нет
+    таблицы, есть управляющие теги {% ... %} или плейсхолдер, который здесь
+    не заполняется (такой шаблон остается на docxtpl).
+    """
+    key = hashlib.sha256(template_bytes).hexdigest()
+    if key in _cell_templates:
+        return _cell_templates[key]
+
+    tokens = None
+    with zipfile.ZipFile(io.BytesIO(template_bytes)) as package:
+        document = etree.fromstring(package.read("word/document.xml"))
+        cell = document.find(f".//{{{W_NS}}}tbl//{{{W_NS}}}tc")
+        rels = {}
+        if "word/_rels/document.xml.rels" in package.namelist():
+            for rel in etree.fromstring(package.read("word/_rels/document.xml.rels")):
+                if rel.get("Type") == IMAGE_REL and rel.get("TargetMode") != "External":
+                    target = rel.get("Target").lstrip("/")
+                    target = target if target.startswith("word/") else f"word/{target}"
+                    if target in package.namelist():
+                        rels[rel.get("Id")] = (package.read(target), target.rsplit(".", 1)[-1])
+        if cell is not None:
+            # Пространства имен, объявленные в корне документа, не повторяем в каждом элементе
+            declared = set(_NS_DECLARATION.findall(_base()[1]))
+            xml = "".join(
+                _NS_DECLARATION.sub(
+                    lambda m: "" if m.groups() in declared else m.group(0),
+                    etree.tostring(child, encoding="unicode")
+                )
+                for child in cell if child.tag != f"{{{W_NS}}}tcPr"
+            )
+            xml = _BRACE_TAGS.sub("", xml)
+            xml = _PLACEHOLDER_SPAN.sub(lambda m: _TEXT_BREAK.sub("", m.group(0)), xml)
+            if "{%" not in xml:
+                tokens = []
+                position = 0
+                for match in _TEMPLATE_TOKEN.finditer(xml):
+                    tokens.append(xml[position:match.start()])
+                    if match.group("field"):
+                        tokens.append(("field", match.group("field"), _enclosing_run_props(xml[:match.start()])))
+                    elif match.group("embed"):
+                        image = rels.get(match.group("rel"))
+                        if image is None:
+                            tokens.append(match.group(0))
+                        else:
+                            tokens.append(f'{match.group("embed")}="')
+                            tokens.append(("embed",) + image)
+                            tokens.append('"')
+                    else:
+                        tokens.append(match.group("docpr"))
+                        tokens.append(("docpr",))
+                    position = match.end()
+                tokens.append(xml[position:])
+                known = set(TEMPLATE_IMAGE_FIELDS) | {"nomenclature_name"} | set(TEMPLATE_VALUE_FIELDS)
+                supported = all(
+                    token[1] in known if isinstance(token, tuple) and token[0] == "field" else
+                    not isinstance(token, str) or "{{" not in token
+                    for token in tokens
+                )
+                tokens = tuple(tokens) if supported else None
+
+    if len(_cell_templates) >= CELL_TEMPLATES_LIMIT:
+        _cell_templates.clear()
+    _cell_templates[key] = tokens
+    return tokens
+
+
+TEMPLATE_VALUE_FIELDS = (
+    "article", "matrix", "height_mm", "waterways_mm", "serial_number", "serial number",
+    "waterways", "height", "production_date", "date", "manufacture_date",
+    "manufacture_date_formatted", "website", "order_number",
+)
+
+
+def template_values(passport, nomenclature, production_date):
+    """Текстовые значения плейсхолдеров (как в render_template_to_cell)"""
+    height = str(nomenclature.height or getattr(nomenclature, "drilling_depth", None) or "12")
+    waterways = str(getattr(nomenclature, "waterways", None) or "8")
+    serial_number = passport.passport_number or "AGB 3-5 NQ 0000125"
+    manufacture_date = _manufacture_date(passport).strftime("%d.%m.%Y")
+    return {
+        "article": nomenclature.article or getattr(nomenclature, "code_1c", None) or "3501040",
+        "matrix": nomenclature.matrix or "HQ",
+        "height_mm": f"{height}ММ",
+        "waterways_mm": f"{waterways}ММ",
+        "serial_number": serial_number,
+        "serial number": serial_number,
+        "waterways": waterways,
+        "height": height,
+        "production_date": production_date,
+        "date": production_date,
+        "manufacture_date": manufacture_date,
+        "manufacture_date_formatted": f"{manufacture_date}г.",
+        "website": "almazgeobur.ru",
+        "order_number": getattr(passport, "order_number", None) or "",
+    }
+
+
+def generate_stickers_docx_from_template(passports, template_bytes, logo_path=None, progress=None):
+    """DOCX наклеек из скомпилированной ячейки DOCX-шаблона; None, если шаблон не подходит"""
+    tokens = compile_template_cell(template_bytes)
+    if tokens is None:
+        return None
+
+    package = DocxPackage()
+    logo = None
+    if logo_path:
+        with open(logo_path, "rb") as f:
+            logo = f.read()
+
+    def inline(rpr, runs):
+        # Изображения и форматированный текст - отдельные run вместо текста плейсхолдера
+        return f'</w:t></w:r>{runs}<w:r>{rpr}<w:t xml:space="preserve">'
+
+    def render_cell(passport):
+        nomenclature = passport.nomenclature
+        production_date = passport.created_at.strftime("%Y") if passport.created_at else "2025"
+        values = template_values(passport, nomenclature, production_date)
+        images = {
+            "logo": (logo, TEMPLATE_LOGO_SIZE_MM),
+            "stock_code": (barcode_png(values["article"], *BARCODE_SIZE_MM), BARCODE_SIZE_MM),
+            "serial_number_code": (
+                barcode_png(passport.passport_number or "AGB0000125", *BARCODE_SIZE_MM), BARCODE_SIZE_MM
+            ),
+        }
+        text = {"stock_code": values["article"], "serial_number_code": passport.passport_number or "AGB0000125"}
+
+        out = []
+        for token in tokens:
+            if isinstance(token, str):
+                out.append(token)
+            elif token[0] == "field":
+                name, rpr = token[1], token[2]
+                if name in images:
+                    blob, size = images[name]
+                    out.append(inline(rpr, package.picture(blob, *size)) if blob else _text(text.get(name, "")))
+                elif name == "nomenclature_name":
+                    out.append(inline(rpr, _alfa_runs(nomenclature.name or "Коронка импрегнированная", TEMPLATE_FONT)))
+                else:
+                    out.append(_text(values[name]))
+            elif token[0] == "embed":
+                out.append(package.image_rel(token[1], token[2]))
+            else:
+                out.append(str(package.next_drawing_id()))
+        return "".join(out)
+
+    return package.save(_grid_body(passports, render_cell, progress), _sect_pr(margins=0))
+
+
+# --- Стандартный макет: название и серийный номер ---
+
+def generate_stickers_docx_standard(passports, progress=None):
+    """DOCX наклеек без шаблона (таблица 2 × 2 на лист, поля по умолчанию)"""
+    column_width = (PAGE_WIDTH - 2 * 1800) // 2
+    table_start = (
+        '<w:tbl><w:tblPr><w:tblW w:type="auto" w:w="0"/>'
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" w:noHBand="0" w:noVBand="1" w:val="04A0"/>'
+        f'</w:tblPr><w:tblGrid><w:gridCol w:w="{column_width}"/><w:gridCol w:w="{column_width}"/></w:tblGrid>'
+    )
+    cell_start = f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{column_width}"/></w:tcPr>'
+    page_break = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+
+    def render_cell(passport):
+        nomenclature = passport.nomenclature
+        if not nomenclature:
+            return "<w:p/>"
+        number = _run(f"\n{passport.passport_number}")
+        return f"<w:p>{_alfa_runs(nomenclature.name or 'Коронка импрегнированная', suffix_runs=number)}</w:p>"
+
+    def body():
+        total_pages = (len(passports) + STICKERS_PER_PAGE - 1) // STICKERS_PER_PAGE
+        for page, start in enumerate(range(0, len(passports), STICKERS_PER_PAGE), start=1):
+            group = passports[start:start + STICKERS_PER_PAGE]
+            rows = []
+            for row in range(0, STICKERS_PER_PAGE, 2):
+                cells = "".join(
+                    cell_start + (render_cell(group[idx]) if idx < len(group) else "<w:p/>") + "</w:tc>"
+                    for idx in (row, row + 1)
+                )
+                rows.append(f"<w:tr>{cells}</w:tr>")
+            yield table_start + "".join(rows) + "</w:tbl>"
+            if page < total_pages:
+                yield page_break
+            if progress:
+                progress(page, total_pages)
+
+    return DocxPackage().save(body(), _sect_pr(margins=None))
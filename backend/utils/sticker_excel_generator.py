@@ -5,141 +5,244 @@
 import os
 import io
 import sys
-from typing import List
+import copy
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple
 from openpyxl import load_workbook, Workbook
 from openpyxl.utils import get_column_letter
 from openpyxl.drawing.image import Image as OpenpyxlImage
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
 from openpyxl.cell.cell import MergedCell
+from openpyxl.worksheet.cell_range import CellRange
+from openpyxl.worksheet.merge import MergedCellRange
 from openpyxl.drawing.spreadsheet_drawing import AnchorMarker, OneCellAnchor
 from openpyxl.drawing.xdr import XDRPositiveSize2D
 from openpyxl.worksheet.pagebreak import Break
 from backend.utils.template_manager import get_template_manager
-from backend.utils.barcode_generator import generate_barcode_image
+from backend.utils.barcode_generator import barcode_png, report_barcode_cache
+from backend.utils.media_registry import XlsxMedia, rotated_logo, save_workbook
 
 
-def copy_template_to_target(template_ws, target_ws, row_offset, col_offset, row_height_scale: float = 1.0):
+# Плейсхолдер {{ name }} в ячейке шаблона
+PLACEHOLDER_RE = re.compile(r'\{\{\s*(.*?)\s*\}\}', re.DOTALL)
+
+# SHA-256 Excel-шаблона -> модель наклейки (StickerTemplateModel)
+_template_models = {}
+TEMPLATE_MODELS_LIMIT = 4
+
+
+class StickerTemplateModel(NamedTuple):
+    """Разобранный Excel-шаблон наклейки (координаты от 0 внутри наклейки)
+
+    cells - (строка, колонка, значение, id стиля) ячеек вне объединений и
+    верхних левых ячеек объединений; styles - уникальные наборы
+    (font, alignment, border, fill), None - атрибут не копируется;
+    placeholders - (строка, колонка, имена {{ ... }} в нижнем регистре)
+    ячеек с плейсхолдерами по порядку строк.
     """
-    Полностью копирует шаблон в целевой лист начиная с указанной позиции
-    Копирует: значения, стили, размеры, объединения
+    rows: int
+    cols: int
+    column_widths: Tuple[Tuple[int, float], ...]
+    row_heights: Tuple[Tuple[int, float], ...]
+    merges: Tuple[Tuple[int, int, int, int], ...]
+    cells: Tuple[Tuple[int, int, object, int], ...]
+    styles: Tuple[tuple, ...]
+    placeholders: Tuple[Tuple[int, int, Tuple[str, ...]], ...]
+
+    def placeholder_cells(self, name=None):
+        """Ячейки (строка, колонка) с плейсхолдерами (или с плейсхолдером name)"""
+        return [
+            (row, col) for row, col, names in self.placeholders
+            if name is None or name.lower() in names
+        ]
+
+
+def _template_cell_style(source_cell):
+    """Стиль ячейки шаблона для наклейки: (font, alignment, border, fill)"""
+    font = alignment = border = fill = None
+    try:
+        if source_cell.font:
+            font = Font(
+                name=source_cell.font.name,
+                size=source_cell.font.size,
+                bold=source_cell.font.bold,
+                italic=source_cell.font.italic,
+                color=source_cell.font.color
+            )
+    except Exception:
+        pass
+    try:
+        if source_cell.alignment:
+            alignment = Alignment(
+                horizontal=source_cell.alignment.horizontal,
+                vertical=source_cell.alignment.vertical,
+                wrap_text=source_cell.alignment.wrap_text,
+                indent=getattr(source_cell.alignment, 'indent', 0),
+                text_rotation=getattr(source_cell.alignment, 'text_rotation', 0)
+            )
+    except Exception:
+        pass
+    try:
+        if source_cell.border:
+            source_border = source_cell.border
+            border = Border(
+                left=Side(style=source_border.left.style, color=source_border.left.color) if source_border.left and source_border.left.style else None,
+                right=Side(style=source_border.right.style, color=source_border.right.color) if source_border.right and source_border.right.style else None,
+                top=Side(style=source_border.top.style, color=source_border.top.color) if source_border.top and source_border.top.style else None,
+                bottom=Side(style=source_border.bottom.style, color=source_border.bottom.color) if source_border.bottom and source_border.bottom.style else None
+            )
+    except Exception:
+        pass
+    try:
+        source_fill = source_cell.fill
+        if source_fill and hasattr(source_fill, 'patternType'):
+            fill = PatternFill(
+                patternType=source_fill.patternType,
+                fgColor=source_fill.fgColor,
+                bgColor=getattr(source_fill, 'bgColor', None)
+            )
+    except Exception:
+        pass
+    return font, alignment, border, fill
+
+
+def compile_sticker_template(template_path) -> StickerTemplateModel:
+    """Модель Excel-шаблона наклейки (разбор один раз на версию шаблона)
+
+    Ключ кэша - SHA-256 содержимого файла: после замены шаблона через
+    TemplateManager модель строится заново.
     """
-    STICKER_ROWS = template_ws.max_row
-    STICKER_COLS = template_ws.max_column
+    import hashlib
+    with open(template_path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    model = _template_models.get(digest)
+    if model is not None:
+        return model
     
-    # 1. Копируем размеры колонок
-    for col_idx in range(1, STICKER_COLS + 1):
-        col_letter = get_column_letter(col_idx)
-        source_width = template_ws.column_dimensions[col_letter].width
-        if source_width:
-            target_col_letter = get_column_letter(col_offset + col_idx - 1)
-            target_ws.column_dimensions[target_col_letter].width = source_width
+    template_ws = load_workbook(io.BytesIO(content)).active
+    rows = template_ws.max_row
+    cols = template_ws.max_column
     
-    # 2. Копируем высоты строк (с возможным масштабированием по высоте наклейки)
-    for row_idx in range(1, STICKER_ROWS + 1):
-        source_height = template_ws.row_dimensions[row_idx].height
-        if source_height:
-            target_row = row_offset + row_idx - 1
-            try:
-                target_ws.row_dimensions[target_row].height = float(source_height) * float(row_height_scale)
-            except Exception:
-                target_ws.row_dimensions[target_row].height = source_height
+    column_widths = []
+    for col_idx in range(1, cols + 1):
+        width = template_ws.column_dimensions[get_column_letter(col_idx)].width
+        if width:
+            column_widths.append((col_idx - 1, width))
+    
+    row_heights = []
+    for row_idx in range(1, rows + 1):
+        height = template_ws.row_dimensions[row_idx].height
+        if height:
+            row_heights.append((row_idx - 1, height))
     
-    # 3. Копируем объединенные ячейки
+    merges = []
+    covered = set()
     for merged_range in template_ws.merged_cells.ranges:
         min_col, min_row, max_col, max_row = merged_range.bounds
-        target_min_col = col_offset + min_col - 1
-        target_min_row = row_offset + min_row - 1
-        target_max_col = col_offset + max_col - 1
-        target_max_row = row_offset + max_row - 1
-        
-        target_ws.merge_cells(
-            start_row=target_min_row,
-            start_column=target_min_col,
-            end_row=target_max_row,
-            end_column=target_max_col
-        )
+        merges.append((min_row - 1, min_col - 1, max_row - 1, max_col - 1))
+        for row_idx in range(min_row, max_row + 1):
+            for col_idx in range(min_col, max_col + 1):
+                if (row_idx, col_idx) != (min_row, min_col):
+                    covered.add((row_idx, col_idx))
     
-    # 4. Копируем все ячейки со значениями и стилями
-    for row_idx in range(1, STICKER_ROWS + 1):
-        for col_idx in range(1, STICKER_COLS + 1):
+    # Одинаковые стили ячеек хранятся в модели один раз
+    style_ids = {}
+    cells = []
+    placeholders = []
+    for row_idx in range(1, rows + 1):
+        for col_idx in range(1, cols + 1):
+            if (row_idx, col_idx) in covered:
+                continue
             source_cell = template_ws.cell(row_idx, col_idx)
-            target_row = row_offset + row_idx - 1
-            target_col = col_offset + col_idx - 1
-            target_cell = target_ws.cell(target_row, target_col)
-            
-            # Проверяем, не является ли ячейка частью объединения (MergedCell)
-            # Если да, то значение копируем только из главной ячейки
+            style_id = style_ids.setdefault(_template_cell_style(source_cell), len(style_ids))
+            cells.append((row_idx - 1, col_idx - 1, source_cell.value, style_id))
+            if isinstance(source_cell.value, str):
+                names = tuple(name.lower() for name in PLACEHOLDER_RE.findall(source_cell.value))
+                if names:
+                    placeholders.append((row_idx - 1, col_idx - 1, names))
+    
+    model = StickerTemplateModel(
+        rows=rows,
+        cols=cols,
+        column_widths=tuple(column_widths),
+        row_heights=tuple(row_heights),
+        merges=tuple(merges),
+        cells=tuple(cells),
+        styles=tuple(style_ids),
+        placeholders=tuple(placeholders),
+    )
+    if len(_template_models) >= TEMPLATE_MODELS_LIMIT:
+        _template_models.clear()
+    _template_models[digest] = model
+    print(f"    ✅ Excel шаблон наклейки разобран: {len(cells)} ячеек, {len(style_ids)} стилей, {len(merges)} объединений ({digest[:12]})")
+    return model
+
+
+class StickerStamper:
+    """Перенос модели шаблона в лист со смещением
+
+    Стиль ячейки применяется через openpyxl один раз на книгу, дальше
+    ячейкам наклеек копируется готовый набор индексов стилей книги.
+    """
+
+    def __init__(self, model: StickerTemplateModel, target_ws, row_height_scale: float = 1.0):
+        self.model = model
+        self.ws = target_ws
+        self.row_heights = []
+        for row, height in model.row_heights:
             try:
-                # Проверяем, является ли target_cell объединенной ячейкой
-                # После merge_cells, все ячейки кроме первой становятся MergedCell
-                if isinstance(target_cell, MergedCell):
-                    # Это объединенная ячейка, пропускаем копирование значения
-                    # Значение будет в главной ячейке объединения
-                    pass
-                else:
-                    # Это обычная ячейка, можно копировать значение
-                    if source_cell.value is not None:
-                        target_cell.value = source_cell.value
-            except (AttributeError, TypeError) as e:
-                # Если возникла ошибка, пропускаем эту ячейку
-                pass
-            
-            # Копируем стили (только для обычных ячеек, не для MergedCell)
-            # Проверяем, не является ли ячейка объединенной
-            if isinstance(target_cell, MergedCell):
-                # Пропускаем копирование стилей для объединенных ячеек
-                pass
+                self.row_heights.append((row, float(height) * float(row_height_scale)))
+            except Exception:
+                self.row_heights.append((row, height))
+        self._style_arrays = {}
+
+    def stamp(self, row_offset, col_offset):
+        """Наклейка из шаблона с левым верхним углом (row_offset, col_offset)"""
+        ws = self.ws
+        model = self.model
+        
+        # 1. Размеры колонок
+        for col, width in model.column_widths:
+            ws.column_dimensions[get_column_letter(col_offset + col)].width = width
+        
+        # 2. Высоты строк (с масштабированием по высоте наклейки)
+        for row, height in self.row_heights:
+            ws.row_dimensions[row_offset + row].height = height
+        
+        # 3. Объединения: области наклеек не пересекаются, поэтому диапазон
+        # добавляется без проверки вхождения во все объединения листа
+        merged_index = _merged_index(ws)
+        for min_row, min_col, max_row, max_col in model.merges:
+            merged_range = MergedCellRange(ws, CellRange(
+                min_col=col_offset + min_col, min_row=row_offset + min_row,
+                max_col=col_offset + max_col, max_row=row_offset + max_row
+            ).coord)
+            ws.merged_cells.ranges.add(merged_range)
+            ws._clean_merge_range(merged_range)
+            merged_index.add(merged_range.bounds)
+        
+        # 4. Значения и стили ячеек
+        style_arrays = self._style_arrays
+        for row, col, value, style_id in model.cells:
+            target_cell = ws.cell(row_offset + row, col_offset + col)
+            if value is not None:
+                target_cell.value = value
+            style_array = style_arrays.get(style_id)
+            if style_array is None:
+                font, alignment, border, fill = model.styles[style_id]
+                if font is not None:
+                    target_cell.font = font
+                if alignment is not None:
+                    target_cell.alignment = alignment
+                if border is not None:
+                    target_cell.border = border
+                if fill is not None:
+                    target_cell.fill = fill
+                style_arrays[style_id] = copy.copy(target_cell._style)
             else:
-                try:
-                    if source_cell.font:
-                        try:
-                            target_cell.font = Font(
-                                name=source_cell.font.name,
-                                size=source_cell.font.size,
-                                bold=source_cell.font.bold,
-                                italic=source_cell.font.italic,
-                                color=source_cell.font.color
-                            )
-                        except:
-                            pass
-                    
-                    if source_cell.alignment:
-                        try:
-                            target_cell.alignment = Alignment(
-                                horizontal=source_cell.alignment.horizontal,
-                                vertical=source_cell.alignment.vertical,
-                                wrap_text=source_cell.alignment.wrap_text,
-                                indent=getattr(source_cell.alignment, 'indent', 0),
-                                text_rotation=getattr(source_cell.alignment, 'text_rotation', 0)
-                            )
-                        except:
-                            pass
-                    
-                    if source_cell.border:
-                        try:
-                            source_border = source_cell.border
-                            target_cell.border = Border(
-                                left=Side(style=source_border.left.style, color=source_border.left.color) if source_border.left and source_border.left.style else None,
-                                right=Side(style=source_border.right.style, color=source_border.right.color) if source_border.right and source_border.right.style else None,
-                                top=Side(style=source_border.top.style, color=source_border.top.color) if source_border.top and source_border.top.style else None,
-                                bottom=Side(style=source_border.bottom.style, color=source_border.bottom.color) if source_border.bottom and source_border.bottom.style else None
-                            )
-                        except:
-                            pass
-                    
-                    if source_cell.fill:
-                        try:
-                            source_fill = source_cell.fill
-                            if hasattr(source_fill, 'patternType'):
-                                target_cell.fill = PatternFill(
-                                    patternType=source_fill.patternType,
-                                    fgColor=source_fill.fgColor,
-                                    bgColor=getattr(source_fill, 'bgColor', None)
-                                )
-                        except:
-                            pass
-                except (AttributeError, TypeError):
-                    pass
+                target_cell._style = copy.copy(style_array)
 
 
 def find_and_replace_cell(ws, row_offset, col_offset, sticker_rows, sticker_cols, search_text, new_value):
@@ -183,51 +286,114 @@ def _get_image_cell_position(image):
         return None, None
 
 
+class ImageAnchorIndex:
+    """Изображения листа по ячейке привязки: (строка, колонка) -> [изображения]
+
+    Лист наклеек накапливает логотипы и штрихкоды всех наклеек, поэтому
+    поиск изображений ячейки перебором ws._images для каждой наклейки дает
+    квадратичную сложность. Изображения добавляются через индекс; если
+    ws._images изменен в обход индекса (количество не совпадает), индекс
+    строится заново.
+    """
+
+    def __init__(self, ws):
+        self.ws = ws
+        self._cells = {}
+        self._count = 0
+
+    def _register(self, image):
+        img_row, img_col = _get_image_cell_position(image)
+        if img_row is not None:
+            self._cells.setdefault((img_row, img_col), []).append(image)
+        self._count += 1
+
+    def _sync(self):
+        images = getattr(self.ws, '_images', None) or []
+        if self._count != len(images):
+            self._cells = {}
+            self._count = 0
+            for image in images:
+                self._register(image)
+
+    def add(self, image):
+        """Добавляет изображение на лист (привязка уже задана в image.anchor)"""
+        self._sync()
+        self.ws.add_image(image)
+        self._register(image)
+
+    def remove(self, cells) -> int:
+        """Удаляет изображения, привязанные к ячейкам cells (1-based). Возвращает количество удалённых."""
+        self._sync()
+        removed = []
+        for cell in cells:
+            removed.extend(self._cells.pop(cell, ()))
+        if removed:
+            removed_ids = {id(image) for image in removed}
+            self.ws._images = [image for image in self.ws._images if id(image) not in removed_ids]
+            self._count = len(self.ws._images)
+        return len(removed)
+
+
+def _image_index(ws) -> ImageAnchorIndex:
+    """Индекс изображений листа (создается при первом обращении)"""
+    index = getattr(ws, '_sticker_image_index', None)
+    if index is None:
+        index = ws._sticker_image_index = ImageAnchorIndex(ws)
+    return index
+
+
 def _remove_images_in_region(ws, row_offset, col_offset, sticker_rows, sticker_cols):
     """Удаляет все изображения, чья верхняя левая ячейка попадает в область наклейки. Возвращает количество удалённых."""
-    removed = 0
-    if not hasattr(ws, '_images') or not ws._images:
-        return removed
-    to_remove = []
-    for image in list(ws._images):
-        img_row, img_col = _get_image_cell_position(image)
-        if img_row is None:
-            continue
-        if (row_offset <= img_row < row_offset + sticker_rows and
-                col_offset <= img_col < col_offset + sticker_cols):
-            to_remove.append(image)
-    for img in to_remove:
-        try:
-            ws._images.remove(img)
-            removed += 1
-        except Exception:
-            pass
-    return removed
+    return _image_index(ws).remove(_region_cells(row_offset, col_offset, sticker_rows, sticker_cols))
 
 
 def _remove_images_in_cell(ws, row_1based, col_1based):
     """Удаляет все изображения, привязанные к данной ячейке (1-based). Гарантирует отсутствие дублей перед вставкой."""
-    if not hasattr(ws, '_images') or not ws._images:
-        return
-    to_remove = []
-    for image in list(ws._images):
-        img_row, img_col = _get_image_cell_position(image)
-        if img_row == row_1based and img_col == col_1based:
-            to_remove.append(image)
-    for img in to_remove:
-        try:
-            ws._images.remove(img)
-        except Exception:
-            pass
+    _image_index(ws).remove([(row_1based, col_1based)])
+
+
+class MergedCellIndex:
+    """Объединения листа по ячейкам: (строка, колонка) -> bounds
+
+    Лист наклеек накапливает объединения всех наклеек, поэтому поиск
+    объединения перебором ws.merged_cells.ranges для каждой ячейки дает
+    квадратичную сложность. StickerStamper добавляет объединения в индекс
+    сразу; если объединения листа изменены в обход индекса (их количество
+    не совпадает), индекс строится заново.
+    """
+
+    def __init__(self, ws):
+        self.ws = ws
+        self._cells = {}
+        self._count = 0
+
+    def add(self, bounds):
+        min_col, min_row, max_col, max_row = bounds
+        for row_idx in range(min_row, max_row + 1):
+            for col_idx in range(min_col, max_col + 1):
+                self._cells[(row_idx, col_idx)] = bounds
+        self._count += 1
+
+    def bounds(self, row_idx, col_idx):
+        if self._count != len(self.ws.merged_cells.ranges):
+            self._cells = {}
+            self._count = 0
+            for merged_range in self.ws.merged_cells.ranges:
+                self.add(merged_range.bounds)
+        return self._cells.get((row_idx, col_idx))
+
+
+def _merged_index(ws) -> MergedCellIndex:
+    """Индекс объединений листа (создается при первом обращении)"""
+    index = getattr(ws, '_sticker_merged_index', None)
+    if index is None:
+        index = ws._sticker_merged_index = MergedCellIndex(ws)
+    return index
 
 
 def _find_merged_bounds(ws, row_idx, col_idx):
     """Возвращает bounds (min_col, min_row, max_col, max_row) объединения, если точка внутри; иначе None."""
-    for merged_range in ws.merged_cells.ranges:
-        min_col, min_row, max_col, max_row = merged_range.bounds
-        if min_row <= row_idx <= max_row and min_col <= col_idx <= max_col:
-            return min_col, min_row, max_col, max_row
-    return None
+    return _merged_index(ws).bounds(row_idx, col_idx)
 
 
 def _col_width_px(ws, col_1based):
@@ -284,7 +450,7 @@ def _add_image_centered(ws, img: OpenpyxlImage, row_1based: int, col_1based: int
     )
     size = XDRPositiveSize2D(cx=int(img_w_px * EMU_PER_PX), cy=int(img_h_px * EMU_PER_PX))
     img.anchor = OneCellAnchor(_from=marker, ext=size)
-    ws.add_image(img)
+    _image_index(ws).add(img)
 
 
 def _cell_display_value(ws, row_idx, col_idx):
@@ -292,47 +458,68 @@ def _cell_display_value(ws, row_idx, col_idx):
     cell = ws.cell(row_idx, col_idx)
     if not isinstance(cell, MergedCell):
         return cell.value
-    for merged_range in ws.merged_cells.ranges:
-        min_col, min_row, max_col, max_row = merged_range.bounds
-        if min_row <= row_idx <= max_row and min_col <= col_idx <= max_col:
-            return ws.cell(min_row, min_col).value
+    bounds = _find_merged_bounds(ws, row_idx, col_idx)
+    if bounds:
+        min_col, min_row, _, _ = bounds
+        return ws.cell(min_row, min_col).value
     return None
 
 
-def _find_cell_with_placeholder(ws, row_offset, col_offset, sticker_rows, sticker_cols, placeholder_name):
-    """Ищет ячейку, содержащую {{ placeholder_name }}. Возвращает (row, col) или (None, None)."""
-    import re
-    pattern = r'\{\{\s*' + re.escape(placeholder_name) + r'\s*\}\}'
-    for row_idx in range(row_offset, row_offset + sticker_rows):
-        for col_idx in range(col_offset, col_offset + sticker_cols):
-            cell = ws.cell(row_idx, col_idx)
-            if isinstance(cell, MergedCell):
-                continue
-            if cell.value and isinstance(cell.value, str) and re.search(pattern, cell.value, re.IGNORECASE):
-                return row_idx, col_idx
+@lru_cache(maxsize=64)
+def _placeholder_pattern(name):
+    """Регулярное выражение для {{ name }} (без учета регистра и пробелов)"""
+    return re.compile(r'\{\{\s*' + re.escape(name) + r'\s*\}\}', re.IGNORECASE)
+
+
+def _region_cells(row_offset, col_offset, sticker_rows, sticker_cols, cells=None):
+    """Ячейки области наклейки: все по порядку строк или cells (строка, колонка от 0)"""
+    if cells is None:
+        return [
+            (row_idx, col_idx)
+            for row_idx in range(row_offset, row_offset + sticker_rows)
+            for col_idx in range(col_offset, col_offset + sticker_cols)
+        ]
+    return [(row_offset + row, col_offset + col) for row, col in cells]
+
+
+def _find_cell_with_placeholder(ws, row_offset, col_offset, sticker_rows, sticker_cols, placeholder_name, cells=None):
+    """Ищет ячейку, содержащую {{ placeholder_name }}. Возвращает (row, col) или (None, None).
+
+    cells - ячейки шаблона с этим плейсхолдером (StickerTemplateModel.placeholder_cells),
+    без них проверяется вся область наклейки.
+    """
+    pattern = _placeholder_pattern(placeholder_name)
+    for row_idx, col_idx in _region_cells(row_offset, col_offset, sticker_rows, sticker_cols, cells):
+        cell = ws.cell(row_idx, col_idx)
+        if isinstance(cell, MergedCell):
+            continue
+        if cell.value and isinstance(cell.value, str) and pattern.search(cell.value):
+            return row_idx, col_idx
     return None, None
 
 
-def replace_all_variables(ws, row_offset, col_offset, sticker_rows, sticker_cols, variables_dict):
-    """Заменяет все переменные в формате {{ variable }} в области наклейки. Не трогает плейсхолдеры картинок (stock_code, serial_number_code)."""
-    import re
+def replace_all_variables(ws, row_offset, col_offset, sticker_rows, sticker_cols, variables_dict, cells=None):
+    """Заменяет все переменные в формате {{ variable }} в области наклейки. Не трогает плейсхолдеры картинок (stock_code, serial_number_code).
+
+    cells - ячейки шаблона с плейсхолдерами (StickerTemplateModel.placeholder_cells),
+    без них проверяется вся область наклейки.
+    """
     # Плейсхолдеры, которые подставляют картинки, не заменяем текстом
     image_placeholders = {'stock_code', 'serial_number_code'}
-    for row_idx in range(row_offset, row_offset + sticker_rows):
-        for col_idx in range(col_offset, col_offset + sticker_cols):
-            cell = ws.cell(row_idx, col_idx)
-            if isinstance(cell, MergedCell):
-                continue
-            if cell.value and isinstance(cell.value, str):
-                original_value = cell.value
-                for var_name, var_value in variables_dict.items():
-                    if var_name in image_placeholders:
-                        continue
-                    pattern = r'\{\{\s*' + re.escape(var_name) + r'\s*\}\}'
-                    if re.search(pattern, cell.value, re.IGNORECASE):
-                        cell.value = re.sub(pattern, str(var_value), cell.value, flags=re.IGNORECASE)
-                if cell.value != original_value:
-                    print(f"    ✅ Заменена переменная в ячейке {get_column_letter(col_idx)}{row_idx}: {original_value} -> {cell.value[:50]}")
+    for row_idx, col_idx in _region_cells(row_offset, col_offset, sticker_rows, sticker_cols, cells):
+        cell = ws.cell(row_idx, col_idx)
+        if isinstance(cell, MergedCell):
+            continue
+        if cell.value and isinstance(cell.value, str):
+            original_value = cell.value
+            for var_name, var_value in variables_dict.items():
+                if var_name in image_placeholders:
+                    continue
+                pattern = _placeholder_pattern(var_name)
+                if pattern.search(cell.value):
+                    cell.value = pattern.sub(str(var_value), cell.value)
+            if cell.value != original_value:
+                print(f"    ✅ Заменена переменная в ячейке {get_column_letter(col_idx)}{row_idx}: {original_value} -> {cell.value[:50]}")
 
 
 def generate_stickers_excel(passports, template_path=None):
@@ -341,7 +528,8 @@ def generate_stickers_excel(passports, template_path=None):
     
     АЛГОРИТМ:
     1. Загружаем Excel шаблон
-    2. Для каждой наклейки ПОЛНОСТЬЮ копируем шаблон (все ячейки, стили, границы, объединения)
+    2. Для каждой наклейки переносим модель шаблона (значения, стили, границы, объединения)
+       со смещением; шаблон разбирается один раз (compile_sticker_template)
     3. Заменяем только текстовые значения (переменные) данными из паспорта
     4. Добавляем/заменяем только логотип и штрихкоды
     5. Размещаем 4 наклейки на странице (2x2) БЕЗ отступов
@@ -360,11 +548,10 @@ def generate_stickers_excel(passports, template_path=None):
         raise ValueError(f"Excel шаблон не найден: {template_path}")
     
     try:
-        # Загружаем Excel шаблон
-        template_wb = load_workbook(template_path)
-        template_ws = template_wb.active
+        # Модель Excel шаблона (разбирается один раз на версию шаблона)
+        template_model = compile_sticker_template(template_path)
         print(f"    ✅ Используется Excel шаблон: {template_path}")
-        print(f"    📏 Размеры шаблона: {template_ws.max_row} строк × {template_ws.max_column} колонок")
+        print(f"    📏 Размеры шаблона: {template_model.rows} строк × {template_model.cols} колонок")
     except Exception as e:
         print(f"    ❌ Не удалось загрузить Excel шаблон: {e}")
         import traceback
@@ -393,8 +580,8 @@ def generate_stickers_excel(passports, template_path=None):
         print(f"    ✅ Логотип найден: {logo_path}")
     
     # Размеры наклейки из шаблона
-    STICKER_ROWS = template_ws.max_row
-    STICKER_COLS = template_ws.max_column
+    STICKER_ROWS = template_model.rows
+    STICKER_COLS = template_model.cols
     
     print(f"    📐 Размеры одной наклейки (из шаблона): {STICKER_ROWS} строк × {STICKER_COLS} колонок")
     
@@ -403,8 +590,9 @@ def generate_stickers_excel(passports, template_path=None):
     ws = wb.active
     ws.title = "Наклейки"
     
-    # Список временных файлов для удаления после сохранения
-    temp_files_to_cleanup = []
+    # Изображения книги: логотип и штрихкод артикула хранятся в архиве один раз,
+    # каждая наклейка ссылается на общий файл xl/media
+    media = XlsxMedia()
     
     # Сетка наклеек: 2 по горизонтали × 4 по вертикали на лист (8 штук),
     # далее следующая "страница" такой же сеткой ниже.
@@ -422,13 +610,18 @@ def generate_stickers_excel(passports, template_path=None):
     # чтобы 4 ряда по высоте гарантированно помещались на A4.
     TARGET_HEIGHT_MM = 72.0
     target_height_px = TARGET_HEIGHT_MM * PX_PER_MM
-    current_height_px = sum(_row_height_px(template_ws, r) for r in range(1, STICKER_ROWS + 1))
+    template_heights = dict(template_model.row_heights)
+    current_height_px = sum(float(template_heights.get(r, 15)) * (96.0 / 72.0) for r in range(STICKER_ROWS))
     if current_height_px > 0:
         row_height_scale = float(target_height_px) / float(current_height_px)
     else:
         row_height_scale = 1.0
     
     print(f"    📐 Текущая высота наклейки ~{current_height_px:.1f} px, целевая ~{target_height_px:.1f} px, scale={row_height_scale:.3f}")
+    stamper = StickerStamper(template_model, ws, row_height_scale=row_height_scale)
+    # Плейсхолдеры ищутся только в ячейках, где они есть в шаблоне
+    placeholder_cells = template_model.placeholder_cells()
+    stock_code_cells = template_model.placeholder_cells('stock_code')
     
     # Счётчик реально сгенерированных наклеек (нужен для аккуратного смещения и разрывов страниц)
     stickers_generated = 0
@@ -447,7 +640,7 @@ def generate_stickers_excel(passports, template_path=None):
         
         print(f"    📍 Наклейка {stickers_generated + 1}: row_offset={row_offset}, col_offset={col_offset} (row_block={row_block}, col_block={col_block})")
         
-        copy_template_to_target(template_ws, ws, row_offset, col_offset, row_height_scale=row_height_scale)
+        stamper.stamp(row_offset, col_offset)
         # Фиксированная ширина колонок A, B, C в пикселях → единицы Excel
         for c in range(min(len(COL_WIDTHS_PX), STICKER_COLS)):
             _col_letter = get_column_letter(col_offset + c)
@@ -508,7 +701,8 @@ def generate_stickers_excel(passports, template_path=None):
         }
         
         # Заменяем все переменные в формате {{ variable }}
-        replace_all_variables(ws, row_offset, col_offset, STICKER_ROWS, STICKER_COLS, variables)
+        replace_all_variables(ws, row_offset, col_offset, STICKER_ROWS, STICKER_COLS, variables,
+                              cells=placeholder_cells)
         
         # Также заменяем по тексту (для обратной совместимости)
         # Название номенклатуры
@@ -662,28 +856,10 @@ def generate_stickers_excel(passports, template_path=None):
         # Вставляем логотип ТОЛЬКО ОДИН РАЗ в объединенную ячейку A (первая колонка)
         if logo_path and os.path.exists(logo_path):
             try:
-                from PIL import Image
-                import shutil
-                
-                # Поворачиваем логотип на 90° по часовой (как на шаблоне — текст снизу вверх)
-                img = Image.open(logo_path)
-                rotated_img = img.rotate(-90, expand=True)
-                
-                # Сохраняем во временный файл
-                temp_logo_dir = '/tmp/agb_stickers'
-                os.makedirs(temp_logo_dir, exist_ok=True)
-                temp_logo_filename = f'logo_{passport.id}_{sticker_idx}.png'
-                temp_logo_path_name = os.path.join(temp_logo_dir, temp_logo_filename)
-                
-                rotated_img.save(temp_logo_path_name, 'PNG')
-                
-                if not os.path.exists(temp_logo_path_name):
-                    raise FileNotFoundError(f"Не удалось создать временный файл логотипа: {temp_logo_path_name}")
-                
-                temp_files_to_cleanup.append(temp_logo_path_name)
-                
+                # Поворачиваем логотип на 90° по часовой (как на шаблоне — текст снизу вверх);
+                # поворот выполняется один раз на файл логотипа, без временных файлов
                 # Логотип: размер 1.07 см x 3.61 см, посередине ячейки
-                logo_img = OpenpyxlImage(temp_logo_path_name)
+                logo_img = media.image(rotated_logo(logo_path))
                 # Делаем логотип немного крупнее базового, но так, чтобы он не выходил за границы ячейки
                 LOGO_SCALE = 1.5  # раньше было 2.0 — уменьшили
                 logo_img.width = int(LOGO_WIDTH_CM * CM_TO_PX * LOGO_SCALE)
@@ -701,22 +877,11 @@ def generate_stickers_excel(passports, template_path=None):
         # Генерируем и вставляем штрихкоды ТОЛЬКО ОДИН РАЗ
         # Штрихкод артикула
         try:
-            stock_code_barcode_temp = generate_barcode_image(stock_code, width_mm=40, height_mm=10)
-            if stock_code_barcode_temp and os.path.exists(stock_code_barcode_temp):
-                temp_barcode_dir = '/tmp/agb_stickers'
-                os.makedirs(temp_barcode_dir, exist_ok=True)
-                stock_code_barcode_path = os.path.join(temp_barcode_dir, f'barcode_stock_{passport.id}_{sticker_idx}.png')
-                import shutil
-                shutil.copy2(stock_code_barcode_temp, stock_code_barcode_path)
-                temp_files_to_cleanup.append(stock_code_barcode_path)
-                
-                try:
-                    os.unlink(stock_code_barcode_temp)
-                except:
-                    pass
-                
+            stock_code_barcode = barcode_png(stock_code, 40, 10)
+            if stock_code_barcode:
                 # Штрихкод номенклатуры (артикул) — посередине: плейсхолдер {{ stock_code }} или 1-я строка, колонка B (середина)
-                barcode_row, barcode_col = _find_cell_with_placeholder(ws, row_offset, col_offset, STICKER_ROWS, STICKER_COLS, 'stock_code')
+                barcode_row, barcode_col = _find_cell_with_placeholder(ws, row_offset, col_offset, STICKER_ROWS, STICKER_COLS, 'stock_code',
+                                                                       cells=stock_code_cells)
                 if barcode_row is None:
                     # По умолчанию: 1-я строка, средняя колонка (B при A,B,C)
                     barcode_row = row_offset
@@ -728,7 +893,7 @@ def generate_stickers_excel(passports, template_path=None):
                     _cell.value = re.sub(r'\{\{\s*stock_code\s*\}\}', '', str(_cell.value), flags=re.IGNORECASE).strip() or None
                 if not isinstance(_cell, MergedCell):
                     _cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=getattr(_cell.alignment, 'wrap_text', False) if _cell.alignment else False)
-                barcode_img = OpenpyxlImage(stock_code_barcode_path)
+                barcode_img = media.image(stock_code_barcode)
                 # Штрихкод артикула делаем чуть меньше, чтобы уверенно помещался в ячейку,
                 # и оставляем строго по центру ячейки без дополнительного смещения.
                 barcode_img.height = 32
@@ -742,20 +907,8 @@ def generate_stickers_excel(passports, template_path=None):
         
         # Штрихкод серийного номера
         try:
-            serial_number_barcode_temp = generate_barcode_image(serial_number, width_mm=40, height_mm=10)
-            if serial_number_barcode_temp and os.path.exists(serial_number_barcode_temp):
-                temp_barcode_dir = '/tmp/agb_stickers'
-                os.makedirs(temp_barcode_dir, exist_ok=True)
-                serial_number_barcode_path = os.path.join(temp_barcode_dir, f'barcode_serial_{passport.id}_{sticker_idx}.png')
-                import shutil
-                shutil.copy2(serial_number_barcode_temp, serial_number_barcode_path)
-                temp_files_to_cleanup.append(serial_number_barcode_path)
-                
-                try:
-                    os.unlink(serial_number_barcode_temp)
-                except:
-                    pass
-                
+            serial_number_barcode = barcode_png(serial_number, 40, 10)
+            if serial_number_barcode:
                 # 1. Находим строку с текстом "Серийный номер" в пределах этой наклейки
                 label_row = None
                 for r in range(row_offset, row_offset + STICKER_ROWS):
@@ -780,7 +933,7 @@ def generate_stickers_excel(passports, template_path=None):
                     _cell.value = re.sub(r'\{\{\s*serial_number_code\s*\}\}', '', str(_cell.value), flags=re.IGNORECASE).strip() or None
                 # Выравнивание ячейки не трогаем — текст «Серийный номер: XXX» уже по верху (row_7),
                 # штрихкод будет добавлен по центру ячейки (как у первой наклейки)
-                barcode_img = OpenpyxlImage(serial_number_barcode_path)
+                barcode_img = media.image(serial_number_barcode)
                 # Штрихкод серийного номера также немного уменьшаем
                 barcode_img.height = 32
                 barcode_img.width = 160
@@ -806,20 +959,12 @@ def generate_stickers_excel(passports, template_path=None):
 
     # Сохраняем в память
     buffer = io.BytesIO()
-    try:
-        wb.save(buffer)
-        buffer.seek(0)
-        excel_content = buffer.getvalue()
-    finally:
-        # Удаляем временные файлы ПОСЛЕ сохранения
-        for temp_file in temp_files_to_cleanup:
-            try:
-                if os.path.exists(temp_file):
-                    os.unlink(temp_file)
-            except Exception as cleanup_err:
-                print(f"    ⚠️ Не удалось удалить временный файл {temp_file}: {cleanup_err}")
+    save_workbook(wb, buffer)
+    excel_content = buffer.getvalue()
+    media.registry.report("    ")
     
     print(f"✅ Excel файл с наклейками успешно сгенерирован, размер: {len(excel_content)} байт")
+    report_barcode_cache()
     sys.stdout.flush()
     
     return excel_content
@@ -7,7 +7,6 @@
 """
 import os
 import io
-import tempfile
 import sys
 from typing import List, Optional
 
@@ -24,6 +23,7 @@ from docx.shared import Mm, Pt, RGBColor
 from docx.oxml import OxmlElement, parse_xml
 from docx.oxml.ns import qn
 from backend.utils.template_manager import get_template_manager
+from backend.utils.barcode_generator import report_barcode_cache
 import xml.etree.ElementTree as ET
 from io import BytesIO
 import shutil
@@ -43,6 +43,10 @@ try:
 except:
     DocxMm = Mm
 
+# Способ сборки DOCX наклеек:
+# python-docx - объектами python-docx/docxtpl, ooxml - прямая сборка XML (backend/utils/sticker_docx_writer.py)
+STICKER_DOCX_RENDERER = os.getenv("STICKER_DOCX_RENDERER", "python-docx")
+
 
 def get_template_path():
     """Получает путь к шаблону наклеек через TemplateManager"""
@@ -56,7 +60,7 @@ def get_template_path():
     return None
 
 
-def generate_stickers_from_template(passports, template_path=None):
+def generate_stickers_from_template(passports, template_path=None, progress=None):
     """
     Генерирует DOCX с наклейками из шаблона (Excel или DOCX)
     
@@ -64,6 +68,8 @@ def generate_stickers_from_template(passports, template_path=None):
     1. Берем шаблон из templates/sticker_template.docx или .xlsx
     2. Для каждой наклейки заполняем шаблон данными + генерируем штрихкоды
     3. Формируем таблицу 2x2 (2 колонки, 2 строки = 4 наклейки на странице A4)
+    
+    progress - необязательный колбэк progress(страниц_готово, страниц_всего)
     """
     print(f"🏷️ Начинаем генерацию DOCX наклеек из шаблона для {len(passports)} паспортов")
     sys.stdout.flush()
@@ -75,17 +81,17 @@ def generate_stickers_from_template(passports, template_path=None):
     if not template_path or not os.path.exists(template_path):
         print(f"⚠️ Шаблон не найден, используем стандартный метод")
         sys.stdout.flush()
-        return generate_stickers_standard(passports)
+        return generate_stickers_standard(passports, progress)
     
     # Проверяем расширение файла
     if template_path.endswith('.xlsx'):
         if not OPENPYXL_AVAILABLE:
             print(f"⚠️ openpyxl не установлен, используем стандартный метод")
             sys.stdout.flush()
-            return generate_stickers_standard(passports)
+            return generate_stickers_standard(passports, progress)
         
         try:
-            result = generate_from_excel_template(passports, template_path)
+            result = generate_from_excel_template(passports, template_path, progress)
             
             # Проверяем, что результат - это валидный DOCX (ZIP)
             import zipfile
@@ -95,6 +101,7 @@ def generate_stickers_from_template(passports, template_path=None):
                     if 'word/document.xml' not in zip_check.namelist():
                         raise ValueError("Результат не является валидным DOCX")
                 print(f"✅ DOCX успешно сгенерирован из Excel шаблона, размер: {len(result)} байт")
+                report_barcode_cache()
                 sys.stdout.flush()
                 return result
             except (zipfile.BadZipFile, ValueError) as zip_err:
@@ -108,17 +115,17 @@ def generate_stickers_from_template(passports, template_path=None):
             sys.stdout.flush()
             print("🔄 Переключаемся на стандартный метод генерации DOCX...")
             sys.stdout.flush()
-            return generate_stickers_standard(passports)
+            return generate_stickers_standard(passports, progress)
     
     # Fallback для DOCX шаблонов (старая логика)
     elif template_path.endswith('.docx'):
         if not DOCXTPL_AVAILABLE:
             print(f"⚠️ docxtpl не установлен, используем стандартный метод")
             sys.stdout.flush()
-            return generate_stickers_standard(passports)
+            return generate_stickers_standard(passports, progress)
         
         try:
-            result = generate_from_template_file(passports, template_path)
+            result = generate_from_template_file(passports, template_path, progress)
             
             # Проверяем, что результат - это валидный DOCX (ZIP)
             import zipfile
@@ -128,6 +135,7 @@ def generate_stickers_from_template(passports, template_path=None):
                     if 'word/document.xml' not in zip_check.namelist():
                         raise ValueError("Результат не является валидным DOCX")
                 print(f"✅ DOCX успешно сгенерирован, размер: {len(result)} байт")
+                report_barcode_cache()
                 sys.stdout.flush()
                 return result
             except (zipfile.BadZipFile, ValueError) as zip_err:
@@ -141,14 +149,14 @@ def generate_stickers_from_template(passports, template_path=None):
             sys.stdout.flush()
             print("🔄 Переключаемся на стандартный метод генерации DOCX...")
             sys.stdout.flush()
-            return generate_stickers_standard(passports)
+            return generate_stickers_standard(passports, progress)
     else:
         print(f"⚠️ Неподдерживаемый формат шаблона: {template_path}")
         sys.stdout.flush()
-        return generate_stickers_standard(passports)
+        return generate_stickers_standard(passports, progress)
 
 
-def generate_from_excel_template(passports, template_path):
+def generate_from_excel_template(passports, template_path, progress=None):
     """
     Генерирует DOCX наклейки из Excel шаблона
     
@@ -189,6 +197,10 @@ def generate_from_excel_template(passports, template_path):
     else:
         print(f"    ✅ Логотип найден: {logo_path}")
     
+    if STICKER_DOCX_RENDERER == "ooxml":
+        from backend.utils.sticker_docx_writer import generate_stickers_docx_excel_layout
+        return generate_stickers_docx_excel_layout(passports, logo_path, progress=progress)
+    
     # Создаем новый DOCX документ
     doc = Document()
     
@@ -312,10 +324,10 @@ def generate_from_excel_template(passports, template_path):
                     
                     # Генерируем штрихкоды
                     stock_code = nomenclature.article or getattr(nomenclature, 'code_1c', None) or '3501040'
-                    stock_code_barcode_path = generate_barcode_image(stock_code, width_mm=40, height_mm=10)
+                    stock_code_barcode = generate_barcode_image(stock_code, width_mm=40, height_mm=10)
                     
                     serial_number = passport.passport_number or 'AGB0000125'
-                    serial_number_barcode_path = generate_barcode_image(serial_number, width_mm=40, height_mm=10)
+                    serial_number_barcode = generate_barcode_image(serial_number, width_mm=40, height_mm=10)
                     
                     # СОЗДАЕМ ТАБЛИЦУ ВНУТРИ ЯЧЕЙКИ С ГРАНИЦАМИ, КАК В EXCEL ШАБЛОНЕ
                     # Очищаем ячейку полностью - удаляем все содержимое
@@ -411,8 +423,8 @@ def generate_from_excel_template(passports, template_path):
                     # Колонка A (индекс 0) - для логотипа
                     try:
                         logo_cell = inner_table.rows[0].cells[0]  # A1
-                        for row_idx in range(1, 10):
-                            logo_cell.merge(inner_table.rows[row_idx].cells[0])  # Объединяем A1-A10
+                        for merge_row_idx in range(1, 10):
+                            logo_cell.merge(inner_table.rows[merge_row_idx].cells[0])  # Объединяем A1-A10
                         print(f"    ✅ Ячейки A1-A10 (колонка 0) объединены для логотипа")
                     except Exception as merge_err:
                         print(f"    ⚠️ Ошибка объединения ячеек для логотипа: {merge_err}")
@@ -426,20 +438,9 @@ def generate_from_excel_template(passports, template_path):
                     p_logo.alignment = 1  # CENTER (по вертикали будет по центру)
                     if logo_path and os.path.exists(logo_path):
                         try:
-                            # Поворачиваем изображение перед добавлением через PIL
-                            from PIL import Image
-                            
-                            # Открываем изображение
-                            img = Image.open(logo_path)
-                            
-                            # Поворачиваем на 90 градусов против часовой стрелки (или -90)
-                            # Для вертикального логотипа поворачиваем на -90 градусов
-                            rotated_img = img.rotate(-90, expand=True)
-                            
-                            # Сохраняем во временный файл
-                            temp_logo_path = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-                            rotated_img.save(temp_logo_path.name)
-                            temp_logo_path.close()
+                            # Логотип поворачивается один раз на файл (media_registry.rotated_logo);
+                            # одинаковые изображения python-docx хранит в пакете один раз
+                            from backend.utils.media_registry import rotated_logo
                             
                             # Высота наклейки = 148.5 мм, с учетом отступов (по 3.75 мм сверху и снизу) = 141 мм
                             # Ширина логотипа = примерно 12-15 мм
@@ -448,13 +449,7 @@ def generate_from_excel_template(passports, template_path):
                             
                             logo_run = p_logo.add_run()
                             # Добавляем повернутое изображение
-                            logo_run.add_picture(temp_logo_path.name, width=logo_width, height=logo_height)
-                            
-                            # Удаляем временный файл
-                            try:
-                                os.unlink(temp_logo_path.name)
-                            except:
-                                pass
+                            logo_run.add_picture(io.BytesIO(rotated_logo(logo_path)), width=logo_width, height=logo_height)
                             
                             print(f"    ✅ Логотип добавлен вертикально (повернут на 90°) в левую колонку: {logo_path}")
                         except Exception as e:
@@ -530,11 +525,11 @@ def generate_from_excel_template(passports, template_path):
                     run_c3_value = p_c3.add_run(stock_code)
                     set_exo2_font(run_c3_value)
                     # Добавляем штрихкод артикула
-                    if stock_code_barcode_path and os.path.exists(stock_code_barcode_path):
+                    if stock_code_barcode:
                         try:
                             p_c3.add_run('\n')
                             barcode_run = p_c3.add_run()
-                            barcode_run.add_picture(stock_code_barcode_path, width=Mm(40), height=Mm(10))
+                            barcode_run.add_picture(stock_code_barcode, width=Mm(40), height=Mm(10))
                             print(f"    ✅ Штрихкод артикула добавлен: {stock_code}")
                         except Exception as e:
                             print(f"    ⚠️ Ошибка добавления штрихкода артикула: {e}")
@@ -590,11 +585,11 @@ def generate_from_excel_template(passports, template_path):
                     set_exo2_font(run_b7_label)
                     run_b7_value = p_b7.add_run(serial_number)
                     set_exo2_font(run_b7_value)
-                    if serial_number_barcode_path and os.path.exists(serial_number_barcode_path):
+                    if serial_number_barcode:
                         try:
                             p_b7.add_run('\n')
                             barcode_run = p_b7.add_run()
-                            barcode_run.add_picture(serial_number_barcode_path, width=Mm(40), height=Mm(10))
+                            barcode_run.add_picture(serial_number_barcode, width=Mm(40), height=Mm(10))
                         except Exception as e:
                             print(f"    ⚠️ Ошибка добавления штрихкода serial_number: {e}")
                     
@@ -632,15 +627,9 @@ def generate_from_excel_template(passports, template_path):
                     set_exo2_font(run_b9_site)
                     
                     # СТРОКА 10: Пустая (как в Excel шаблоне)
-                    
-                    # Удаляем временные файлы штрихкодов
-                    try:
-                        if stock_code_barcode_path and os.path.exists(stock_code_barcode_path):
-                            os.unlink(stock_code_barcode_path)
-                        if serial_number_barcode_path and os.path.exists(serial_number_barcode_path):
-                            os.unlink(serial_number_barcode_path)
-                    except:
-                        pass
+        
+        if progress:
+            progress(page_idx // 4 + 1, (len(passports) + 3) // 4)
         
         # Добавляем разрыв страницы (кроме последней)
         if page_idx + 4 < len(passports):
@@ -658,7 +647,7 @@ def generate_from_excel_template(passports, template_path):
     return docx_content
 
 
-def generate_from_template_file(passports, template_path):
+def generate_from_template_file(passports, template_path, progress=None):
     """
     ПРОСТОЙ И ПРАВИЛЬНЫЙ АЛГОРИТМ:
     1. Берем шаблон из backend/utils/templates/sticker_template.docx
@@ -674,7 +663,7 @@ def generate_from_template_file(passports, template_path):
     
     if not DOCXTPL_AVAILABLE:
         print(f"⚠️ docxtpl не установлен, используем стандартный метод")
-        return generate_stickers_standard(passports)
+        return generate_stickers_standard(passports, progress)
     
     # Загружаем шаблон для определения размеров
     template_doc = Document(template_path)
@@ -713,6 +702,18 @@ def generate_from_template_file(passports, template_path):
     else:
         print(f"    ✅ Логотип найден: {logo_path}")
     
+    # Шаблон читается и исправляется один раз на выгрузку
+    compiled_template = compile_docx_template(template_path)
+    
+    if STICKER_DOCX_RENDERER == "ooxml":
+        from backend.utils.sticker_docx_writer import generate_stickers_docx_from_template
+        docx_content = generate_stickers_docx_from_template(
+            passports, compiled_template, logo_path, progress=progress
+        )
+        if docx_content is not None:
+            return docx_content
+        print(f"⚠️ Шаблон содержит управляющие теги или не содержит таблицы, используем docxtpl")
+    
     # Создаем новый документ
     doc = Document()
     
@@ -851,7 +852,7 @@ def generate_from_template_file(passports, template_path):
                     try:
                         # ПРОСТОЙ АЛГОРИТМ: рендерим шаблон и копируем содержимое
                         success = render_template_to_cell(
-                            template_path,
+                            compiled_template,
                             cell,
                             doc,
                             passport,
@@ -868,6 +869,9 @@ def generate_from_template_file(passports, template_path):
                         import traceback
                         traceback.print_exc()
         
+        if progress:
+            progress(page_idx // 4 + 1, (len(passports) + 3) // 4)
+        
         # Добавляем разрыв страницы (кроме последней)
         if page_idx + 4 < len(passports):
             doc.add_page_break()
@@ -884,81 +888,111 @@ def generate_from_template_file(passports, template_path):
     return docx_content
 
 
-def render_template_to_cell(template_path, target_cell, target_doc, passport, nomenclature, production_date, logo_path):
+# SHA-256 шаблона -> DOCX с исправленными плейсхолдерами
+_compiled_templates = {}
+COMPILED_TEMPLATES_LIMIT = 4
+
+
+def _replace_document_xml(zip_file, xml_str):
+    """Содержимое DOCX из zip_file с замененным word/document.xml"""
+    import zipfile
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as new_zip:
+        for item in zip_file.infolist():
+            if item.filename == 'word/document.xml':
+                new_zip.writestr(item, xml_str)
+            else:
+                new_zip.writestr(item, zip_file.read(item.filename))
+    return buffer.getvalue()
+
+
+def _fix_template_xml(xml_str):
+    """Исправление плейсхолдеров в word/document.xml для docxtpl"""
+    import re
+    # АГРЕССИВНОЕ исправление: удаляем ВСЕ проблемные конструкции
+    fixed_xml = xml_str
+    
+    # 1. Удаляем .size из любых мест (включая внутри плейсхолдеров)
+    fixed_xml = re.sub(r'\.size', '', fixed_xml)
+    
+    # 2. Удаляем проблемные фильтры Jinja2
+    fixed_xml = re.sub(r'\|\s*\w+\([^)]*\)', '', fixed_xml)
+    fixed_xml = re.sub(r'\|\s*\w+', '', fixed_xml)
+    
+    # 3. Исправляем разорванные плейсхолдеры - объединяем содержимое между {{ и }}
+    # Просто удаляем XML-теги внутри плейсхолдеров, сохраняя текст
+    for _ in range(3):  # Повторяем несколько раз для вложенных тегов
+        # Ищем {{...<w:t>текст</w:t>...}} и заменяем на {{...текст...}}
+        fixed_xml = re.sub(r'(\{\{[^<]*?)(<w:t[^>]*>)([^<]*?)(</w:t>)([^}]*?\}\})', r'\1\3\5', fixed_xml)
+        fixed_xml = re.sub(r'(\{\{[^<]*?)(<w:rPr[^>]*>)([^<]*?)(</w:rPr>)([^}]*?\}\})', r'\1\5', fixed_xml)
+    return fixed_xml
+
+
+def compile_docx_template(template_path):
+    """DOCX-шаблон наклейки с исправленными плейсхолдерами (байты)
+
+    Исправление и перепаковка шаблона выполняются один раз для каждой версии
+    шаблона (ключ - SHA-256 содержимого), наклейки создают DocxTemplate из
+    готовых байтов в памяти.
+    """
+    import hashlib
+    import zipfile
+    with open(template_path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    compiled = _compiled_templates.get(digest)
+    if compiled is not None:
+        return compiled
+    
+    compiled = content
+    try:
+        with zipfile.ZipFile(BytesIO(content), 'r') as zip_file:
+            xml_str = zip_file.read('word/document.xml').decode('utf-8')
+            fixed_xml = _fix_template_xml(xml_str)
+            if fixed_xml != xml_str:
+                compiled = _replace_document_xml(zip_file, fixed_xml)
+                print(f"    ✅ Шаблон исправлен (удалены проблемные конструкции)")
+    except Exception as fix_err:
+        print(f"    ⚠️ Ошибка исправления шаблона: {fix_err}")
+        import traceback
+        traceback.print_exc()
+    
+    if len(_compiled_templates) >= COMPILED_TEMPLATES_LIMIT:
+        _compiled_templates.clear()
+    _compiled_templates[digest] = compiled
+    print(f"✅ Шаблон наклейки скомпилирован: {template_path} ({digest[:12]})")
+    return compiled
+
+
+def render_template_to_cell(compiled_template, target_cell, target_doc, passport, nomenclature, production_date, logo_path):
     """
     ПРОСТОЙ И ПРАВИЛЬНЫЙ АЛГОРИТМ:
-    1. Берем шаблон из backend/utils/templates/sticker_template.docx
+    1. Берем шаблон, исправленный compile_docx_template (байты DOCX)
     2. Генерируем штрихкоды для артикула и серийного номера
     3. Заполняем шаблон через docxtpl
     4. Копируем ВСЁ содержимое ячейки из рендеренного шаблона в целевую ячейку
     """
     try:
         from backend.utils.barcode_generator import generate_barcode_image
-        import tempfile
-        import shutil
         import zipfile
-        import re
         
         print(f"    🔄 Рендерим шаблон для {passport.passport_number}...")
         
-        # 1. Создаем копию шаблона
-        with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as tmp_file:
-            temp_template_path = tmp_file.name
-            shutil.copy(template_path, temp_template_path)
-        
-        # 2. КРИТИЧНО: Исправляем проблемные плейсхолдеры ДО первого рендеринга
-        # Это должно быть сделано ДО создания DocxTemplate
-        try:
-            with zipfile.ZipFile(temp_template_path, 'r') as zip_file:
-                doc_xml = zip_file.read('word/document.xml')
-                xml_str = doc_xml.decode('utf-8')
-                
-                # АГРЕССИВНОЕ исправление: удаляем ВСЕ проблемные конструкции
-                fixed_xml = xml_str
-                
-                # 1. Удаляем .size из любых мест (включая внутри плейсхолдеров)
-                fixed_xml = re.sub(r'\.size', '', fixed_xml)
-                
-                # 2. Удаляем проблемные фильтры Jinja2
-                fixed_xml = re.sub(r'\|\s*\w+\([^)]*\)', '', fixed_xml)
-                fixed_xml = re.sub(r'\|\s*\w+', '', fixed_xml)
-                
-                # 3. Исправляем разорванные плейсхолдеры - объединяем содержимое между {{ и }}
-                # Ищем паттерны вида {{...<w:t>текст</w:t>...}} и заменяем на {{...текст...}}
-                # Но делаем это аккуратно, не ломая XML структуру
-                # Просто удаляем XML-теги внутри плейсхолдеров, сохраняя текст
-                for _ in range(3):  # Повторяем несколько раз для вложенных тегов
-                    # Ищем {{...<w:t>текст</w:t>...}} и заменяем на {{...текст...}}
-                    fixed_xml = re.sub(r'(\{\{[^<]*?)(<w:t[^>]*>)([^<]*?)(</w:t>)([^}]*?\}\})', r'\1\3\5', fixed_xml)
-                    fixed_xml = re.sub(r'(\{\{[^<]*?)(<w:rPr[^>]*>)([^<]*?)(</w:rPr>)([^}]*?\}\})', r'\1\5', fixed_xml)
-                
-                if fixed_xml != xml_str:
-                    fixed_zip_path = temp_template_path + '.fixed'
-                    with zipfile.ZipFile(fixed_zip_path, 'w', zipfile.ZIP_DEFLATED) as new_zip:
-                        for item in zip_file.infolist():
-                            if item.filename == 'word/document.xml':
-                                new_zip.writestr(item, fixed_xml)
-                            else:
-                                new_zip.writestr(item, zip_file.read(item.filename))
-                    
-                    shutil.move(fixed_zip_path, temp_template_path)
-                    print(f"    ✅ Шаблон исправлен (удалены проблемные конструкции)")
-        except Exception as fix_err:
-            print(f"    ⚠️ Ошибка исправления шаблона: {fix_err}")
-            import traceback
-            traceback.print_exc()
+        # 1-2. Копия шаблона и исправление плейсхолдеров выполняются один раз
+        # на выгрузку (compile_docx_template в generate_from_template_file)
         
         # 3. Генерируем штрихкоды
         stock_code = nomenclature.article or getattr(nomenclature, 'code_1c', None) or '3501040'
-        stock_code_barcode_path = generate_barcode_image(stock_code, width_mm=40, height_mm=10)
+        stock_code_barcode = generate_barcode_image(stock_code, width_mm=40, height_mm=10)
         
         serial_number = passport.passport_number or 'AGB0000125'
-        serial_number_barcode_path = generate_barcode_image(serial_number, width_mm=40, height_mm=10)
+        serial_number_barcode = generate_barcode_image(serial_number, width_mm=40, height_mm=10)
         
         print(f"    📷 Штрихкоды сгенерированы: {stock_code}, {serial_number}")
         
-        # 4. Загружаем шаблон ПОСЛЕ исправления
-        template = DocxTemplate(temp_template_path)
+        # 4. Загружаем исправленный шаблон из памяти: docxtpl рендерит документ
+        # на месте, поэтому каждой наклейке нужен свой DocxTemplate
+        template = DocxTemplate(BytesIO(compiled_template))
         
         # Получаем данные из номенклатуры и паспорта
         # Формируем дату изготовления (печатная, не пустое поле)
@@ -1048,9 +1082,9 @@ def render_template_to_cell(template_path, target_cell, target_doc, passport, no
             print(f"    ⚠️ Логотип не найден: {logo_path}")
             context['logo'] = None
         
-        if stock_code_barcode_path and os.path.exists(stock_code_barcode_path):
+        if stock_code_barcode:
             try:
-                context['stock_code'] = InlineImage(template, stock_code_barcode_path, width=DocxMm(40), height=DocxMm(10))
+                context['stock_code'] = InlineImage(template, stock_code_barcode, width=DocxMm(40), height=DocxMm(10))
                 print(f"    ✅ Штрихкод stock_code добавлен в контекст: {stock_code}")
             except Exception as e:
                 print(f"    ⚠️ Ошибка добавления штрихкода stock_code: {e}")
@@ -1061,9 +1095,9 @@ def render_template_to_cell(template_path, target_cell, target_doc, passport, no
             print(f"    ⚠️ Штрихкод stock_code не сгенерирован, используем текст: {stock_code}")
             context['stock_code'] = stock_code
         
-        if serial_number_barcode_path and os.path.exists(serial_number_barcode_path):
+        if serial_number_barcode:
             try:
-                context['serial_number_code'] = InlineImage(template, serial_number_barcode_path, width=DocxMm(40), height=DocxMm(10))
+                context['serial_number_code'] = InlineImage(template, serial_number_barcode, width=DocxMm(40), height=DocxMm(10))
                 print(f"    ✅ Штрихкод serial_number_code добавлен в контекст: {serial_number}")
             except Exception as e:
                 print(f"    ⚠️ Ошибка добавления штрихкода serial_number_code: {e}")
@@ -1086,57 +1120,14 @@ def render_template_to_cell(template_path, target_cell, target_doc, passport, no
             import traceback
             traceback.print_exc()
             
-            # Пробуем еще раз с более агрессивным исправлением
-            try:
-                print(f"    🔄 Пробуем более агрессивное исправление шаблона...")
-                with zipfile.ZipFile(temp_template_path, 'r') as zip_file:
-                    doc_xml = zip_file.read('word/document.xml')
-                    xml_str = doc_xml.decode('utf-8')
-                    
-                    # Еще более агрессивное исправление
-                    fixed_xml = xml_str
-                    # Удаляем все .size
-                    fixed_xml = re.sub(r'\.size', '', fixed_xml)
-                    # Удаляем все фильтры
-                    fixed_xml = re.sub(r'\|\s*\w+\([^)]*\)', '', fixed_xml)
-                    fixed_xml = re.sub(r'\|\s*\w+', '', fixed_xml)
-                    
-                    if fixed_xml != xml_str:
-                        fixed_zip_path = temp_template_path + '.fixed2'
-                        with zipfile.ZipFile(fixed_zip_path, 'w', zipfile.ZIP_DEFLATED) as new_zip:
-                            for item in zip_file.infolist():
-                                if item.filename == 'word/document.xml':
-                                    new_zip.writestr(item, fixed_xml)
-                                else:
-                                    new_zip.writestr(item, zip_file.read(item.filename))
-                        shutil.move(fixed_zip_path, temp_template_path)
-                        template = DocxTemplate(temp_template_path)
-                        # Обновляем изображения в контексте
-                        if logo_path and os.path.exists(logo_path):
-                            context['logo'] = InlineImage(template, logo_path, width=DocxMm(18), height=DocxMm(5.4))
-                        if stock_code_barcode_path and os.path.exists(stock_code_barcode_path):
-                            context['stock_code'] = InlineImage(template, stock_code_barcode_path, width=DocxMm(40), height=DocxMm(10))
-                        if serial_number_barcode_path and os.path.exists(serial_number_barcode_path):
-                            context['serial_number_code'] = InlineImage(template, serial_number_barcode_path, width=DocxMm(40), height=DocxMm(10))
-                        
-                        # Пробуем рендерить снова
-                        try:
-                            template.render(context)
-                            print(f"    ✅ Шаблон отрендерен после исправления")
-                            render_success = True
-                        except Exception as render_err2:
-                            print(f"    ⚠️ Повторный рендеринг тоже не удался: {render_err2}")
-                            # Продолжаем с неотрендеренным шаблоном
-            except Exception as retry_err:
-                print(f"    ⚠️ Повторная попытка исправления не удалась: {retry_err}")
-                # Продолжаем с неотрендеренным шаблоном
+            # Шаблон уже исправлен при компиляции, повторное исправление не поможет
         
         if not render_success:
             print(f"    ⚠️ ВНИМАНИЕ: Шаблон не был отрендерен, данные могут быть не заполнены!")
             # Если рендеринг не работает, заполняем данные вручную в XML
             try:
                 print(f"    🔄 Пробуем заполнить данные вручную в XML...")
-                with zipfile.ZipFile(temp_template_path, 'r') as zip_file:
+                with zipfile.ZipFile(BytesIO(compiled_template), 'r') as zip_file:
                     doc_xml = zip_file.read('word/document.xml')
                     xml_str = doc_xml.decode('utf-8')
                     
@@ -1162,26 +1153,19 @@ def render_template_to_cell(template_path, target_cell, target_doc, passport, no
                         xml_str = xml_str.replace(placeholder, str(value))
                     
                     # Сохраняем исправленный XML
-                    fixed_zip_path = temp_template_path + '.manual_fixed'
-                    with zipfile.ZipFile(fixed_zip_path, 'w', zipfile.ZIP_DEFLATED) as new_zip:
-                        for item in zip_file.infolist():
-                            if item.filename == 'word/document.xml':
-                                new_zip.writestr(item, xml_str)
-                            else:
-                                new_zip.writestr(item, zip_file.read(item.filename))
-                    shutil.move(fixed_zip_path, temp_template_path)
-                    template = DocxTemplate(temp_template_path)
+                    template = DocxTemplate(BytesIO(_replace_document_xml(zip_file, xml_str)))
                     print(f"    ✅ Данные заполнены вручную в XML")
             except Exception as manual_err:
                 print(f"    ⚠️ Ошибка ручного заполнения данных: {manual_err}")
         
-        # 7. Сохраняем рендеренный шаблон
-        rendered_path = temp_template_path.replace('.docx', '_rendered.docx')
-        template.save(rendered_path)
+        # 7. Сохраняем рендеренный шаблон в память
+        rendered_buffer = BytesIO()
+        template.save(rendered_buffer)
+        rendered_buffer.seek(0)
         
         # 8. Загружаем рендеренный документ
         try:
-            rendered_doc = Document(rendered_path)
+            rendered_doc = Document(rendered_buffer)
         except Exception as load_err:
             print(f"    ❌ Ошибка загрузки рендеренного документа: {load_err}")
             import traceback
@@ -1257,20 +1241,9 @@ def render_template_to_cell(template_path, target_cell, target_doc, passport, no
                                     image_blob = image_rel.target_part.blob
                                     # Добавляем изображение в целевой документ через правильный API
                                     try:
-                                        # relate_to требует файл, а не BytesIO - создаем временный файл
-                                        with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_img:
-                                            tmp_img.write(image_blob)
-                                            tmp_img_path = tmp_img.name
-                                        
-                                        # Используем relate_to с файлом
-                                        rId = target_part.relate_to(tmp_img_path, 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/image', is_external=False)
-                                        new_embed_id = rId
-                                        
-                                        # Удаляем временный файл
-                                        try:
-                                            os.unlink(tmp_img_path)
-                                        except:
-                                            pass
+                                        # Часть изображения ищется по SHA-1: логотип и штрихкод артикула
+                                        # хранятся в документе один раз для всех наклеек
+                                        new_embed_id, _ = target_part.get_or_add_image(io.BytesIO(image_blob))
                                     except Exception as add_img_err:
                                         print(f"    ⚠️ Ошибка добавления изображения: {add_img_err}")
                                         import traceback
@@ -1301,20 +1274,9 @@ def render_template_to_cell(template_path, target_cell, target_doc, passport, no
                                                 image_blob = rel.target_part.blob
                                                 if len(image_blob) > 100:  # Минимальный размер изображения
                                                     try:
-                                                        # relate_to требует файл, а не BytesIO - создаем временный файл
-                                                        with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_img:
-                                                            tmp_img.write(image_blob)
-                                                            tmp_img_path = tmp_img.name
-                                                        
-                                                        # Используем relate_to с файлом
-                                                        rId = target_part.relate_to(tmp_img_path, 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/image', is_external=False)
-                                                        new_embed_id = rId
-                                                        
-                                                        # Удаляем временный файл
-                                                        try:
-                                                            os.unlink(tmp_img_path)
-                                                        except:
-                                                            pass
+                                                        # Часть изображения ищется по SHA-1: логотип и штрихкод артикула
+                                                        # хранятся в документе один раз для всех наклеек
+                                                        new_embed_id, _ = target_part.get_or_add_image(io.BytesIO(image_blob))
                                                     except Exception as add_img_err:
                                                         print(f"    ⚠️ Ошибка добавления изображения: {add_img_err}")
                                                         continue
@@ -1344,17 +1306,6 @@ def render_template_to_cell(template_path, target_cell, target_doc, passport, no
         
         print(f"    ✅ Содержимое скопировано: {len(source_content)} элементов, {images_copied} изображений")
         
-        # Удаляем временные файлы
-        try:
-            os.unlink(temp_template_path)
-            os.unlink(rendered_path)
-            if stock_code_barcode_path and os.path.exists(stock_code_barcode_path):
-                os.unlink(stock_code_barcode_path)
-            if serial_number_barcode_path and os.path.exists(serial_number_barcode_path):
-                os.unlink(serial_number_barcode_path)
-        except:
-            pass
-        
         return True
         
     except Exception as e:
@@ -1365,11 +1316,15 @@ def render_template_to_cell(template_path, target_cell, target_doc, passport, no
 
 
 # Стандартный метод генерации (fallback)
-def generate_stickers_standard(passports):
+def generate_stickers_standard(passports, progress=None):
     """Стандартный метод генерации наклеек без шаблона"""
     print(f"🔄 Используем стандартный метод генерации для {len(passports)} паспортов")
     sys.stdout.flush()
     
+    if STICKER_DOCX_RENDERER == "ooxml":
+        from backend.utils.sticker_docx_writer import generate_stickers_docx_standard
+        return generate_stickers_docx_standard(passports, progress)
+    
     # Создаем простой документ
     doc = Document()
     section = doc.sections[0]
@@ -1408,6 +1363,9 @@ def generate_stickers_standard(passports):
                         else:
                             cell.text = f"{nom_name}\n{passport.passport_number}"
         
+        if progress:
+            progress(page_idx // 4 + 1, (len(passports) + 3) // 4)
+        
         if page_idx + 4 < len(passports):
             doc.add_page_break()
     
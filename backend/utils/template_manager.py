@@ -2,6 +2,7 @@
 Единый менеджер для работы с шаблонами
 Обеспечивает стабильную работу с шаблонами и их редактирование пользователями
 """
+import hashlib
 import os
 import shutil
 from pathlib import Path
@@ -28,6 +29,8 @@ class TemplateManager:
     def __init__(self):
         """Инициализация менеджера шаблонов"""
         self._ensure_directories()
+        # Хэши файлов: путь -> (mtime_ns, размер, sha256)
+        self._hashes = {}
     
     def _ensure_directories(self):
         """Создает необходимые директории"""
@@ -77,6 +80,29 @@ class TemplateManager:
         
         return None
     
+    def _file_hash(self, path: Optional[Path]) -> Optional[str]:
+        """SHA-256 содержимого файла (пересчитывается только при изменении файла)"""
+        if not path:
+            return None
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        cached = self._hashes.get(str(path))
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        self._hashes[str(path)] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+    
+    def get_template_hash(self, template_type: str) -> Optional[str]:
+        """Хэш текущей версии шаблона или None если шаблона нет"""
+        return self._file_hash(self.get_template_path(template_type))
+    
+    def get_logo_hash(self) -> Optional[str]:
+        """Хэш текущего логотипа или None если логотипа нет"""
+        return self._file_hash(self.get_logo_path())
+    
     def create_logo_if_missing(self) -> Optional[Path]:
         """
         Создает логотип если его нет (используя функцию из pdf_generator)
@@ -133,6 +159,9 @@ class TemplateManager:
         # Сохраняем шаблон
         try:
             template_path.write_bytes(content)
+            # Выгрузки, построенные по старому шаблону, больше не нужны
+            from backend.utils.export_cache import get_export_cache
+            get_export_cache().invalidate()
             return True, f"Шаблон сохранен: {template_path}"
         except Exception as e:
             return False, f"Ошибка сохранения: {str(e)}"
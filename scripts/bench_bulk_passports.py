@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест массового создания паспортов
+
+Параллельно отправляет запросы POST /api/v1/passports/bulk/ от нескольких
+клиентов, измеряет пропускную способность и проверяет, что все выданные
+номера паспортов уникальны.
+
+Пример запуска против локального бэкенда (PostgreSQL + uvicorn с несколькими воркерами):
+
+    python scripts/bench_bulk_passports.py --code 3501040 --clients 16 --requests 20 --quantity 50
+"""
+
+import argparse
+import json
+import sys
+import time
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def post_json(url, payload, token=None):
+    """POST запрос с JSON телом"""
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"), headers=headers, method="POST")
+    with urllib.request.urlopen(request, timeout=300) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def login(base_url, username, password):
+    """Получение токена доступа"""
+    data = post_json(f"{base_url}/api/v1/auth/login", {"username": username, "password": password})
+    return data["access_token"]
+
+
+def run_client(base_url, token, code, requests_count, quantity, client_id):
+    """Серия запросов одного клиента; возвращает номера паспортов, ошибки и задержки"""
+    numbers = []
+    errors = []
+    latencies = []
+    for i in range(requests_count):
+        payload = {
+            "order_number": f"BENCH-{client_id}-{i}",
+            "title": "Нагрузочный тест",
+            "items": [{"code_1c": code, "quantity": quantity}],
+        }
+        started = time.perf_counter()
+        try:
+            data = post_json(f"{base_url}/api/v1/passports/bulk/", payload, token)
+            numbers.extend(p["passport_number"] for p in data["data"]["passports"])
+            errors.extend(data["data"]["errors"])
+        except Exception as e:
+            errors.append(str(e))
+        latencies.append(time.perf_counter() - started)
+    return numbers, errors, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест POST /api/v1/passports/bulk/")
+    parser.add_argument("--url", default="http://localhost:8000", help="Адрес бэкенда")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--code", required=True, help="Код 1С активной номенклатуры")
+    parser.add_argument("--clients", type=int, default=8, help="Количество параллельных клиентов")
+    parser.add_argument("--requests", type=int, default=10, help="Запросов на клиента")
+    parser.add_argument("--quantity", type=int, default=10, help="Паспортов в одном запросе")
+    args = parser.parse_args()
+
+    token = login(args.url, args.username, args.password)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        futures = [
+            pool.submit(run_client, args.url, token, args.code, args.requests, args.quantity, client_id)
+            for client_id in range(args.clients)
+        ]
+        results = [f.result() for f in futures]
+    elapsed = time.perf_counter() - started
+
+    numbers = [n for r in results for n in r[0]]
+    errors = [e for r in results for e in r[1]]
+    latencies = sorted(l for r in results for l in r[2])
+    duplicates = [n for n, c in Counter(numbers).items() if c > 1]
+
+    total_requests = args.clients * args.requests
+    print(f"Клиентов: {args.clients}, запросов: {total_requests}, паспортов в запросе: {args.quantity}")
+    print(f"Время: {elapsed:.2f} с")
+    print(f"Запросов/с: {total_requests / elapsed:.1f}, паспортов/с: {len(numbers) / elapsed:.1f}")
+    if latencies:
+        print(f"Задержка p50: {latencies[len(latencies) // 2] * 1000:.0f} мс, "
+              f"p95: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} мс")
+    print(f"Создано паспортов: {len(numbers)}, ошибок: {len(errors)}")
+    for error in errors[:10]:
+        print(f"  ❌ {error}")
+
+    if duplicates:
+        print(f"❌ Найдены дубликаты номеров: {len(duplicates)} (например, {duplicates[:5]})")
+        return 1
+    if errors:
+        return 1
+    print("✅ Все номера паспортов уникальны")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Скорость генерации PDF паспортов: platypus против canvas
+
+Генерирует PDF для синтетических паспортов (по 6 на страницу) обоими
+способами отрисовки и выводит время и количество страниц в секунду.
+База данных не нужна.
+
+Пример запуска из корня проекта:
+
+    python scripts/bench_passport_pdf.py --counts 1000 10000
+    python scripts/bench_passport_pdf.py --counts 1000 --renderers canvas
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from backend.utils import pdf_generator  # noqa: E402
+from backend.utils.render_executor import NomenclatureView, PassportView  # noqa: E402
+
+NOMENCLATURES = [
+    NomenclatureView(1, "3501040", "Коронка импрегнированная ALFA NQ", "3501040", "NQ", "05-07", "12 мм", "NQ", "коронка"),
+    NomenclatureView(2, "3501041", "Коронка импрегнированная ALFA HQ", "3501041", "HQ", "07-09", "12 мм", "HQ", "коронка"),
+    NomenclatureView(
+        3, "3501042", "Расширитель алмазный импрегнированный с удлиненной матрицей ALFA PQ3 для геологоразведки",
+        "3501042", "PQ3", "09-12", "16 мм", "PQ", "расширитель"
+    ),
+]
+
+
+def sample_passports(count):
+    """Синтетические паспорта с разной номенклатурой (в том числе с длинным названием)"""
+    created = datetime(2025, 1, 1, 12, 0, 0)
+    passports = []
+    for i in range(1, count + 1):
+        nomenclature = NOMENCLATURES[i % len(NOMENCLATURES)]
+        passports.append(PassportView(
+            id=i,
+            passport_number=f"AGB {nomenclature.drilling_depth} {nomenclature.matrix} {i:06d} 25",
+            title="Паспорт",
+            description=None,
+            status="active",
+            order_number="BENCH",
+            quantity=1,
+            created_by=1,
+            nomenclature_id=nomenclature.id,
+            created_at=created,
+            updated_at=created,
+            nomenclature=nomenclature,
+        ))
+    return passports
+
+
+def render(renderer, passports):
+    """PDF выбранным способом отрисовки"""
+    pdf_generator.PASSPORT_PDF_RENDERER = renderer
+    return pdf_generator.generate_bulk_passports_pdf(passports)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Скорость генерации PDF паспортов")
+    parser.add_argument("--counts", type=int, nargs="+", default=[1000, 10000], help="Количество паспортов")
+    parser.add_argument("--renderers", nargs="+", default=["platypus", "canvas"], choices=["platypus", "canvas"])
+    args = parser.parse_args()
+
+    # Без кэша фрагментов platypus, чтобы измерять построение разметки
+    pdf_generator.PASSPORT_FRAGMENT_CACHE_SIZE = 0
+
+    results = []
+    for count in args.counts:
+        passports = sample_passports(count)
+        pages = (count + 5) // 6
+        for renderer in args.renderers:
+            started = time.perf_counter()
+            content = render(renderer, passports)
+            elapsed = time.perf_counter() - started
+            results.append((count, renderer, pages, elapsed, len(content)))
+
+    print()
+    print(f"{'паспортов':>10} {'способ':>9} {'страниц':>8} {'время, с':>9} {'стр/с':>8} {'размер, КБ':>11}")
+    for count, renderer, pages, elapsed, size in results:
+        print(f"{count:>10} {renderer:>9} {pages:>8} {elapsed:>9.2f} {pages / elapsed:>8.1f} {size / 1024:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
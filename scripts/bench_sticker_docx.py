@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Скорость генерации DOCX наклеек: python-docx против прямой сборки OOXML
+
+Генерирует DOCX наклеек для синтетических паспортов (по 4 на страницу) в
+выбранных макетах обоими способами и выводит время и количество наклеек в
+секунду. База данных не нужна.
+
+Пример запуска из корня проекта:
+
+    python scripts/bench_sticker_docx.py --counts 200 2000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_passport_pdf import sample_passports  # noqa: E402
+from compare_sticker_docx import LAYOUTS, make_templates, render  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Скорость генерации DOCX наклеек")
+    parser.add_argument("--counts", type=int, nargs="+", default=[200, 2000], help="Количество наклеек")
+    parser.add_argument("--layouts", nargs="+", default=["excel", "standard"], choices=LAYOUTS)
+    parser.add_argument("--renderers", nargs="+", default=["python-docx", "ooxml"], choices=["python-docx", "ooxml"])
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        templates = make_templates(directory)
+        for count in args.counts:
+            passports = sample_passports(count)
+            for layout in args.layouts:
+                for renderer in args.renderers:
+                    started = time.perf_counter()
+                    content = render(renderer, layout, passports, templates)
+                    elapsed = time.perf_counter() - started
+                    results.append((count, layout, renderer, elapsed, len(content)))
+
+    print()
+    print(f"{'наклеек':>10} {'макет':>9} {'способ':>12} {'время, с':>9} {'накл/с':>9} {'размер, КБ':>11}")
+    for count, layout, renderer, elapsed, size in results:
+        print(f"{count:>10} {layout:>9} {renderer:>12} {elapsed:>9.2f} {count / elapsed:>9.0f} {size / 1024:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Скорость генерации Excel наклеек (generate_stickers_excel)
+
+Генерирует XLSX наклеек для синтетических паспортов и выводит время,
+количество наклеек в секунду и время на одну наклейку: при линейной
+сложности оно не растет с количеством наклеек. По умолчанию используется
+временный шаблон 10 × 3 со стилями и объединениями, как у боевого
+шаблона; свой шаблон задается через --template. База данных не нужна.
+
+Пример запуска из корня проекта:
+
+    python scripts/bench_sticker_excel.py --counts 100 500 1000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_passport_pdf import sample_passports  # noqa: E402
+
+from openpyxl import Workbook  # noqa: E402
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side  # noqa: E402
+
+from backend.utils.sticker_excel_generator import generate_stickers_excel  # noqa: E402
+
+TEMPLATE_ROWS = [
+    ("{{ logo }}", "{{ stock_code }}", None),
+    (None, "{{ nomenclature_name }}", None),
+    (None, "Артикул:", "{{ article }}"),
+    (None, "Типоразмер:", "{{ matrix }}"),
+    (None, "Высота матрицы:", None),
+    (None, "Промывочные отверстия:", None),
+    (None, "Серийный номер: {{ serial_number }}", None),
+    (None, "{{ serial_number_code }}", None),
+    (None, "Дата изготовления: {{ production_date }}", None),
+    (None, "{{ website }}", None),
+]
+
+
+def make_template(path):
+    """Временный Excel-шаблон наклейки со стилями и объединениями"""
+    workbook = Workbook()
+    ws = workbook.active
+    thin = Side(style="thin", color="000000")
+    for row_idx, values in enumerate(TEMPLATE_ROWS, start=1):
+        for col_idx, value in enumerate(values, start=1):
+            cell = ws.cell(row_idx, col_idx, value)
+            cell.font = Font(name="Arial", size=10, bold=row_idx == 2)
+            cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+            cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+            if row_idx == 1:
+                cell.fill = PatternFill(patternType="solid", fgColor="EEEEEE")
+        ws.row_dimensions[row_idx].height = 18
+    ws.merge_cells("A1:A10")
+    for row_idx in (2, 7, 8, 9, 10):
+        ws.merge_cells(start_row=row_idx, start_column=2, end_row=row_idx, end_column=3)
+    workbook.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Скорость генерации Excel наклеек")
+    parser.add_argument("--counts", type=int, nargs="+", default=[100, 500, 1000], help="Количество наклеек")
+    parser.add_argument("--template", help="Excel-шаблон наклейки (по умолчанию временный)")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        template_path = args.template
+        if not template_path:
+            template_path = os.path.join(directory, "sticker_template.xlsx")
+            make_template(template_path)
+        for count in args.counts:
+            passports = sample_passports(count)
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                content = generate_stickers_excel(passports, template_path)
+            elapsed = time.perf_counter() - started
+            results.append((count, elapsed, len(content)))
+
+    print()
+    print(f"{'наклеек':>10} {'время, с':>9} {'накл/с':>9} {'мс/накл':>9} {'размер, КБ':>11}")
+    for count, elapsed, size in results:
+        print(f"{count:>10} {elapsed:>9.2f} {count / elapsed:>9.0f} {elapsed * 1000 / count:>9.2f} {size / 1024:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
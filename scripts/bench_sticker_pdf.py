@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Скорость генерации PDF наклеек: platypus против canvas
+
+Генерирует PDF наклеек для синтетических паспортов (по 8 на страницу)
+обоими способами отрисовки и выводит время и количество наклеек в секунду.
+База данных не нужна.
+
+Пример запуска из корня проекта:
+
+    python scripts/bench_sticker_pdf.py --counts 1000 10000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_passport_pdf import sample_passports  # noqa: E402
+from compare_sticker_renderers import render  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Скорость генерации PDF наклеек")
+    parser.add_argument("--counts", type=int, nargs="+", default=[1000, 10000], help="Количество наклеек")
+    parser.add_argument("--renderers", nargs="+", default=["platypus", "canvas"], choices=["platypus", "canvas"])
+    args = parser.parse_args()
+
+    results = []
+    for count in args.counts:
+        passports = sample_passports(count)
+        for renderer in args.renderers:
+            started = time.perf_counter()
+            content = render(renderer, passports)
+            elapsed = time.perf_counter() - started
+            results.append((count, renderer, elapsed, len(content)))
+
+    print()
+    print(f"{'наклеек':>10} {'способ':>9} {'время, с':>9} {'накл/с':>9} {'размер, КБ':>11}")
+    for count, renderer, elapsed, size in results:
+        print(f"{count:>10} {renderer:>9} {elapsed:>9.2f} {count / elapsed:>9.0f} {size / 1024:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Количество запросов get_current_user не зависит от числа паспортов
+
+Создает во временной транзакции пользователя без паспортов, считает
+SQL-запросы аутентификации (слушатель before_cursor_execute), затем
+добавляет пользователю --count паспортов и считает снова: количество
+запросов должно совпасть. Транзакция откатывается, база не меняется.
+
+Нужна база из DATABASE_URL; завершается с кодом 1, если количество
+запросов различается или база недоступна.
+
+Пример запуска из корня проекта:
+
+    python scripts/check_auth_query_count.py --count 500
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.security import HTTPAuthorizationCredentials  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from backend.api.auth import create_access_token, get_current_user  # noqa: E402
+from backend.database import engine  # noqa: E402
+from backend.models import User, VedPassport, VEDNomenclature  # noqa: E402
+
+
+def count_auth_queries(connection, username):
+    """Количество SQL-запросов одного вызова get_current_user"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer",
+        credentials=create_access_token({"sub": username}),
+    )
+    # Новая сессия на каждое измерение: пустая identity map, как в запросе к API
+    db = Session(bind=connection)
+    event.listen(connection, "before_cursor_execute", before_cursor_execute)
+    try:
+        user = asyncio.run(get_current_user(credentials, db))
+        # Атрибуты, которые читают эндпоинты после аутентификации
+        user.id, user.role, user.is_active
+    finally:
+        event.remove(connection, "before_cursor_execute", before_cursor_execute)
+        db.close()
+    return len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Количество запросов get_current_user")
+    parser.add_argument("--count", type=int, default=500, help="Количество паспортов пользователя")
+    args = parser.parse_args()
+
+    suffix = uuid.uuid4().hex[:12]
+    username = f"auth_check_{suffix}"
+
+    try:
+        connection = engine.connect()
+    except Exception as e:
+        print(f"❌ База недоступна: {e.__class__.__name__}")
+        sys.exit(1)
+
+    transaction = connection.begin()
+    try:
+        db = Session(bind=connection)
+        user = User(username=username, hashed_password="-", role="user", is_active=True)
+        nomenclature = VEDNomenclature(code_1c=f"AUTH-CHECK-{suffix}", name="Проверка аутентификации")
+        db.add_all([user, nomenclature])
+        db.flush()
+
+        empty = count_auth_queries(connection, username)
+        print(f"📊 Паспортов 0: {empty} запросов")
+
+        db.bulk_insert_mappings(VedPassport, [
+            {
+                "passport_number": f"AUTH-CHECK-{suffix}-{index}",
+                "order_number": "AUTH-CHECK",
+                "nomenclature_id": nomenclature.id,
+                "created_by": user.id,
+            }
+            for index in range(args.count)
+        ])
+        db.flush()
+        db.close()
+
+        loaded = count_auth_queries(connection, username)
+        print(f"📊 Паспортов {args.count}: {loaded} запросов")
+    finally:
+        transaction.rollback()
+        connection.close()
+
+    if empty != loaded:
+        print("❌ Количество запросов get_current_user зависит от числа паспортов")
+        sys.exit(1)
+    print("✅ Количество запросов get_current_user не зависит от числа паспортов")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Проверка запрета запросов к БД во время генерации документов
+
+Генераторы PDF, DOCX и XLSX вызываются так же, как из пула генерации
+(render_executor._render_guarded), на синтетических view-моделях: ни один
+не должен обращаться к базе. Затем проверяется, что обращение к базе под
+тем же флагом завершается RuntimeError:
+
+    - get_db() (получение сессии);
+    - SELECT через engine и ленивая загрузка связи ORM-объекта - если база
+      из DATABASE_URL доступна (иначе проверка пропускается с
+      предупреждением, --require-db делает ее обязательной).
+
+Завершается с кодом 1 при любом нарушении.
+
+Пример запуска из корня проекта:
+
+    python scripts/check_render_db_guard.py --count 8
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_passport_pdf import sample_passports  # noqa: E402
+from compare_sticker_docx import make_templates  # noqa: E402
+
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from backend.database import engine, get_db  # noqa: E402
+from backend.models import VedPassport  # noqa: E402
+from backend.utils import sticker_template_generator  # noqa: E402
+from backend.utils.pdf_generator import generate_bulk_passports_pdf, generate_stickers_pdf_reportlab  # noqa: E402
+from backend.utils.render_executor import _render_guarded  # noqa: E402
+from backend.utils.sticker_excel_generator import generate_stickers_excel  # noqa: E402
+
+
+def generators(templates):
+    """(название, функция от списка паспортов) всех генераторов выгрузок"""
+    xlsx_path, docx_path, _ = templates
+    result = [
+        ("PDF паспортов", generate_bulk_passports_pdf),
+        ("PDF наклеек", generate_stickers_pdf_reportlab),
+        ("XLSX наклеек", lambda passports: generate_stickers_excel(passports, xlsx_path)),
+        ("DOCX наклеек (стандартный)", sticker_template_generator.generate_stickers_standard),
+    ]
+    for renderer in ("python-docx", "ooxml"):
+        def render_docx(passports, renderer=renderer):
+            sticker_template_generator.STICKER_DOCX_RENDERER = renderer
+            return sticker_template_generator.generate_from_template_file(passports, docx_path)
+        result.append((f"DOCX наклеек из шаблона ({renderer})", render_docx))
+    return result
+
+
+def raises_runtime_error(func):
+    """Завершается ли func() ошибкой RuntimeError под флагом генерации"""
+    try:
+        _render_guarded(func)
+    except RuntimeError:
+        return True
+    except Exception as e:
+        print(f"   неожиданная ошибка: {e!r}")
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка запрета запросов к БД при генерации документов")
+    parser.add_argument("--count", type=int, default=8, help="Количество паспортов")
+    parser.add_argument("--require-db", action="store_true", help="Ошибка, если база недоступна")
+    args = parser.parse_args()
+
+    passports = sample_passports(args.count)
+    failed = False
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, generator in generators(make_templates(directory)):
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    content = _render_guarded(generator, passports)
+                print(f"✅ {name}: {len(content)} байт без запросов к БД")
+            except Exception as e:
+                print(f"❌ {name}: {e!r}")
+                failed = True
+
+    if raises_runtime_error(lambda: next(get_db())):
+        print("✅ get_db() при генерации: RuntimeError")
+    else:
+        print("❌ get_db() при генерации не завершился ошибкой")
+        failed = True
+
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except Exception as e:
+        print(f"{'❌' if args.require_db else '⚠️'} База недоступна, проверка запросов пропущена: {e.__class__.__name__}")
+        failed = failed or args.require_db
+    else:
+        def select():
+            with engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+
+        if raises_runtime_error(select):
+            print("✅ SELECT при генерации: RuntimeError")
+        else:
+            print("❌ SELECT при генерации выполнен")
+            failed = True
+
+        db = sessionmaker(bind=engine)()
+        try:
+            passport = db.query(VedPassport).first()
+            if passport is None:
+                print("⚠️ Таблица ved_passports пуста, проверка ленивой загрузки пропущена")
+            else:
+                # Связь загружается selectin-запросом вместе с паспортом; после
+                # expire обращение к ней - ленивая загрузка из базы
+                db.expire(passport, ["nomenclature"])
+                if raises_runtime_error(lambda: passport.nomenclature):
+                    print("✅ Ленивая загрузка passport.nomenclature при генерации: RuntimeError")
+                else:
+                    print("❌ Ленивая загрузка passport.nomenclature при генерации выполнена")
+                    failed = True
+        finally:
+            db.close()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Визуальное сравнение PDF паспортов: canvas против platypus
+
+Генерирует PDF для одних и тех же паспортов обоими способами отрисовки,
+растеризует страницы и считает долю отличающихся пикселей. Завершается с
+кодом 1, если хотя бы одна страница отличается больше допуска или не
+совпадает количество страниц.
+
+Нужны pypdfium2 и Pillow (только для этого скрипта):
+
+    pip install pypdfium2 Pillow
+    python scripts/compare_passport_renderers.py --count 30 --diff-dir /tmp/passport_diff
+"""
+
+import argparse
+import os
+import sys
+
+from PIL import Image, ImageChops
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    print("❌ Для сравнения нужен pypdfium2: pip install pypdfium2")
+    sys.exit(2)
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_passport_pdf import render, sample_passports  # noqa: E402
+
+
+def rasterize(pdf_bytes, dpi):
+    """Страницы PDF в виде изображений в оттенках серого"""
+    document = pdfium.PdfDocument(pdf_bytes)
+    return [page.render(scale=dpi / 72).to_pil().convert("L") for page in document]
+
+
+def diff_ratio(first, second, threshold):
+    """Доля пикселей, яркость которых отличается больше чем на threshold"""
+    diff = ImageChops.difference(first, second)
+    changed = sum(diff.histogram()[threshold + 1:])
+    return changed / (diff.width * diff.height), diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Визуальное сравнение PDF паспортов canvas и platypus")
+    parser.add_argument("--count", type=int, default=30, help="Количество паспортов")
+    parser.add_argument("--dpi", type=int, default=100, help="Разрешение растеризации")
+    parser.add_argument("--threshold", type=int, default=64, help="Порог отличия яркости пикселя (0-255)")
+    parser.add_argument("--tolerance", type=float, default=0.002, help="Допустимая доля отличающихся пикселей на странице")
+    parser.add_argument("--diff-dir", help="Папка для изображений разницы страниц")
+    args = parser.parse_args()
+
+    passports = sample_passports(args.count)
+    reference = rasterize(render("platypus", passports), args.dpi)
+    candidate = rasterize(render("canvas", passports), args.dpi)
+
+    if len(reference) != len(candidate):
+        print(f"❌ Разное количество страниц: platypus {len(reference)}, canvas {len(candidate)}")
+        sys.exit(1)
+
+    if args.diff_dir:
+        os.makedirs(args.diff_dir, exist_ok=True)
+
+    failed = 0
+    for number, (first, second) in enumerate(zip(reference, candidate), start=1):
+        ratio, diff = diff_ratio(first, second, args.threshold)
+        ok = ratio <= args.tolerance
+        failed += not ok
+        print(f"{'✅' if ok else '❌'} Страница {number}: отличается {ratio:.4%} пикселей")
+        if args.diff_dir:
+            diff.point(lambda value: 255 if value > args.threshold else 0).save(
+                os.path.join(args.diff_dir, f"page_{number:03d}.png")
+            )
+
+    if failed:
+        print(f"❌ Страниц с отличиями сверх допуска: {failed} из {len(reference)}")
+        sys.exit(1)
+    print(f"✅ Все {len(reference)} страниц совпадают в пределах допуска {args.tolerance:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Сравнение DOCX наклеек: прямая сборка OOXML против python-docx
+
+Генерирует DOCX наклеек для одних и тех же паспортов обоими способами в
+каждом макете (стандартный, Excel-шаблон, DOCX-шаблон с плейсхолдерами,
+рабочий шаблон templates/sticker_template.docx) и сравнивает каждую
+наклейку: текст всех абзацев, включая вложенные таблицы, и количество
+изображений. Для макетов excel и template создаются временные шаблоны;
+логотип берется из TemplateManager. Завершается с кодом 1, если хотя бы
+одна наклейка отличается.
+
+Пример запуска из корня проекта:
+
+    python scripts/compare_sticker_docx.py --count 20
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_passport_pdf import sample_passports  # noqa: E402
+
+from docx import Document  # noqa: E402
+from openpyxl import Workbook  # noqa: E402
+
+from backend.utils import sticker_template_generator  # noqa: E402
+
+LAYOUTS = ["standard", "excel", "template", "shipped"]
+SHIPPED_TEMPLATE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "sticker_template.docx"
+)
+TEMPLATE_LINES = [
+    "{{ logo }}", "{{r nomenclature_name }}", "Артикул: {{ article }}", "{{ stock_code }}",
+    "Серийный номер: {{ serial_number }}", "{{ serial_number_code }}",
+    "Дата изготовления: {{ manufacture_date_formatted }}", "{{ website }}",
+]
+
+
+def make_templates(directory):
+    """Шаблоны наклейки: (временный xlsx, временный docx, рабочий docx)"""
+    xlsx_path = os.path.join(directory, "sticker_template.xlsx")
+    Workbook().save(xlsx_path)
+
+    docx_path = os.path.join(directory, "sticker_template.docx")
+    document = Document()
+    cell = document.add_table(rows=1, cols=1).rows[0].cells[0]
+    cell.paragraphs[0].text = TEMPLATE_LINES[0]
+    for line in TEMPLATE_LINES[1:]:
+        cell.add_paragraph(line)
+    document.save(docx_path)
+    return xlsx_path, docx_path, SHIPPED_TEMPLATE
+
+
+def render(renderer, layout, passports, templates, quiet=True):
+    """DOCX наклеек выбранным способом сборки и макетом"""
+    sticker_template_generator.STICKER_DOCX_RENDERER = renderer
+    xlsx_path, docx_path, shipped_path = templates
+    with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+        if layout == "standard":
+            return sticker_template_generator.generate_stickers_standard(passports)
+        if layout == "excel":
+            return sticker_template_generator.generate_from_excel_template(passports, xlsx_path)
+        if layout == "shipped":
+            return sticker_template_generator.generate_from_template_file(passports, shipped_path)
+        return sticker_template_generator.generate_from_template_file(passports, docx_path)
+
+
+def cell_text(cell):
+    """Текст ячейки с вложенными таблицами"""
+    lines = [paragraph.text for paragraph in cell.paragraphs]
+    for table in cell.tables:
+        for row in table.rows:
+            lines.extend(cell_text(inner) for inner in row.cells)
+    return "\n".join(line for line in lines if line)
+
+
+def stickers(content):
+    """(текст, изображений) каждой ячейки наклейки по порядку"""
+    document = Document(io.BytesIO(content))
+    result = []
+    for table in document.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                images = len(cell._element.xpath(".//a:blip"))
+                result.append((cell_text(cell), images))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение DOCX наклеек ooxml и python-docx")
+    parser.add_argument("--count", type=int, default=20, help="Количество наклеек")
+    parser.add_argument("--layouts", nargs="+", default=LAYOUTS, choices=LAYOUTS)
+    args = parser.parse_args()
+
+    passports = sample_passports(args.count)
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        templates = make_templates(directory)
+        for layout in args.layouts:
+            try:
+                reference = stickers(render("python-docx", layout, passports, templates))
+            except Exception as e:
+                print(f"{layout}: ошибка генерации python-docx: {e!r}")
+                failed = True
+                continue
+            candidate = stickers(render("ooxml", layout, passports, templates))
+            mismatches = [
+                index for index, (expected, actual) in enumerate(zip(reference, candidate))
+                if expected != actual
+            ]
+            if len(reference) != len(candidate):
+                print(f"{layout}: ячеек {len(candidate)} вместо {len(reference)}")
+                failed = True
+            for index in mismatches[:5]:
+                print(f"{layout}: наклейка {index + 1} отличается:")
+                print(f"   python-docx: {reference[index]!r}")
+                print(f"   ooxml:       {candidate[index]!r}")
+            failed = failed or bool(mismatches)
+            print(f"{layout}: {len(reference)} ячеек, отличий: {len(mismatches)}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Визуальное сравнение PDF наклеек: canvas против platypus
+
+Генерирует наклейки для одних и тех же паспортов обоими способами отрисовки
+и сравнивает каждую наклейку отдельно. Таблица platypus высотой в лист A4 не
+помещается в рамку страницы (отступы Frame по 6 pt), поэтому четвертая
+строка наклеек уходит на следующую страницу; скрипт находит каждую наклейку
+на страницах platypus и сравнивает ее с ячейкой листа 2 × 4 на canvas.
+Завершается с кодом 1, если хотя бы одна наклейка отличается больше допуска.
+
+Нужны pypdfium2 и Pillow (только для этого скрипта):
+
+    pip install pypdfium2 Pillow
+    python scripts/compare_sticker_renderers.py --count 20 --diff-dir /tmp/sticker_diff
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from compare_passport_renderers import rasterize, diff_ratio  # noqa: E402
+from bench_passport_pdf import sample_passports  # noqa: E402
+
+from backend.utils import pdf_generator  # noqa: E402
+from backend.utils.sticker_canvas import STICKER_WIDTH, STICKER_HEIGHT, STICKERS_PER_PAGE  # noqa: E402
+
+FRAME_PADDING = 6  # Отступ Frame в SimpleDocTemplate, pt
+INSET = 3  # Пикселей от границы наклейки (без линий сетки)
+
+
+def render(renderer, passports):
+    """PDF наклеек выбранным способом отрисовки"""
+    pdf_generator.STICKER_PDF_RENDERER = renderer
+    return pdf_generator.generate_stickers_pdf_reportlab(passports)
+
+
+def crop(page, left, top, scale):
+    """Наклейка с левым верхним углом (left, top) в pt от верха страницы"""
+    box = (
+        round(left * scale) + INSET, round(top * scale) + INSET,
+        round((left + STICKER_WIDTH) * scale) - INSET, round((top + STICKER_HEIGHT) * scale) - INSET,
+    )
+    return page.crop(box)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Визуальное сравнение PDF наклеек canvas и platypus")
+    parser.add_argument("--count", type=int, default=20, help="Количество наклеек")
+    parser.add_argument("--dpi", type=int, default=144, help="Разрешение растеризации (кратное 72 - без сдвига на доли пикселя)")
+    parser.add_argument("--threshold", type=int, default=64, help="Порог отличия яркости пикселя (0-255)")
+    parser.add_argument("--tolerance", type=float, default=0.002, help="Допустимая доля отличающихся пикселей наклейки")
+    parser.add_argument("--diff-dir", help="Папка для изображений разницы наклеек")
+    args = parser.parse_args()
+
+    passports = sample_passports(args.count)
+    scale = args.dpi / 72
+    reference = rasterize(render("platypus", passports), args.dpi)
+    candidate = rasterize(render("canvas", passports), args.dpi)
+
+    if args.diff_dir:
+        os.makedirs(args.diff_dir, exist_ok=True)
+
+    failed = 0
+    for index in range(len(passports)):
+        group, slot = divmod(index, STICKERS_PER_PAGE)
+        row, col = divmod(slot, 2)
+        left = col * STICKER_WIDTH
+        # platypus: строки 0-2 на первой странице группы, строка 3 - на второй
+        if row < 3:
+            first = crop(reference[2 * group], left, FRAME_PADDING + row * STICKER_HEIGHT, scale)
+        else:
+            first = crop(reference[2 * group + 1], left, FRAME_PADDING, scale)
+        second = crop(candidate[group], left, row * STICKER_HEIGHT, scale)
+
+        ratio, diff = diff_ratio(first, second, args.threshold)
+        ok = ratio <= args.tolerance
+        failed += not ok
+        print(f"{'✅' if ok else '❌'} Наклейка {index + 1}: отличается {ratio:.4%} пикселей")
+        if args.diff_dir:
+            diff.point(lambda value: 255 if value > args.threshold else 0).save(
+                os.path.join(args.diff_dir, f"sticker_{index + 1:03d}.png")
+            )
+
+    if failed:
+        print(f"❌ Наклеек с отличиями сверх допуска: {failed} из {len(passports)}")
+        sys.exit(1)
+    print(f"✅ Все {len(passports)} наклеек совпадают в пределах допуска {args.tolerance:.2%}")
+
+
+if __name__ == "__main__":
+    main()